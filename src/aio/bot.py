@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from telebot.async_telebot import AsyncTeleBot
+from aio.callbacks import callback_handlers
+from aio.commands import command_handlers
+from board import create_board
+from conversations import StepRouter, conversation_store
+from outbound import create_send_scheduler
+
+logger = logging.getLogger("bot (async)")
+
+def create_bot(token):
+    """
+    Returns (bot, board). Call from a coroutine: the availability board makes its calls on the running loop,
+    so close it while the loop is still running.
+    """
+    bot = AsyncTeleBot(token)
+    steps = StepRouter(conversation_store)
+    board = create_board(bot, asyncio.get_running_loop())
+
+    # Commands before pending steps, so /start abandons a flow instead of being read as its answer
+    command_handlers(bot)
+    callback_handlers(bot, steps, board)
+    steps.install_async(bot)
+
+    return bot, board
+
+async def run_polling(token):
+    bot, board = create_bot(token)
+    logger.info("Starting async bot engine")
+
+    # Handlers queue their sends instead of waiting on Telegram
+    scheduler = create_send_scheduler()
+    if scheduler is not None:
+        scheduler.install_async(bot, asyncio.get_running_loop())
+
+    try:
+        await bot.delete_webhook()
+        await bot.infinity_polling()
+    finally:
+        await asyncio.to_thread(board.close) # Pending board edits still need the loop
+        if scheduler is not None:
+            await asyncio.to_thread(scheduler.close) # Queued sends still need the loop and the session
+        await bot.close_session()
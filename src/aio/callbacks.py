@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from aio.helpers import remove_markup
+from callbacks import payloads
+from callbacks.router import CallbackRouter
+from callbacks.replies import Reply, send
+from callbacks.get_availability import availability_dates_reply, availability_reply, week_availability_reply
+from callbacks.free_slots import free_slot_dates_reply, free_slots_reply
+from callbacks.book import (
+    LOUNGES, RETRY, NEXT, book_dates_reply, weekly_dates_reply, weeks_reply, start_time_prompt, read_start_time, read_end_time, make_booking
+)
+from callbacks.unbook import unbook_select_reply, unbook_booking, unbook_all_bookings
+from constants import START_MARKUP, WELCOME_MESSAGE
+from metrics import timed_handler
+
+logger = logging.getLogger("callbacks (async)")
+
+def callback_handlers(bot, steps, board):
+    """
+    Same flows as callbacks.callbacks, built from the same helpers, with independent calls overlapped.
+    Helpers that touch the database block, so they run on worker threads.
+    steps is the StepRouter the booking flow registers its steps with, board the group topic's AvailabilityBoard.
+    """
+    router = CallbackRouter()
+
+    async def answer(call, reply):
+        """
+        Send reply while the pressed message's keyboard is removed
+        """
+        await asyncio.gather(remove_markup(bot, call.message.chat.id, call.message.message_id), send(bot, call.message.chat.id, reply))
+
+    async def run(call, helper, *args):
+        """
+        helper(*args) on a worker thread while the pressed message's keyboard is removed. Returns its result.
+        """
+        _, result = await asyncio.gather(remove_markup(bot, call.message.chat.id, call.message.message_id), asyncio.to_thread(helper, *args))
+        return result
+
+    async def back(call):
+        logger.info("%s (@%s) Going Back From %s", call.from_user.first_name, call.from_user.username, call.data[5:])
+        await answer(call, Reply(WELCOME_MESSAGE, START_MARKUP))
+
+    for state in ("Get Availability", "Free Slots", "Book", "Unbook"):
+        router.route(payloads.back(state))(back)
+
+    # Get availability
+    @router.route(payloads.GET_AVAILABILITY_SELECT_DATE)
+    async def get_availability_select_date(call):
+        logger.info("%s (@%s) Checking Availability", call.from_user.first_name, call.from_user.username)
+        await answer(call, availability_dates_reply())
+
+    @router.route(payloads.GET_AVAILABILITY_DATE_SELECTED)
+    async def get_availability(call, date):
+        logger.info("%s (@%s) Checking %s availability", call.from_user.first_name, call.from_user.username, date)
+        await send(bot, call.message.chat.id, await run(call, availability_reply, date))
+
+    @router.route(payloads.GET_AVAILABILITY_ALL_SELECTED)
+    async def get_availability_all(call):
+        logger.info("Checking all availability")
+        await send(bot, call.message.chat.id, await run(call, week_availability_reply))
+
+    # Free slots
+    @router.route(payloads.FREE_SLOTS_SELECT_DATE)
+    async def free_slots_select_date(call):
+        logger.info("%s (@%s) Checking Free Slots", call.from_user.first_name, call.from_user.username)
+        await answer(call, free_slot_dates_reply())
+
+    @router.route(payloads.FREE_SLOTS_DATE_SELECTED)
+    async def free_slots(call, date):
+        logger.info("%s (@%s) Checking %s free slots", call.from_user.first_name, call.from_user.username, date)
+        await send(bot, call.message.chat.id, await run(call, free_slots_reply, date))
+
+    # Book
+    @router.route(payloads.BOOK_SELECT_LOUNGE)
+    async def select_lounge(call):
+        logger.info("%s (@%s) Booking Lounge (Select Lounge)", call.from_user.first_name, call.from_user.username)
+        await answer(call, LOUNGES)
+
+    @router.route(payloads.BOOK_LEVEL)
+    async def select_date(call, level):
+        logger.info("%s (@%s) Booking Lounge (Select Date)", call.from_user.first_name, call.from_user.username)
+        await answer(call, book_dates_reply(level))
+
+    @router.route(payloads.BOOK_WEEKLY)
+    async def select_weekly_date(call, level):
+        logger.info("%s (@%s) Booking Lounge Weekly (Select Date)", call.from_user.first_name, call.from_user.username)
+        await answer(call, weekly_dates_reply(level))
+
+    @router.route(payloads.BOOK_WEEKLY_DATE_SELECTED)
+    async def select_weeks(call, level, selected_date):
+        await answer(call, weeks_reply(level, selected_date))
+
+    @router.route(payloads.BOOK_WEEKS)
+    @router.route(payloads.BOOK_DATE_SELECTED)
+    async def handle_date_selection(call, level, selected_date, weeks=1):
+        # Register before sending so a fast reply cannot arrive ahead of the handler
+        steps.register(call.message.chat.id, call.from_user.id, process_start_time, level, selected_date, weeks)
+        await answer(call, start_time_prompt(level, selected_date, weeks))
+
+    @steps.step
+    @timed_handler('process_start_time')
+    async def process_start_time(message, level, selected_date, weeks=1):
+        reply, outcome = read_start_time(message.text)
+
+        if outcome == RETRY:
+            steps.register(message.chat.id, message.from_user.id, process_start_time, level, selected_date, weeks)
+        elif outcome == NEXT:
+            steps.register(message.chat.id, message.from_user.id, process_end_time, level, selected_date, message.text, weeks)
+
+        await send(bot, message.chat.id, reply)
+
+    @steps.step
+    @timed_handler('process_end_time')
+    async def process_end_time(message, level, selected_date, start_time, weeks=1):
+        reply, outcome = read_end_time(message.text, start_time)
+
+        if outcome == NEXT:
+            reply, dates = await asyncio.to_thread(make_booking, level, selected_date, start_time, message.text, weeks, message.from_user)
+            board.touch(*dates)
+        elif outcome == RETRY:
+            steps.register(message.chat.id, message.from_user.id, process_end_time, level, selected_date, start_time, weeks)
+
+        await send(bot, message.chat.id, reply)
+
+    # Unbook
+    @router.route(payloads.UNBOOK_SELECT)
+    async def unbook_select(call):
+        logger.info("%s (@%s) Unbooking (Select Booking)", call.from_user.first_name, call.from_user.username)
+        await send(bot, call.message.chat.id, await run(call, unbook_select_reply, call.from_user.id))
+
+    @router.route(payloads.UNBOOK_SELECTED)
+    async def unbook(call, level, booking_id, booking_date):
+        logger.info("%s (@%s) Unbooking", call.from_user.first_name, call.from_user.username)
+
+        reply, dates = await run(call, unbook_booking, level, booking_id, booking_date)
+        board.touch(*dates)
+        await send(bot, call.message.chat.id, reply)
+
+    @router.route(payloads.UNBOOK_ALL)
+    async def unbook_all(call):
+        logger.info("%s (@%s) Unbooking All", call.from_user.first_name, call.from_user.username)
+
+        reply, dates = await run(call, unbook_all_bookings, call.from_user.id)
+        board.touch(*dates)
+        await send(bot, call.message.chat.id, reply)
+
+    router.install_async(bot)
@@ -0,0 +1,24 @@
+import asyncio
+import logging
+from aio.helpers import remove_markup
+from constants import START_MARKUP
+from conversations import conversation_store
+from metrics import timed_handler
+
+logger = logging.getLogger("commands (async)")
+
+def command_handlers(bot):
+
+    @bot.message_handler(commands=['start', 'hello'])
+    @timed_handler('start')
+    async def send_start(message):
+        chat_id = message.chat.id
+
+        # Abandon any booking flow in progress
+        conversation_store.discard(chat_id, message.from_user.id)
+        
+        # Remove the markup from the previous message if it exists, while sending the welcome message
+        await asyncio.gather(
+            remove_markup(bot, chat_id, message.message_id - 1),
+            bot.send_message(chat_id, "Welcome! What can I help you with?", reply_markup=START_MARKUP)
+        )
@@ -0,0 +1,17 @@
+import logging
+from outbound import on_error
+
+logger = logging.getLogger("helpers (async)")
+
+async def remove_markup(bot, chat_id, message_id):
+    """
+    Remove an inline keyboard, logging instead of raising so it can run alongside other calls.
+    Queued, the await returns a Future at once and a failure is logged when it completes.
+    """
+    try:
+        on_error(await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=None), log_markup_error)
+    except Exception as e: # Sent directly, without the outbound queue
+        log_markup_error(e)
+
+def log_markup_error(e):
+    logger.error("Error removing previous markup: %s", e)
@@ -0,0 +1,77 @@
+"""
+Per-callback overhead of turning query results into something the handlers can use:
+pandas DataFrames (the old path) against Booking records (the new path).
+
+No database needed; rows are generated in the shape psycopg2 returns them.
+From src/:
+    python -m benchmarks.booking_rows [--rows 20] [--number 2000]
+"""
+import argparse
+import timeit
+from datetime import date, datetime, time, timedelta
+import pandas as pd
+from constants import COLUMNS
+from db.models import Booking
+
+def make_rows(n):
+    day = date(2026, 10, 18)
+    booked_at = datetime(2026, 10, 17, 12, 0)
+    return [
+        (i, booked_at + timedelta(minutes=i), 9 + i % 3, f"user{i}", "User", 100000 + i, day,
+         time(8 + i % 14), time(9 + i % 14), "booked")
+        for i in range(n)
+    ]
+
+def daily_view_dataframe(result):
+    # Old get_availability_message: DataFrame, status filter, per-level mask + sort, iterrows
+    bookings = pd.DataFrame(result, columns=COLUMNS)
+    bookings = bookings[bookings['status'] == "booked"]
+    lines = []
+    for level in range(9, 12):
+        level_bookings = bookings[bookings['level'] == level].sort_values(by='timeslot_start_time')
+        for _, row in level_bookings.iterrows():
+            lines.append(f"{row['timeslot_start_time']:%H:%M} - {row['timeslot_end_time']:%H:%M} {row['first_name']} (@{row['username']})")
+    return lines
+
+def daily_view_records(result):
+    # New get_availability_message: Booking records, list filter, per-level sort
+    bookings = [booking for booking in map(Booking._make, result) if booking.status == "booked"]
+    lines = []
+    for level in range(9, 12):
+        level_bookings = sorted((booking for booking in bookings if booking.level == level), key=lambda booking: booking.timeslot_start_time)
+        for row in level_bookings:
+            lines.append(f"{row.timeslot_start_time:%H:%M} - {row.timeslot_end_time:%H:%M} {row.first_name} (@{row.username})")
+    return lines
+
+def unbook_list_dataframe(result):
+    # Old unbook_select: date mask, astype, multi-column sort, iterrows
+    bookings = pd.DataFrame(result, columns=COLUMNS)
+    bookings = bookings[bookings["timeslot_date"] >= date(2026, 10, 18)]
+    bookings['level'] = bookings['level'].astype(int)
+    bookings = bookings.sort_values(by=['level', 'timeslot_date', 'timeslot_start_time'])
+    return [f"unbook_selected_{row['level']}_{row['booking_id']}_{row['timeslot_date']}" for _, row in bookings.iterrows()]
+
+def unbook_list_records(result):
+    bookings = [booking for booking in map(Booking._make, result) if booking.timeslot_date >= date(2026, 10, 18)]
+    bookings.sort(key=lambda booking: (booking.level, booking.timeslot_date, booking.timeslot_start_time))
+    return [f"unbook_selected_{booking.level}_{booking.booking_id}_{booking.timeslot_date}" for booking in bookings]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    result = make_rows(args.rows)
+    assert daily_view_dataframe(result) == daily_view_records(result)
+    assert unbook_list_dataframe(result) == unbook_list_records(result)
+
+    print(f"{args.rows} rows, best of 5 x {args.number} runs\n")
+    print(f"{'callback':<28}{'DataFrame (us)':>16}{'Booking (us)':>16}{'speedup':>10}")
+    for name, old, new in (
+        ("get_availability_message", daily_view_dataframe, daily_view_records),
+        ("unbook_select", unbook_list_dataframe, unbook_list_records),
+    ):
+        before = min(timeit.repeat(lambda: old(result), number=args.number, repeat=5)) / args.number * 1e6
+        after = min(timeit.repeat(lambda: new(result), number=args.number, repeat=5)) / args.number * 1e6
+        print(f"{name:<28}{before:>16.1f}{after:>16.1f}{before / after:>9.0f}x")
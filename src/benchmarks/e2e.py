@@ -0,0 +1,168 @@
+"""
+End-to-end throughput of the real handlers, per handler and overall.
+
+Builds command_handlers and callback_handlers (or the async engine) on a bot pointed at benchmarks.fake_telegram,
+then runs one scripted session per simulated user:
+    /start -> get availability for a date -> get all dates -> book (lounge, level, date, start time, end time) -> unbook
+Users run concurrently; each user's updates are processed one after another, like Telegram delivers them.
+The database is DATABASE_URL, in a throwaway schema that is recreated for every run, so runs are repeatable.
+--backend memory runs against the in-memory storage instead and needs no database server.
+From src/:
+    python -m benchmarks.e2e [--users 50] [--engine sync|async] [--backend postgres|memory] [--workers 8] [--latency 0.0] [--runs 1]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+SCHEMA = "bench_e2e"
+os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA}" # Must be set before the pool opens its first connection
+
+import asyncio
+import psycopg2
+import telebot
+from telebot import apihelper, asyncio_helper, types
+from benchmarks import updates
+from benchmarks.fake_telegram import FakeTelegramServer
+from callbacks import payloads
+
+TOKEN = "123456:benchmark"
+
+def user_session(user_id, server):
+    """
+    Yields (handler, update) for one user. Generated lazily because the unbook step needs the
+    booking id from the markup the bot sent back.
+    """
+    day = (date.today() + timedelta(days=user_id % 7)).strftime("%d/%m/%Y")
+    start_hour = 8 + user_id // 21 % 14
+    level = 9 + user_id // 7 % 3
+
+    yield "start", updates.message(user_id, "/start")
+    yield "get_availability_select_date", updates.callback(user_id, payloads.GET_AVAILABILITY_SELECT_DATE.new())
+    yield "get_availability", updates.callback(user_id, payloads.GET_AVAILABILITY_DATE_SELECTED.new(day))
+    yield "get_availability_all", updates.callback(user_id, payloads.GET_AVAILABILITY_ALL_SELECTED.new())
+    yield "book_select_lounge", updates.callback(user_id, payloads.BOOK_SELECT_LOUNGE.new())
+    yield "book_level", updates.callback(user_id, payloads.BOOK_LEVEL.new(level))
+    yield "book_date_selected", updates.callback(user_id, payloads.BOOK_DATE_SELECTED.new(level, day))
+    yield "process_start_time", updates.message(user_id, f"{start_hour:02d}00")
+    yield "process_end_time", updates.message(user_id, f"{start_hour:02d}45")
+    yield "unbook_select", updates.callback(user_id, payloads.UNBOOK_SELECT.new())
+
+    data = server.callback_data(user_id, payloads.UNBOOK_SELECTED.action)
+    if data:
+        yield "unbook", updates.callback(user_id, data)
+
+def reset_schema():
+    from db.db import storage, db_handler, availability_cache
+    from db.migrations import run_migrations
+    availability_cache.clear()
+
+    if db_handler is None:
+        storage.clear()
+        return
+
+    from config import DATABASE_URL
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+    conn.close()
+
+    run_migrations(db_handler)
+
+def run_sync(users, server, workers):
+    from callbacks.callbacks import callback_handlers
+    from commands import command_handlers
+
+    bot = telebot.TeleBot(TOKEN, threaded=False)
+    command_handlers(bot)
+    board = callback_handlers(bot)
+
+    samples = []
+    def run_user(user_id):
+        for handler, update in user_session(user_id, server):
+            start = time.perf_counter()
+            bot.process_new_updates([types.Update.de_json(update)])
+            samples.append((handler, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(run_user, range(1, users + 1)))
+    elapsed = time.perf_counter() - start
+    board.close()
+    return elapsed, samples
+
+def run_async(users, server):
+    from aio.bot import create_bot
+
+    async def run():
+        bot, board = create_bot(TOKEN)
+        samples = []
+
+        async def run_user(user_id):
+            for handler, update in user_session(user_id, server):
+                start = time.perf_counter()
+                await bot.process_new_updates([types.Update.de_json(update)])
+                samples.append((handler, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_user(user_id) for user_id in range(1, users + 1)))
+        elapsed = time.perf_counter() - start
+        await asyncio.to_thread(board.close)
+        await bot.close_session()
+        return elapsed, samples
+
+    return asyncio.run(run())
+
+def percentile(latencies, p):
+    """
+    Nearest-rank percentile of a sorted list
+    """
+    return latencies[max(0, min(len(latencies) - 1, round(p / 100 * len(latencies)) - 1))]
+
+def report(elapsed, samples, server):
+    by_handler = {}
+    for handler, latency in samples:
+        by_handler.setdefault(handler, []).append(latency * 1000)
+
+    print(f"{'handler':<32}{'count':>8}{'p50 (ms)':>12}{'p95 (ms)':>12}{'p99 (ms)':>12}")
+    for handler, latencies in [*by_handler.items(), ("all", [latency * 1000 for _, latency in samples])]:
+        latencies.sort()
+        print(f"{handler:<32}{len(latencies):>8}{percentile(latencies, 50):>12.2f}{percentile(latencies, 95):>12.2f}{percentile(latencies, 99):>12.2f}")
+
+    from db.db import storage, to_bookings
+    statuses = [booking.status for booking in to_bookings(storage.all_bookings(date.min))]
+    booked, cancelled = statuses.count("booked"), statuses.count("cancelled")
+    print(f"\n{len(samples)} updates in {elapsed:.2f} s: {len(samples) / elapsed:.1f} updates/s")
+    print(f"bookings: {booked} booked, {cancelled} cancelled; API calls: {dict(sorted(server.calls.items()))}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--engine", choices=["sync", "async"], default="sync")
+    parser.add_argument("--backend", choices=["postgres", "memory"], default="postgres")
+    parser.add_argument("--workers", type=int, default=8, help="Thread pool size for the sync engine")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the fake Telegram API takes per call")
+    parser.add_argument("--runs", type=int, default=1, help="Repeat the whole benchmark on a fresh schema")
+    args = parser.parse_args()
+    os.environ["STORAGE_BACKEND"] = args.backend # Read by config, which nothing has imported yet
+
+    server = FakeTelegramServer(latency=args.latency).start()
+    apihelper.API_URL = server.api_url
+    asyncio_helper.API_URL = server.api_url
+
+    for run in range(1, args.runs + 1):
+        print(f"\n=== run {run}/{args.runs}: {args.engine} engine, {args.backend} storage, {args.users} users, {args.latency * 1000:.0f} ms API latency ===\n")
+        reset_schema()
+        server.calls.clear()
+        server.markups.clear()
+
+        if args.engine == "async":
+            elapsed, samples = run_async(args.users, server)
+        else:
+            elapsed, samples = run_sync(args.users, server, args.workers)
+
+        report(elapsed, samples, server)
+
+    server.stop()
@@ -0,0 +1,131 @@
+"""
+Sync (TeleBot) against async (AsyncTeleBot) engine on the same scripted flows.
+
+Each simulated user runs start -> get availability for a date -> the full book flow, one update after another.
+Users run concurrently: on a thread pool for the sync engine, as tasks on one event loop for the async engine.
+Telegram is replaced by benchmarks.fake_telegram; the database is DATABASE_URL, in a throwaway schema.
+From src/:
+    python -m benchmarks.engines [--users 50] [--workers 8] [--latency 0.05]
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+SCHEMA = "bench_engines"
+os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA}" # Must be set before the pool opens its first connection
+
+import asyncio
+import psycopg2
+import telebot
+from telebot import apihelper, asyncio_helper, types
+from benchmarks import updates
+from benchmarks.fake_telegram import FakeTelegramServer
+from config import DATABASE_URL
+
+TOKEN = "123456:benchmark"
+
+def user_flow(user_id):
+    day = (date.today() + timedelta(days=user_id % 7)).strftime("%d/%m/%Y")
+    start_hour = 8 + user_id // 21 % 14
+    level = 9 + user_id // 7 % 3
+    return [
+        updates.message(user_id, "/start"),
+        updates.callback(user_id, "get_availability_select_date"),
+        updates.callback(user_id, f"get_availability_date_selected+{day}"),
+        updates.callback(user_id, "book_select_lounge"),
+        updates.callback(user_id, f"book_level_{level}"),
+        updates.callback(user_id, f"book_date_selected+{level}+{day}"),
+        updates.message(user_id, f"{start_hour:02d}00"),
+        updates.message(user_id, f"{start_hour:02d}45"),
+    ]
+
+def reset_schema():
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+    conn.close()
+
+    from db.db import db_handler, availability_cache
+    from db.migrations import run_migrations
+    availability_cache.clear()
+    run_migrations(db_handler)
+
+def run_sync(flows, workers):
+    from callbacks.callbacks import callback_handlers
+    from commands import command_handlers
+
+    bot = telebot.TeleBot(TOKEN, threaded=False)
+    command_handlers(bot)
+    board = callback_handlers(bot)
+
+    latencies = []
+    def run_user(flow):
+        for update in flow:
+            start = time.perf_counter()
+            bot.process_new_updates([types.Update.de_json(update)])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(run_user, flows))
+    elapsed = time.perf_counter() - start
+    board.close()
+    return elapsed, latencies
+
+def run_async(flows):
+    from aio.bot import create_bot
+
+    async def run():
+        bot, board = create_bot(TOKEN)
+        latencies = []
+
+        async def run_user(flow):
+            for update in flow:
+                start = time.perf_counter()
+                await bot.process_new_updates([types.Update.de_json(update)])
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_user(flow) for flow in flows))
+        elapsed = time.perf_counter() - start
+        await asyncio.to_thread(board.close)
+        await bot.close_session()
+        return elapsed, latencies
+
+    return asyncio.run(run())
+
+def count_bookings():
+    from db.db import db_handler
+    return db_handler.execute_query("SELECT COUNT(*) FROM bookings")[0][0]
+
+def report(name, elapsed, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{name:<8}{elapsed:>10.2f}{len(latencies) / elapsed:>14.1f}{p50:>12.1f}{p95:>12.1f}{count_bookings():>10}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=8, help="Thread pool size for the sync engine")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds the fake Telegram API takes per call")
+    args = parser.parse_args()
+
+    server = FakeTelegramServer(latency=args.latency).start()
+    apihelper.API_URL = server.api_url
+    asyncio_helper.API_URL = server.api_url
+
+    print(f"{args.users} users x {len(user_flow(0))} updates, {args.latency * 1000:.0f} ms API latency\n")
+    print(f"{'engine':<8}{'wall (s)':>10}{'updates/s':>14}{'p50 (ms)':>12}{'p95 (ms)':>12}{'booked':>10}")
+
+    reset_schema()
+    report("sync", *run_sync([user_flow(i) for i in range(args.users)], args.workers))
+
+    reset_schema()
+    report("async", *run_async([user_flow(i) for i in range(args.users)]))
+
+    server.stop()
@@ -0,0 +1,147 @@
+"""
+Local stand-in for the Telegram Bot API, so benchmarks can drive the real handlers offline.
+Answers every method with a plausible result after an optional fixed latency.
+With flood_limits it also answers send* methods with 429, like Telegram, once a chat or the whole bot sends too fast.
+"""
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, flood_limits=None):
+        """
+        flood_limits is (per second globally, per second per private chat, per minute per group chat), or None for no limits
+        """
+        super().__init__((host, port), FakeTelegramHandler)
+        self.latency = latency
+        self.flood_limits = flood_limits
+        self.sent = {} # chat_id (None for all chats) -> deque of monotonic send times
+        self.flooded = 0
+        self.message_ids = itertools.count(10_000)
+        self.calls = {}
+        self.markups = {} # chat_id -> reply_markup of the last message sent there
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def api_url(self):
+        """
+        Format string for telebot.apihelper.API_URL and telebot.asyncio_helper.API_URL
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/bot{{0}}/{{1}}"
+
+    def record(self, method, params):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            if method == "sendMessage" and "reply_markup" in params:
+                markup = params["reply_markup"]
+                self.markups[str(params.get("chat_id"))] = json.loads(markup) if isinstance(markup, str) else markup
+
+    def flood(self, chat_id):
+        """
+        Seconds the caller has to wait if sending to chat_id now breaks a flood limit, else 0 and the send is counted
+        """
+        if self.flood_limits is None or chat_id is None:
+            return 0
+
+        per_second, per_chat, per_group = self.flood_limits
+        group = str(chat_id).startswith("-")
+        now = time.monotonic()
+        with self._lock:
+            checks = ((None, 1.0, per_second), (str(chat_id), 60.0 if group else 1.0, per_group if group else per_chat))
+            for key, window, limit in checks:
+                times = self.sent.setdefault(key, deque())
+                while times and times[0] <= now - window:
+                    times.popleft()
+                if len(times) >= limit:
+                    self.flooded += 1
+                    return max(1, round(times[0] + window - now))
+
+            for key, _, _ in checks:
+                self.sent[key].append(now)
+            return 0
+
+    def callback_data(self, chat_id, prefix):
+        """
+        callback_data of the first button starting with prefix in the last markup sent to chat_id, or None
+        """
+        with self._lock:
+            markup = self.markups.get(str(chat_id)) or {}
+        for row in markup.get("inline_keyboard", []):
+            for button in row:
+                if button.get("callback_data", "").startswith(prefix):
+                    return button["callback_data"]
+        return None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like api.telegram.org
+    disable_nagle_algorithm = True # Headers and body go out as separate writes; Nagle would hold the body ~40 ms
+
+    def _params(self):
+        params = {key: values[0] for key, values in parse_qs(self.path.partition("?")[2]).items()}
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            body = self.rfile.read(length).decode()
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                params.update(json.loads(body))
+            else:
+                params.update({key: values[0] for key, values in parse_qs(body).items()})
+        return params
+
+    def _respond(self):
+        method = self.path.partition("?")[0].rsplit("/", 1)[-1]
+        params = self._params()
+        self.server.record(method, params)
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        retry_after = self.server.flood(params.get("chat_id")) if method.startswith("send") else 0
+        if retry_after:
+            self._reply(429, {"ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {retry_after}", "parameters": {"retry_after": retry_after}})
+            return
+
+        if method in ("sendMessage", "editMessageText"):
+            result = {
+                "message_id": next(self.server.message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        elif method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Lounge Bot", "username": "lounge_bot"}
+        else:
+            result = True
+
+        self._reply(200, {"ok": True, "result": result})
+
+    def _reply(self, status, response):
+        body = json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _respond
+    do_POST = _respond
+
+    def log_message(self, format, *args):
+        pass
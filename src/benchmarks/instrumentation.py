@@ -0,0 +1,47 @@
+"""
+Cost of the metrics instrumentation per recorded event, and of rendering a scrape.
+
+No network or database needed.
+From src/:
+    python -m benchmarks.instrumentation [--number 200000]
+"""
+import argparse
+import timeit
+from metrics import Counter, Histogram, Registry, track, timed_handler
+
+def handler(message):
+    return message
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=200_000)
+    args = parser.parse_args()
+
+    registry = Registry()
+    histogram = registry.register(Histogram("bench_seconds", "Benchmark histogram", ["handler"]))
+    errors = registry.register(Counter("bench_errors_total", "Benchmark errors", ["handler"]))
+    wrapped = timed_handler("bench")(handler)
+
+    def tracked():
+        with track(histogram, errors, "bench"):
+            pass
+
+    cases = (
+        ("bare handler call", lambda: handler(None)),
+        ("Counter.inc", lambda: errors.inc("bench")),
+        ("Histogram.observe", lambda: histogram.observe(0.004, "bench")),
+        ("track() block", tracked),
+        ("timed_handler call", lambda: wrapped(None)),
+    )
+
+    print(f"best of 5 x {args.number} calls\n")
+    print(f"{'operation':<24}{'ns/call':>10}")
+    for name, case in cases:
+        best = min(timeit.repeat(case, number=args.number, repeat=5)) / args.number * 1e9
+        print(f"{name:<24}{best:>10.0f}")
+
+    for handlers in (10, 100):
+        for i in range(handlers):
+            histogram.observe(0.01, f"handler_{i}")
+        best = min(timeit.repeat(registry.render, number=100, repeat=5)) / 100 * 1e3
+        print(f"\nscrape with {handlers} labelled series: {best:.2f} ms")
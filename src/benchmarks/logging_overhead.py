@@ -0,0 +1,91 @@
+"""
+Handler latency with logging off, logging straight to the output stream (the old basicConfig setup),
+and logging through the queue from logs.setup_logging, with and without sampling.
+
+Runs the benchmarks.e2e sessions once per mode against the fake Telegram API and DATABASE_URL.
+--write-latency makes every write to the log output take that long, like a slow terminal or a full pipe.
+From src/:
+    python -m benchmarks.logging_overhead [--users 40] [--workers 8] [--write-latency 0.0005] [--output /dev/null]
+"""
+import argparse
+import logging
+import time
+from benchmarks import e2e
+from benchmarks.fake_telegram import FakeTelegramServer
+from logs import TextFormatter, setup_logging, shutdown_logging
+from telebot import apihelper
+
+HOT_LOGGERS = ("db", "helpers", "callback (get)", "callback (book)", "callback (unbook)", "callback (free slots)", "callback (back)")
+
+class SlowStream:
+    """
+    File-like object whose writes each take latency seconds
+    """
+    def __init__(self, stream, latency):
+        self.stream = stream
+        self.latency = latency
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def direct_logging(level, stream):
+    """
+    One StreamHandler on the root logger, formatting and writing in the thread that logs
+    """
+    shutdown_logging()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(TextFormatter())
+    root.addHandler(handler)
+    root.setLevel(level)
+
+MODES = {
+    "off": lambda stream: setup_logging(level="WARNING", stream=stream),
+    "direct": lambda stream: direct_logging("INFO", stream),
+    "queue": lambda stream: setup_logging(level="INFO", stream=stream),
+    "queue, sampled 10%": lambda stream: setup_logging(level="INFO", stream=stream, sample_rates=dict.fromkeys(HOT_LOGGERS, 0.1)),
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--write-latency", type=float, default=0.0005, help="Seconds each write to the log output takes")
+    parser.add_argument("--output", default="/dev/null", help="Where log lines go")
+    args = parser.parse_args()
+
+    server = FakeTelegramServer().start()
+    apihelper.API_URL = server.api_url
+
+    results = []
+    with open(args.output, "w") as output:
+        for mode, configure in MODES.items():
+            stream = SlowStream(output, args.write_latency)
+            configure(stream)
+
+            e2e.reset_schema()
+            server.calls.clear()
+            server.markups.clear()
+            elapsed, samples = e2e.run_sync(args.users, server, args.workers)
+
+            shutdown_logging() # Waits for the queue to drain, so lines below counts every record
+            latencies = sorted(latency * 1000 for _, latency in samples)
+            results.append((mode, e2e.percentile(latencies, 50), e2e.percentile(latencies, 95), len(samples) / elapsed, stream.writes))
+
+    server.stop()
+    setup_logging()
+
+    print(f"\n{args.users} users, {args.workers} workers, {args.write_latency * 1000:.2f} ms per log write\n")
+    print(f"{'logging':<24}{'p50 (ms)':>12}{'p95 (ms)':>12}{'updates/s':>12}{'lines':>10}")
+    for mode, p50, p95, throughput, lines in results:
+        print(f"{mode:<24}{p50:>12.2f}{p95:>12.2f}{throughput:>12.1f}{lines:>10}")
@@ -0,0 +1,101 @@
+"""
+How soon a booking write in one process reaches the caches of another, through the LISTEN/NOTIFY trigger.
+
+Writes go through the bot's own db functions on the pool, and a BookingListener on its own connection
+stands in for a second bot process (to Postgres they are separate sessions either way). For each write the
+time from starting it to the listener hearing of it is measured, next to the time the write itself took.
+Without notifications another process keeps serving its cached availability for up to AVAILABILITY_CACHE_TTL.
+The database is DATABASE_URL, in a throwaway schema; --partitioned converts bookings to a partitioned table first.
+From src/:
+    python -m benchmarks.notify [--writes 200] [--partitioned]
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+SCHEMA = "bench_notify"
+os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA}" # Must be set before the pool opens its first connection
+
+import psycopg2
+from benchmarks.e2e import percentile
+from config import DATABASE_URL
+from db import db
+from db.migrations import run_migrations
+from db.notify import BookingListener
+from db.partitions import partition_bookings
+
+def reset_schema(partitioned):
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+    conn.close()
+
+    run_migrations(db.db_handler)
+    if partitioned:
+        partition_bookings(db.db_handler, datetime.now(ZoneInfo("Asia/Singapore")).date())
+
+def writes(n, today):
+    """
+    (level, date, write) for n writes alternating a booking and its cancellation, on a different (level, date) each time
+    """
+    for i in range(n // 2):
+        level, day = 9 + i % 3, today + timedelta(days=i // 3 % 28)
+        start = f"{8 + i // 84 % 14:02d}00"
+        booked = {}
+
+        def book(level=level, day=day, start=start, booked=booked):
+            booked["id"], _ = db.book_if_free(level, datetime.now(), "bench", "Bench", 1, day.strftime("%d/%m/%Y"), start, start[:2] + "30")
+
+        def cancel(level=level, day=day, booked=booked):
+            db.cancel_booking(level, booked["id"], day)
+
+        yield level, day, book
+        yield level, day, cancel
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--partitioned", action="store_true")
+    args = parser.parse_args()
+
+    reset_schema(args.partitioned)
+
+    heard = {}
+    arrived = threading.Condition()
+
+    def on_change(level, timeslot_date):
+        with arrived:
+            heard[(level, timeslot_date)] = time.perf_counter()
+            arrived.notify_all()
+
+    listener = BookingListener(DATABASE_URL, poll_interval=0.1)
+    listener.subscribe(on_change)
+    listener.start()
+    listener.connected.wait(10)
+
+    write_times, delays, missed = [], [], 0
+    for level, day, write in writes(args.writes, datetime.now(ZoneInfo("Asia/Singapore")).date()):
+        with arrived:
+            heard.pop((level, day), None)
+
+        started = time.perf_counter()
+        write()
+        write_times.append((time.perf_counter() - started) * 1000)
+
+        with arrived:
+            if arrived.wait_for(lambda: (level, day) in heard, timeout=2):
+                delays.append((heard[(level, day)] - started) * 1000)
+            else:
+                missed += 1
+
+    listener.stop()
+    db.db_handler.execute_query(f"DROP SCHEMA {SCHEMA} CASCADE;")
+
+    print(f"\n{args.writes} writes{' on a partitioned table' if args.partitioned else ''}, {missed} not heard within 2 s\n")
+    print(f"{'':<28}{'p50 (ms)':>10}{'p95 (ms)':>10}{'max (ms)':>10}")
+    for name, values in (("write (commit returned)", sorted(write_times)), ("write to other process", sorted(delays))):
+        print(f"{name:<28}{percentile(values, 50):>10.2f}{percentile(values, 95):>10.2f}{values[-1] if values else 0:>10.2f}")
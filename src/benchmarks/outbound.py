@@ -0,0 +1,90 @@
+"""
+A burst of handlers sending straight to the Bot API (what every handler did before outbound.SendScheduler)
+against the same handlers queueing their sends, with Telegram's flood limits enforced by benchmarks.fake_telegram.
+
+Each simulated handler removes the keyboard and replies in its user's chat, and every --group-every-th one
+also posts to the group topic, like a booking for today does. Handlers run on a thread pool, like TeleBot's.
+Reported: time handlers spent sending, sends that failed inside a handler, and when the last reply and the last
+group post reached Telegram.
+From src/:
+    python -m benchmarks.outbound [--users 100] [--workers 8] [--group-every 5] [--latency 0.02]
+"""
+import argparse
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import telebot
+from telebot import apihelper
+from benchmarks.e2e import percentile
+from benchmarks.fake_telegram import FakeTelegramServer
+from outbound import SendScheduler
+
+TOKEN = "123456:benchmark"
+GROUP_CHAT_ID = "-1001234567890"
+FLOOD_LIMITS = (30, 1, 20) # Telegram's documented limits: per second, per second per chat, per minute per group
+
+def handler(bot, user_id, group, sent):
+    """
+    One handler's sends. Returns (seconds spent in the handler, sends that failed in it, futures of queued sends).
+    sent gets ('reply' or 'group', time) as each send reaches Telegram.
+    """
+    calls = [
+        ("reply", lambda: bot.edit_message_reply_markup(chat_id=user_id, message_id=1, reply_markup=None)),
+        ("reply", lambda: bot.send_message(user_id, "Booking confirmed for level 10 on 18/10/2026 from 1900 to 2100.")),
+    ]
+    if group:
+        calls.append(("group", lambda: bot.send_message(GROUP_CHAT_ID, "Lounge bookings for today", message_thread_id=7)))
+
+    start = time.perf_counter()
+    failed = 0
+    futures = []
+    for kind, call in calls:
+        try:
+            result = call()
+        except Exception:
+            failed += 1
+            continue
+
+        if isinstance(result, Future):
+            result.add_done_callback(lambda future, kind=kind: future.exception() or sent.append((kind, time.perf_counter())))
+            futures.append(result)
+        else:
+            sent.append((kind, time.perf_counter()))
+    return time.perf_counter() - start, failed, futures
+
+def run(mode, args):
+    server = FakeTelegramServer(latency=args.latency, flood_limits=FLOOD_LIMITS).start()
+    apihelper.API_URL = server.api_url
+
+    bot = telebot.TeleBot(TOKEN, threaded=False)
+    scheduler = SendScheduler(max_queue=10_000).install(bot) if mode == "queued" else None
+
+    sent = []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(lambda user_id: handler(bot, user_id, user_id % args.group_every == 0, sent), range(1, args.users + 1)))
+
+    futures = [future for _, _, user_futures in results for future in user_futures]
+    wait(futures)
+    if scheduler is not None:
+        scheduler.close()
+    server.stop()
+
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in results)
+    failed = sum(failed for _, failed, _ in results) + sum(1 for future in futures if future.exception())
+    last = {kind: max((at - started for sent_kind, at in sent if sent_kind == kind), default=0) for kind in ("reply", "group")}
+    return percentile(latencies, 50), percentile(latencies, 95), failed, server.flooded, last["reply"], last["group"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--group-every", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the fake Bot API takes per call")
+    args = parser.parse_args()
+
+    print(f"\n{args.users} handlers, {args.workers} workers, a group post every {args.group_every}, {args.latency * 1000:.0f} ms per call")
+    print(f"flood limits: {FLOOD_LIMITS[0]}/s, {FLOOD_LIMITS[1]}/s per chat, {FLOOD_LIMITS[2]}/min per group\n")
+    print(f"{'sends':<10}{'handler p50 (ms)':>18}{'p95 (ms)':>10}{'failed':>8}{'429s':>7}{'last reply (s)':>16}{'last group (s)':>16}")
+    for mode in ("direct", "queued"):
+        p50, p95, failed, flooded, last_reply, last_group = run(mode, args)
+        print(f"{mode:<10}{p50:>18.2f}{p95:>10.2f}{failed:>8}{flooded:>7}{last_reply:>16.2f}{last_group:>16.2f}")
@@ -0,0 +1,88 @@
+"""
+Round-trip time of the hot statements sent as full SQL text on every call (DB_PREPARE_STATEMENTS=false,
+the path every query took before the statement registry) against prepared once and executed by name.
+
+Runs against DATABASE_URL in a throwaway schema, one connection per handler.
+From src/:
+    python -m benchmarks.prepared_statements [--rows 100000] [--repeat 2000]
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+SCHEMA = "bench_prepared"
+os.environ["PGOPTIONS"] = f"-c search_path={SCHEMA}" # Must be set before the pool opens its first connection
+
+import psycopg2
+from benchmarks.e2e import percentile
+from benchmarks.query_plans import TODAY, populate_query
+from config import DATABASE_URL
+from db.db import DatabaseHandler
+from db.query import create_tables_query, create_indexes_query
+
+def setup(rows):
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA};")
+        cursor.execute(create_tables_query())
+        cursor.execute(populate_query(), (TODAY, rows, rows))
+        cursor.execute(create_indexes_query())
+        cursor.execute("ANALYZE bookings;")
+        cursor.execute("SELECT level, timeslot_start_time, timeslot_end_time FROM bookings WHERE timeslot_date = %s AND status = 'booked' LIMIT 1;", (TODAY,))
+        clash = cursor.fetchone()
+    conn.close()
+    return clash
+
+def cases(clash):
+    level, start, end = clash
+    booking = dict(
+        level=level, booking_datetime=datetime.now(), username="bench", first_name="Bench", user_chat_id=1,
+        timeslot_date=TODAY, timeslot_start_time=start, timeslot_end_time=end
+    )
+    return (
+        ("get_bookings_by_date", lambda handler: handler.bookings_by_date(TODAY, "booked")),
+        ("get_bookings_by_id", lambda handler: handler.bookings_by_id(100042, "booked", TODAY)),
+        ("get_bookings_between (week)", lambda handler: handler.bookings_between(TODAY, TODAY + timedelta(days=6), "booked")),
+        ("book_if_free (clash)", lambda handler: handler.book_if_free(**booking)),
+        ("cancel_booking (no match)", lambda handler: handler.cancel_booking(-1, TODAY)),
+    )
+
+def measure(handler, case, repeat):
+    case(handler) # Warm up: checks out the connection and, when preparing, prepares the statement
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        case(handler)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    latencies.sort()
+    return percentile(latencies, 50), percentile(latencies, 95)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    clash = setup(args.rows)
+    handlers = {
+        "text": DatabaseHandler(DATABASE_URL, min_size=1, max_size=1, prepare=False),
+        "prepared": DatabaseHandler(DATABASE_URL, min_size=1, max_size=1, prepare=True),
+    }
+
+    print(f"\n{args.rows:,} rows, {args.repeat} calls per statement\n")
+    print(f"{'statement':<30}{'text p50/p95 (us)':>22}{'prepared p50/p95 (us)':>26}{'p50 speedup':>14}")
+    for name, case in cases(clash):
+        results = {mode: measure(handler, case, args.repeat) for mode, handler in handlers.items()}
+        text, prepared = results["text"], results["prepared"]
+        print(f"{name:<30}{text[0]:>12.0f} / {text[1]:<7.0f}{prepared[0]:>16.0f} / {prepared[1]:<7.0f}{text[0] / prepared[0]:>13.2f}x")
+
+    for handler in handlers.values():
+        handler.close()
+
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA {SCHEMA} CASCADE;")
+    conn.close()
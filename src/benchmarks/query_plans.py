@@ -0,0 +1,127 @@
+"""
+Query plans and latencies for the hot booking queries: without indexes, after the index migration,
+and after converting the table to monthly partitions.
+
+Runs against DATABASE_URL in a throwaway schema, so it never touches the real bookings table.
+From src/:
+    python -m benchmarks.query_plans [--rows 10000 100000 1000000] [--repeat 50]
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta, time as dtime
+import psycopg2
+from config import DATABASE_URL
+from db.partitions import convert_to_partitioned
+from db.query import create_tables_query, create_indexes_query, index_retention_by_timeslot_date_query, get_all_bookings_query, get_bookings_between_query, get_bookings_by_date_query, get_bookings_by_id_query
+
+SCHEMA = "bench_query_plans"
+TODAY = date(2026, 10, 18)
+
+def populate_query():
+    """
+    Bookings spread over two years up to a month ahead of TODAY, three levels, 2000 users, 10% cancelled.
+    """
+    query = """
+    INSERT INTO bookings (booking_datetime, level, username, first_name, user_chat_id, timeslot_date, timeslot_start_time, timeslot_end_time, status)
+    SELECT
+        d - INTERVAL '3 days' + (i %% 86400) * INTERVAL '1 second',
+        9 + i %% 3,
+        'user' || (i %% 2000),
+        'User',
+        100000 + i %% 2000,
+        d,
+        TIME '08:00' + (i %% 14) * INTERVAL '1 hour',
+        TIME '09:00' + (i %% 14) * INTERVAL '1 hour',
+        CASE WHEN i %% 10 = 0 THEN 'cancelled' ELSE 'booked' END
+    FROM (
+        SELECT i, %s::date - 730 + (i * 760 / %s) AS d
+        FROM generate_series(0, %s - 1) AS i
+    ) AS s;
+    """
+    return query
+
+def clash_query():
+    # The read half of book_if_free_query
+    return """
+    SELECT booking_id, timeslot_start_time, timeslot_end_time
+    FROM bookings
+    WHERE level = %s AND timeslot_date = %s AND status = 'booked' AND timeslot_start_time < %s AND timeslot_end_time > %s
+    ORDER BY timeslot_start_time
+    LIMIT 1;
+    """
+
+def retention_query():
+    return "SELECT COUNT(*) FROM bookings WHERE timeslot_date < %s;"
+
+HOT_QUERIES = [
+    ("get_bookings_by_date", get_bookings_by_date_query(), (TODAY,)),
+    ("get_bookings_by_id", get_bookings_by_id_query(), (100042, TODAY)),
+    ("get_all_bookings", get_all_bookings_query(), (TODAY,)),
+    ("get_bookings_between (week)", get_bookings_between_query(), (TODAY, TODAY + timedelta(days=6))),
+    ("book_if_free (clash check)", clash_query(), (10, TODAY, dtime(12), dtime(10))),
+    ("clear_old_bookings (cutoff)", retention_query(), (date(2024, 12, 1),)),
+]
+
+def measure(cursor, query, params, repeat):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) " + query, params)
+    plan = "\n".join(row[0] for row in cursor.fetchall())
+
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return plan, statistics.median(latencies), max(latencies)
+
+def run(rows, repeat, show_plans):
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA};")
+        cursor.execute(create_tables_query())
+
+        start = time.perf_counter()
+        cursor.execute(populate_query(), (TODAY, rows, rows))
+        cursor.execute("ANALYZE bookings;")
+        print(f"\n=== {rows:,} rows (loaded in {time.perf_counter() - start:.1f}s) ===")
+
+        results = {}
+        phases = (
+            ("no indexes", None),
+            ("indexed", lambda cursor: cursor.execute(create_indexes_query() + index_retention_by_timeslot_date_query())),
+            ("partitioned", lambda cursor: convert_to_partitioned(cursor, TODAY)),
+        )
+        for phase, setup in phases:
+            if setup:
+                start = time.perf_counter()
+                setup(cursor)
+                cursor.execute("ANALYZE bookings;")
+                print(f"{phase} setup took {time.perf_counter() - start:.1f}s")
+
+            for name, query, params in HOT_QUERIES:
+                plan, p50, worst = measure(cursor, query, params, repeat)
+                results.setdefault(name, {})[phase] = (p50, worst)
+                if show_plans:
+                    print(f"\n--- {name} ({phase}) ---\n{plan}")
+
+        print(f"\n{'query':<30}" + "".join(f"{phase + ' p50/max (ms)':>28}" for phase, _ in phases))
+        for name, latencies in results.items():
+            print(f"{name:<30}" + "".join(f"{latencies[phase][0]:>17.3f} / {latencies[phase][1]:<8.3f}" for phase, _ in phases))
+
+        cursor.execute(f"DROP SCHEMA {SCHEMA} CASCADE;")
+
+    conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--no-plans", action="store_true", help="Only print the latency table")
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        run(rows, args.repeat, not args.no_plans)
@@ -0,0 +1,101 @@
+"""
+Rendering availability messages for a busy week: the old per-row formatting (a clock read, timezone correction
+and string += per booking, copied below) against render.py.
+
+No database needed; bookings are generated as Booking records, sorted the way fetch_bookings_between returns them.
+From src/:
+    python -m benchmarks.render [--bookings 300] [--number 200]
+"""
+import argparse
+import timeit
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+from zoneinfo import ZoneInfo
+from constants import UTC_DIFF_HOURS
+from db.models import Booking
+from render import booked_now, format_availability_message, format_availability_all
+
+START_DATE = date(2026, 10, 18)
+
+def make_bookings(n):
+    """
+    n bookings over the week from START_DATE, made between a minute and a day ago
+    """
+    now = booked_now()
+    bookings = [
+        Booking(
+            i, now - timedelta(minutes=1 + i * 1439 // n, seconds=10), 9 + i % 3, f"user{i}", "User", 100000 + i,
+            START_DATE + timedelta(days=i % 7), time(8 + i // 21 % 15, i % 4 * 15), time(9 + i // 21 % 15, i % 4 * 15), "booked"
+        )
+        for i in range(n)
+    ]
+    return sorted(bookings, key=lambda booking: (booking.timeslot_date, booking.level, booking.timeslot_start_time))
+
+def old_availability_message(date, bookings):
+    bookings = [booking for booking in bookings if booking.status == "booked"]
+    response = f"\U0001F4DA Lounge bookings for {date}\U0001F4DA\n"
+    if not bookings:
+        response += "\nNo bookings for that day!\n"
+    else:
+        for level in range(9, 12):
+            level_bookings = [booking for booking in bookings if booking.level == level]
+            level_bookings.sort(key=lambda booking: booking.timeslot_start_time)
+            if level_bookings:
+                prefix = "\U0001F467\U0001F467" if level == 9 else "\U0001F466\U0001F466" if level == 10 else "\U0001F466\U0001F467"
+                response += f"\n{prefix} Level {level} {prefix}\n"
+                for row in level_bookings:
+                    start_time = row.timeslot_start_time.strftime('%H:%M')
+                    end_time = row.timeslot_end_time.strftime('%H:%M')
+                    booking_time = row.booking_datetime.replace(tzinfo=ZoneInfo('UTC'))
+                    booking_time = datetime.now(ZoneInfo('UTC')) - booking_time
+                    booking_time += timedelta(hours=UTC_DIFF_HOURS)
+                    booking_time = booking_time.seconds
+                    booking_time = "seconds" if booking_time < 60 else f"{round(booking_time / 60)} mins" if booking_time < 3600 else f"{round(booking_time / 3600)} hrs" if booking_time < 86400 else f"{round(booking_time / 86400)} days"
+                    response += f"• *{start_time} - {end_time}* by {row.first_name} (@{row.username}), {booking_time} ago\n"
+    return response
+
+def old_availability_all(start_date, bookings, days=7):
+    response = ""
+    bookings_by_date = {date: list(group) for date, group in groupby(bookings, key=lambda booking: booking.timeslot_date)}
+    for date in (start_date + timedelta(days=i) for i in range(days)):
+        bookings_for_date = bookings_by_date.get(date)
+        if not bookings_for_date:
+            response += f"\U0001F4DA Lounge bookings for {date.strftime("%d/%m/%Y")}\U0001F4DA\nAll lounges are unbooked!\n\n"
+        else:
+            response += f"\U0001F4DA Lounge bookings for {date.strftime("%d/%m/%Y")}\U0001F4DA\n"
+            for level, level_group in groupby(bookings_for_date, key=lambda booking: booking.level):
+                prefix = "\U0001F467\U0001F467" if level == 9 else "\U0001F466\U0001F466" if level == 10 else "\U0001F466\U0001F467"
+                response += f"\n{prefix} Level {level} {prefix}\n"
+                for row in level_group:
+                    start_time = row.timeslot_start_time.strftime("%H:%M")
+                    end_time = row.timeslot_end_time.strftime("%H:%M")
+                    booking_time = row.booking_datetime.replace(tzinfo=ZoneInfo('UTC'))
+                    booking_time = datetime.now(ZoneInfo('UTC')) - booking_time
+                    booking_time += timedelta(hours=UTC_DIFF_HOURS)
+                    booking_time = booking_time.seconds
+                    booking_time = "seconds" if booking_time < 60 else f"{round(booking_time / 60)} mins" if booking_time < 3600 else f"{round(booking_time / 3600)} hrs" if booking_time < 86400 else f"{round(booking_time / 86400)} days"
+                    response += f"• *{start_time} - {end_time}* by {row.first_name} (@{row.username}) {booking_time} ago\n"
+            response += "\n"
+    return response
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=300)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    week = make_bookings(args.bookings)
+    day = [booking for booking in week if booking.timeslot_date == START_DATE]
+    day_str = START_DATE.strftime("%d/%m/%Y")
+    assert old_availability_message(day_str, day) == format_availability_message(day_str, day)
+    assert old_availability_all(START_DATE, week) == format_availability_all(START_DATE, week)
+
+    print(f"{args.bookings} bookings in the week, {len(day)} on {day_str}, best of 5 x {args.number} runs\n")
+    print(f"{'message':<28}{'per row (us)':>14}{'render.py (us)':>16}{'speedup':>10}")
+    for name, old, new in (
+        ("get_availability_message", lambda: old_availability_message(day_str, day), lambda: format_availability_message(day_str, day)),
+        ("get_availability_all", lambda: old_availability_all(START_DATE, week), lambda: format_availability_all(START_DATE, week)),
+    ):
+        before = min(timeit.repeat(old, number=args.number, repeat=5)) / args.number * 1e6
+        after = min(timeit.repeat(new, number=args.number, repeat=5)) / args.number * 1e6
+        print(f"{name:<28}{before:>14.1f}{after:>16.1f}{before / after:>9.1f}x")
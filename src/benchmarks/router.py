@@ -0,0 +1,82 @@
+"""
+Dispatch latency of one callback query, with telebot testing a predicate per handler (the old path)
+against a single CallbackRouter handler (the new path), as the number of registered routes grows.
+
+No network or database needed; updates go straight into TeleBot.process_new_updates.
+From src/:
+    python -m benchmarks.router [--routes 10 100 1000 10000] [--number 2000]
+"""
+import argparse
+import timeit
+from telebot import TeleBot, types
+from benchmarks import updates
+from callbacks.router import CallbackData, CallbackRouter
+
+def make_payloads(n):
+    """
+    n routes in the three shapes the bot uses: bare actions, '+' payloads and '_' payloads
+    """
+    payloads = []
+    for i in range(n):
+        if i % 3 == 0:
+            payloads.append(CallbackData(f"action_{i}_select"))
+        elif i % 3 == 1:
+            payloads.append(CallbackData(f"action_{i}_date_selected", ("level", int), "date"))
+        else:
+            payloads.append(CallbackData(f"action_{i}_selected", ("level", int), ("booking_id", int), "date", sep="_"))
+    return payloads
+
+def sample_data(payload):
+    values = {str: "18/10/2026", int: 10}
+    if payload.sep == "_":
+        values[str] = "2026-10-18"
+    return payload.new(*(values[convert] for _, convert in payload.fields))
+
+def predicate_bot(payloads, handled):
+    # Old style: one handler per route, startswith for payloads that carry data
+    bot = TeleBot("1:benchmark", threaded=False)
+    for payload in payloads:
+        action = payload.action
+        if payload.fields:
+            bot.callback_query_handler(func=lambda call, action=action: call.data.startswith(action))(lambda call: handled.append(call.data))
+        else:
+            bot.callback_query_handler(func=lambda call, action=action: call.data == action)(lambda call: handled.append(call.data))
+    return bot
+
+def router_bot(payloads, handled):
+    bot = TeleBot("1:benchmark", threaded=False)
+    router = CallbackRouter()
+    for payload in payloads:
+        router.route(payload)(lambda call, *values: handled.append(call.data))
+    router.install(bot)
+    return bot
+
+def time_dispatch(bot, update, number):
+    return min(timeit.repeat(lambda: bot.process_new_updates([update]), number=number, repeat=5)) / number * 1e6
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--routes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"best of 5 x {args.number} dispatches, route registered first / middle / last\n")
+    print(f"{'routes':>8}{'position':>10}{'predicates (us)':>18}{'router (us)':>14}{'speedup':>10}")
+    for n in args.routes:
+        payloads = make_payloads(n)
+        handled = []
+        old, new = predicate_bot(payloads, handled), router_bot(payloads, handled)
+
+        for position, index in (("first", 0), ("middle", n // 2), ("last", n - 1)):
+            data = sample_data(payloads[index])
+            update = types.Update.de_json(updates.callback(1, data))
+
+            # Both must reach the same handler exactly once
+            handled.clear()
+            old.process_new_updates([update])
+            new.process_new_updates([update])
+            assert handled == [data, data], handled
+
+            before = time_dispatch(old, update, args.number)
+            after = time_dispatch(new, update, args.number)
+            print(f"{n:>8}{position:>10}{before:>18.1f}{after:>14.1f}{before / after:>9.1f}x")
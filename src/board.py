@@ -0,0 +1,210 @@
+"""
+Today's availability in one message in the group topic, edited in place instead of posting a new message
+after every booking and unbooking.
+
+Handlers report the dates they changed with touch(). A worker thread waits BOARD_DEBOUNCE seconds after the first
+change, so a burst of bookings makes one edit, then renders the day and edits its board. The first change of a day
+sends (and pins) a new board. Board message ids are kept in the boards table, so a restarted bot edits the same message.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from telebot.apihelper import ApiTelegramException
+from config import BOARD_DEBOUNCE, BOARD_PIN, get_chat_ids
+from db.db import db_handler, fetch_bookings_by_date
+from metrics import BOARD_EVENTS
+from render import format_availability_message
+
+logger = logging.getLogger("board")
+
+# Seconds to wait for a Bot API call made from the board thread
+CALL_TIMEOUT = 30.0
+
+class PostgresBoards:
+    """
+    Board message ids in the boards table (migration 6)
+    """
+    def __init__(self, db_handler):
+        self.db_handler = db_handler
+
+    def get(self, chat_id, board_date):
+        row = self.db_handler.run("get_board", chat_id, board_date)
+        return row[0] if row else None
+
+    def previous(self, chat_id, board_date):
+        row = self.db_handler.run("get_previous_board", chat_id, board_date)
+        return row[0] if row else None
+
+    def save(self, chat_id, board_date, message_id):
+        self.db_handler.run("save_board", chat_id=chat_id, board_date=board_date, message_id=message_id)
+
+class MemoryBoards:
+    """
+    Board message ids in this process, for the in-memory storage backend, whose bookings do not survive a restart either
+    """
+    def __init__(self):
+        self._boards = {} # chat_id -> (board_date, message_id) of its latest board
+
+    def get(self, chat_id, board_date):
+        board = self._boards.get(chat_id)
+        return board[1] if board and board[0] == board_date else None
+
+    def previous(self, chat_id, board_date):
+        board = self._boards.get(chat_id)
+        return board[1] if board and board[0] < board_date else None
+
+    def save(self, chat_id, board_date, message_id):
+        self._boards[chat_id] = (board_date, message_id)
+
+def call_sync(bot):
+    """
+    call(method, *args, **kwargs) on a TeleBot, waiting for sends the outbound queue returns as Futures
+    """
+    def call(method, *args, **kwargs):
+        result = getattr(bot, method)(*args, **kwargs)
+        return result.result(CALL_TIMEOUT) if isinstance(result, Future) else result
+    return call
+
+def call_async(bot, loop):
+    """
+    call(method, *args, **kwargs) on an AsyncTeleBot whose calls run on loop, from another thread
+    """
+    def call(method, *args, **kwargs):
+        result = asyncio.run_coroutine_threadsafe(getattr(bot, method)(*args, **kwargs), loop).result(CALL_TIMEOUT)
+        return result.result(CALL_TIMEOUT) if isinstance(result, Future) else result
+    return call
+
+def render_board(board_date):
+    return format_availability_message(board_date, fetch_bookings_by_date(board_date))
+
+class AvailabilityBoard:
+    """
+    The board of chat_id (in topic thread_id). call(method, *args, **kwargs) makes a Bot API call and returns its result.
+    """
+    def __init__(self, call, store, chat_id, thread_id=None, debounce=3.0, pin=True, render=render_board):
+        self.call = call
+        self.store = store
+        self.chat_id = chat_id
+        self.thread_id = thread_id
+        self.debounce = debounce
+        self.pin = pin
+        self.render = render
+
+        self._dirty = set() # Dates changed since the last update
+        self._texts = {} # board_date -> text last shown, to skip edits that change nothing
+        self._cond = threading.Condition()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="board", daemon=True)
+        self._thread.start()
+
+    def touch(self, *timeslot_dates):
+        """
+        Bookings changed on timeslot_dates. Only today's (SGT) has a board.
+        """
+        today = datetime.now(ZoneInfo("Asia/Singapore")).date()
+        if today not in timeslot_dates or self.chat_id is None:
+            return
+
+        BOARD_EVENTS.inc("touched")
+        with self._cond:
+            self._dirty.add(today)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._dirty and not self._stopping.is_set():
+                    self._cond.wait()
+                if not self._dirty:
+                    return
+
+            # Changes in the meantime join this update. close() cuts the wait short.
+            self._stopping.wait(self.debounce)
+            with self._cond:
+                dates, self._dirty = self._dirty, set()
+
+            for board_date in sorted(dates):
+                try:
+                    self._update(board_date)
+                except Exception as e:
+                    BOARD_EVENTS.inc("failed")
+                    logger.error("Error updating the board for %s: %s", board_date, e)
+
+    def _update(self, board_date):
+        text = self.render(board_date)
+        if self._texts.get(board_date) == text:
+            BOARD_EVENTS.inc("unchanged")
+            return
+
+        message_id = self.store.get(self.chat_id, board_date)
+        if message_id is not None and self._edit(message_id, text):
+            self._texts = {board_date: text}
+            return
+
+        self._send(board_date, text)
+        self._texts = {board_date: text}
+
+    def _edit(self, message_id, text):
+        """
+        Edit the board in place. Returns False if it no longer exists and a new one is needed.
+        """
+        try:
+            self.call("edit_message_text", text, chat_id=self.chat_id, message_id=message_id)
+        except ApiTelegramException as e:
+            if "message is not modified" in e.description:
+                BOARD_EVENTS.inc("unchanged")
+                return True
+            if "message to edit not found" in e.description:
+                logger.warning("Board message %s is gone, sending a new one", message_id)
+                return False
+            raise
+
+        BOARD_EVENTS.inc("edited")
+        return True
+
+    def _send(self, board_date, text):
+        message = self.call("send_message", self.chat_id, text, message_thread_id=self.thread_id)
+        previous = self.store.previous(self.chat_id, board_date)
+        self.store.save(self.chat_id, board_date, message.message_id)
+        BOARD_EVENTS.inc("sent")
+        logger.info("Sent the board for %s", board_date)
+
+        if not self.pin:
+            return
+
+        # Pinning needs the bot to be an admin. Without it the board still works, unpinned.
+        try:
+            if previous is not None:
+                self.call("unpin_chat_message", self.chat_id, previous)
+            self.call("pin_chat_message", self.chat_id, message.message_id, disable_notification=True)
+        except ApiTelegramException as e:
+            logger.warning("Could not pin the board: %s", e.description)
+
+    def close(self, timeout=10.0):
+        """
+        Make any pending update now, then stop
+        """
+        self._stopping.set()
+        with self._cond:
+            self._cond.notify()
+        self._thread.join(timeout)
+
+def create_board(bot, loop=None):
+    """
+    The board in the group topic for bot, a TeleBot, or an AsyncTeleBot running on loop
+    """
+    chat_id, thread_id = get_chat_ids(testing=True)
+    if chat_id is None:
+        logger.warning("No group chat configured, so there is no availability board")
+
+    board = AvailabilityBoard(
+        call_sync(bot) if loop is None else call_async(bot, loop),
+        PostgresBoards(db_handler) if db_handler is not None else MemoryBoards(),
+        chat_id, thread_id, debounce=BOARD_DEBOUNCE, pin=BOARD_PIN
+    )
+    atexit.register(board.close)
+    return board
@@ -1,188 +1,202 @@
 import logging
 from callbacks.back import callback_back
-from constants import START_MARKUP, BOOK_MARKUP_1, WELCOME_MESSAGE, CANCEL_MESSAGE, UTC_DIFF_HOURS, book_back_button
-from helpers import validate_time_format, create_date_options, create_markup
+from callbacks.payloads import BOOK_SELECT_LOUNGE, BOOK_LEVEL, BOOK_DATE_SELECTED, BOOK_WEEKLY, BOOK_WEEKLY_DATE_SELECTED, BOOK_WEEKS
+from callbacks.replies import Reply, send
+from constants import START_MARKUP, BOOK_MARKUP_1, WELCOME_MESSAGE, CANCEL_MESSAGE, UTC_DIFF_HOURS, WEEKLY_BOOKING_WEEKS, book_back_button
+from helpers import validate_time_format, parse_time, create_markup, create_buttons, weekly_dates
 from datetime import datetime, timedelta
-from db.db import get_bookings_by_date, add_booking
-from config import get_chat_ids
-from callbacks.get_availability import get_availability_message
+from db.db import book_if_free, book_many
+from callbacks.free_slots import nearest_free_window
 from zoneinfo import ZoneInfo
+from markups import markup_cache
+from metrics import timed_handler
 
 logger = logging.getLogger('callback (book)')
-CHAT_ID, TOPIC_THREAD_ID = get_chat_ids(testing=True)
 
-def callback_book(bot):
+def callback_book(bot, router, steps, board):
 
-    callback_back(bot)(WELCOME_MESSAGE, START_MARKUP, "Book")
+    callback_back(bot, router)(WELCOME_MESSAGE, START_MARKUP, "Book")
 
-    @bot.callback_query_handler(func=lambda call: call.data == 'book_select_lounge')
+    @router.route(BOOK_SELECT_LOUNGE)
     def select_lounge(call):
         bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
 
-        logger.info(f"{call.from_user.first_name} (@{call.from_user.username}) Booking Lounge (Select Lounge)")
-        
-        bot.send_message(
-            call.message.chat.id,
-            "Select lounge to book",
-            reply_markup=BOOK_MARKUP_1
-        )
+        logger.info("%s (@%s) Booking Lounge (Select Lounge)", call.from_user.first_name, call.from_user.username)
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('book_level'))
-    def select_date(call):
+        send(bot, call.message.chat.id, LOUNGES)
+
+    @router.route(BOOK_LEVEL)
+    def select_date(call, level):
         bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
 
-        logger.info(f"{call.from_user.first_name} (@{call.from_user.username}) Booking Lounge (Select Date)")
+        logger.info("%s (@%s) Booking Lounge (Select Date)", call.from_user.first_name, call.from_user.username)
+
+        send(bot, call.message.chat.id, book_dates_reply(level))
 
-        level = call.data.split('_')[-1]
-        date_options = create_date_options(callback_prefix=f"book_date_selected+{level}")
-        date_options.append(book_back_button)
+    @router.route(BOOK_WEEKLY)
+    def select_weekly_date(call, level):
+        bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
 
-        bot.send_message(
-            call.message.chat.id,
-            "Select date to book",
-            reply_markup=create_markup("BOOK LEVEL 2", *date_options)
-        )
+        logger.info("%s (@%s) Booking Lounge Weekly (Select Date)", call.from_user.first_name, call.from_user.username)
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('book_date_selected'))
-    def handle_date_selection(call):
+        send(bot, call.message.chat.id, weekly_dates_reply(level))
 
+    @router.route(BOOK_WEEKLY_DATE_SELECTED)
+    def select_weeks(call, level, selected_date):
         bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
 
-        # Extract selected_date and level from call.data
-        # Expected format: 'book_date_selected+<selected_date>+<level>'
-        data_parts = call.data.split('+')
-        level = data_parts[1]
-        selected_date = data_parts[2]
-
-        # Ask for the start time
-        bot.send_message(
-            call.message.chat.id,
-            f"Enter the 24H start time for your booking (HHMM or HH:MM) for lounge level {level} on {selected_date}\n\n{CANCEL_MESSAGE}"
-        )
-
-        # Register the next step handler for the user's message
-        bot.register_next_step_handler(
-            call.message, 
-            process_start_time, 
-            level, 
-            selected_date
-        )
+        send(bot, call.message.chat.id, weeks_reply(level, selected_date))
+
+    @router.route(BOOK_WEEKS)
+    @router.route(BOOK_DATE_SELECTED)
+    def handle_date_selection(call, level, selected_date, weeks=1):
+
+        bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
+
+        # The user's next message goes to process_start_time. Registered before asking, so a fast answer cannot overtake it.
+        steps.register(call.message.chat.id, call.from_user.id, process_start_time, level, selected_date, weeks)
+        send(bot, call.message.chat.id, start_time_prompt(level, selected_date, weeks))
 
     # Handle start time
-    def process_start_time(message, level, selected_date):
-        start_time = message.text
-
-        if start_time.lower().strip() == 'cancel':
-            bot.send_message(
-                message.chat.id,
-                WELCOME_MESSAGE,
-                reply_markup=START_MARKUP
-            )
-            return
-
-        # Validate the start time format (HHMM or HH:MM)
-        if not validate_time_format(start_time):
-            bot.send_message(message.chat.id, F"Invalid time format. Please enter again (HHMM or HH:MM)\n\n{CANCEL_MESSAGE}")
-            bot.register_next_step_handler(message, process_start_time, level, selected_date)
-            return
-
-        # Ask for the end time if start time is valid
-        bot.send_message(
-            message.chat.id, 
-            f"Enter the 24H end time for your booking (HHMM or HH:MM)\n\n{CANCEL_MESSAGE}"
-        )
-        bot.register_next_step_handler(
-            message, 
-            process_end_time, 
-            level, 
-            selected_date, 
-            start_time
-        )
-    
-    def process_end_time(message, level, selected_date, start_time):
-        end_time = message.text
-
-        if end_time.lower().strip() == 'cancel':
-            bot.send_message(
-                message.chat.id,
-                WELCOME_MESSAGE,
-                reply_markup=START_MARKUP
-            )
-            return
-
-        # Validate the end time format (HHMM or HH:MM)
-        if not validate_time_format(end_time):
-            bot.send_message(
-                message.chat.id, 
-                f"Invalid time format. Please enter again (HHMM or HH:MM)\n\n{CANCEL_MESSAGE}"
-            )
-            
-            bot.register_next_step_handler(
-                message, 
-                process_end_time, 
-                level, 
-                selected_date, 
-                start_time
-            )
-            return
-
-        # Convert timeslot_date, start_time, and end_time to datetime.time objects for comparison
-        start_time_obj = datetime.strptime(start_time, '%H%M' if len(start_time) == 4 else '%H:%M').time()
-        end_time_obj = datetime.strptime(end_time, '%H%M' if len(end_time) == 4 else '%H:%M').time()
-
-        if end_time_obj <= start_time_obj:
-            bot.send_message(
-                message.chat.id, 
-                f"End time must be after start time. Please enter again.\n\n {CANCEL_MESSAGE}"
-            )
-
-            bot.register_next_step_handler(
-                message, 
-                process_end_time, 
-                level, 
-                selected_date, 
-                start_time
-            )
-            return
-
-        # Check for time clashes
-        bookings = get_bookings_by_date(selected_date)
-
-        if not bookings.empty:
-            bookings = bookings[bookings['level'] == level]
-            for _, booking in bookings.iterrows():
-                booked_start = booking['timeslot_start_time']
-                booked_end = booking['timeslot_end_time']
-                if not (end_time_obj <= booked_start or start_time_obj >= booked_end):
-                    bot.send_message(
-                        message.chat.id, 
-                        f"Booking time clashes with existing booking from {booked_start.strftime("%H:%M")} to {booked_end.strftime("%H:%M")}. Try again with a different time."
-                    )
-                    return
-
-        # If no clashes, add booking
-        user = message.from_user
-        booking_date = datetime.now(ZoneInfo('UTC')) + timedelta(hours=UTC_DIFF_HOURS)
-        if add_booking(level, booking_date, user.username, user.first_name, user.id, selected_date, start_time_obj, end_time_obj):
-            bot.send_message(
-                message.chat.id, 
-                f"Booking confirmed for level {level} on {selected_date} from {start_time} to {end_time}.",
-                reply_markup=START_MARKUP
-            )
+    @steps.step
+    @timed_handler('process_start_time')
+    def process_start_time(message, level, selected_date, weeks=1):
+        reply, outcome = read_start_time(message.text)
+
+        if outcome == RETRY:
+            steps.register(message.chat.id, message.from_user.id, process_start_time, level, selected_date, weeks)
+        elif outcome == NEXT:
+            steps.register(message.chat.id, message.from_user.id, process_end_time, level, selected_date, message.text, weeks)
+
+        send(bot, message.chat.id, reply)
+
+    @steps.step
+    @timed_handler('process_end_time')
+    def process_end_time(message, level, selected_date, start_time, weeks=1):
+        reply, outcome = read_end_time(message.text, start_time)
+
+        if outcome == NEXT:
+            # Check for time clashes and add the booking in one transaction
+            reply, dates = make_booking(level, selected_date, start_time, message.text, weeks, message.from_user)
 
             # Update the group chat
-            booking_date = datetime.strptime(selected_date, '%d/%m/%Y').date()
-            today = datetime.today().date()
-            if booking_date == today:
-                response = get_availability_message(booking_date)
-                bot.send_message(
-                    CHAT_ID,
-                    response,
-                    message_thread_id=TOPIC_THREAD_ID
-                )
-
-        else:
-            bot.send_message(
-                message.chat.id, 
-                "There was an error making the booking. Please try again."
-            )
+            board.touch(*dates)
+        elif outcome == RETRY:
+            steps.register(message.chat.id, message.from_user.id, process_end_time, level, selected_date, start_time, weeks)
+
+        send(bot, message.chat.id, reply)
+
+# Shared with the async engine (aio.callbacks)
+
+# What to do after a step: ask the same question again, move on, or stop (the user cancelled)
+RETRY = "retry"
+NEXT = "next"
+STOP = "stop"
+
+LOUNGES = Reply("Select lounge to book", BOOK_MARKUP_1)
+CANCELLED = Reply(WELCOME_MESSAGE, START_MARKUP)
+INVALID_TIME = Reply(f"Invalid time format. Please enter again (HHMM or HH:MM)\n\n{CANCEL_MESSAGE}")
+END_TIME_PROMPT = Reply(f"Enter the 24H end time for your booking (HHMM or HH:MM)\n\n{CANCEL_MESSAGE}")
+END_BEFORE_START = Reply(f"End time must be after start time. Please enter again.\n\n {CANCEL_MESSAGE}")
+BOOKING_ERROR = Reply("There was an error making the booking. Please try again.")
+
+def book_dates_reply(level):
+    return Reply("Select date to book", markup_cache.get('book', level))
+
+def weekly_dates_reply(level):
+    return Reply("Select the first date of your weekly booking", markup_cache.get('book_weekly', level))
+
+def weeks_reply(level, selected_date):
+    return Reply(f"For how many weeks, starting {selected_date}?", create_weeks_markup(level, selected_date))
+
+def start_time_prompt(level, selected_date, weeks):
+    return Reply(f"Enter the 24H start time for your booking (HHMM or HH:MM) for lounge level {level} on {describe_dates(selected_date, weeks)}\n\n{CANCEL_MESSAGE}")
+
+def is_cancel(text):
+    return text.lower().strip() == 'cancel'
+
+def read_start_time(text):
+    """
+    (reply, RETRY / NEXT / STOP) for the start time the user typed
+    """
+    if is_cancel(text):
+        return CANCELLED, STOP
+    if not validate_time_format(text):
+        return INVALID_TIME, RETRY
+    return END_TIME_PROMPT, NEXT
+
+def read_end_time(text, start_time):
+    """
+    (reply, RETRY / STOP) for an end time that cannot be booked, or (None, NEXT) to go ahead with the booking
+    """
+    if is_cancel(text):
+        return CANCELLED, STOP
+    if not validate_time_format(text):
+        return INVALID_TIME, RETRY
+    if parse_time(text) <= parse_time(start_time):
+        return END_BEFORE_START, RETRY
+    return None, NEXT
+
+def make_booking(level, selected_date, start_time, end_time, weeks, user):
+    """
+    Book level on selected_date (DD/MM/YYYY), or weekly from it for weeks weeks, for user if the times are free.
+    Returns the reply and the dates whose bookings changed.
+    """
+    start_time_obj = parse_time(start_time)
+    end_time_obj = parse_time(end_time)
+    booking_date = datetime.now(ZoneInfo('UTC')) + timedelta(hours=UTC_DIFF_HOURS)
+
+    if weeks > 1:
+        dates = weekly_dates(selected_date, weeks)
+        booking_ids, clashes = book_many(level, booking_date, user.username, user.first_name, user.id, dates, start_time_obj, end_time_obj)
+
+        if clashes:
+            return Reply(format_weekly_clashes(clashes)), ()
+        if not booking_ids:
+            return BOOKING_ERROR, ()
+        return Reply(format_weekly_confirmation(level, dates, start_time, end_time), START_MARKUP), dates
+
+    booking_id, clash = book_if_free(level, booking_date, user.username, user.first_name, user.id, selected_date, start_time_obj, end_time_obj)
+
+    if clash:
+        return Reply(format_clash(level, selected_date, clash, start_time_obj, end_time_obj)), ()
+    if not booking_id:
+        return BOOKING_ERROR, ()
+    return (
+        Reply(f"Booking confirmed for level {level} on {selected_date} from {start_time} to {end_time}.", START_MARKUP),
+        (datetime.strptime(selected_date, '%d/%m/%Y').date(),)
+    )
+
+def format_clash(level, selected_date, clash, start, end):
+    """
+    The booking start to end clashed with the one from clash[0] to clash[1]: say so and suggest the nearest free slot
+    """
+    booked_start, booked_end = clash
+    response = f"Booking time clashes with existing booking from {booked_start.strftime("%H:%M")} to {booked_end.strftime("%H:%M")}."
+
+    suggestion = nearest_free_window(level, selected_date, start, end)
+    if suggestion:
+        free_start, free_end = suggestion
+        response += f" The nearest free slot is {free_start.strftime("%H:%M")} to {free_end.strftime("%H:%M")}."
+
+    return f"{response} Try again with a different time."
+
+def create_weeks_markup(level, selected_date):
+    names = [f"{weeks} weeks" for weeks in WEEKLY_BOOKING_WEEKS]
+    callback_data = [BOOK_WEEKS.new(level, selected_date, weeks) for weeks in WEEKLY_BOOKING_WEEKS]
+    return create_markup("BOOK WEEKS", *create_buttons(names, callback_data, 'BOOK WEEKS'), book_back_button)
+
+def describe_dates(selected_date, weeks):
+    return selected_date if weeks == 1 else f"{selected_date}, weekly for {weeks} weeks"
+
+def format_weekly_confirmation(level, dates, start_time, end_time):
+    return f"Weekly booking confirmed for level {level} from {start_time} to {end_time} on {', '.join(day.strftime('%d/%m/%Y') for day in dates)}."
+
+def format_weekly_clashes(clashes):
+    """
+    Per-date report for a weekly booking that was not made because some of its dates clash
+    """
+    response = "None of the weekly bookings were made. These dates clash with existing bookings:\n"
+    for day, slots in sorted(clashes.items()):
+        response += f"\n• {day.strftime('%d/%m/%Y')}: {', '.join(f'{start.strftime('%H:%M')} - {end.strftime('%H:%M')}' for start, end in slots)}"
+    return response + "\n\nTry again with a different time."
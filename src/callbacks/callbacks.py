@@ -1,16 +1,29 @@
 import logging
-from constants import START_MARKUP, GET_MARKUP
 from callbacks.get_availability import callback_get_availability
+from callbacks.free_slots import callback_free_slots
 from callbacks.book import callback_book
 from callbacks.unbook import callback_unbook
+from callbacks.router import CallbackRouter
+from board import create_board
+from conversations import StepRouter, conversation_store
 
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger("callbacks")
 
 def callback_handlers(bot):
+    """
+    Returns the group topic's AvailabilityBoard, which the booking flows update
+    """
 
-    callback_get_availability(bot)
-    callback_book(bot)
-    callback_unbook(bot)
+    router = CallbackRouter()
+    steps = StepRouter(conversation_store)
+    board = create_board(bot)
+    callback_get_availability(bot, router)
+    callback_free_slots(bot, router)
+    callback_book(bot, router, steps, board)
+    callback_unbook(bot, router, board)
+
+    # One catch-all handler, so telebot no longer tests a predicate per route
+    router.install(bot)
+    steps.install(bot)
+    logger.info("Registered %s callback routes", len(router.routes))
+    return board
@@ -0,0 +1,60 @@
+import logging
+from callbacks.back import callback_back
+from callbacks.payloads import FREE_SLOTS_SELECT_DATE, FREE_SLOTS_DATE_SELECTED
+from callbacks.replies import Reply, send
+from constants import START_MARKUP, WELCOME_MESSAGE, OPENING_TIME, CLOSING_TIME
+from db.db import fetch_bookings_by_date
+from intervals import IntervalIndex, index_bookings
+from markups import markup_cache
+
+logger = logging.getLogger('callback (free slots)')
+
+def callback_free_slots(bot, router):
+    callback_back(bot, router)(WELCOME_MESSAGE, START_MARKUP, "Free Slots")
+
+    @router.route(FREE_SLOTS_SELECT_DATE)
+    def select_date(call):
+
+        bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
+
+        logger.info("%s (@%s) Checking Free Slots", call.from_user.first_name, call.from_user.username)
+
+        send(bot, call.message.chat.id, free_slot_dates_reply())
+
+    @router.route(FREE_SLOTS_DATE_SELECTED)
+    def free_slots(call, date):
+
+        bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
+
+        logger.info("%s (@%s) Checking %s free slots", call.from_user.first_name, call.from_user.username, date)
+
+        send(bot, call.message.chat.id, free_slots_reply(date))
+
+# Shared with the async engine (aio.callbacks)
+def free_slot_dates_reply():
+    return Reply("Which date would you like to see free slots for?", markup_cache.get('free_slots'))
+
+def free_slots_reply(date):
+    return Reply(format_free_slots(date, fetch_bookings_by_date(date)), START_MARKUP, 'Markdown')
+
+def format_free_slots(date, bookings):
+    response = f"\U0001F552 Free slots for {date} \U0001F552\n"
+
+    for level, index in index_bookings(bookings).items():
+        prefix = "\U0001F467\U0001F467" if level == 9 else "\U0001F466\U0001F466" if level == 10 else "\U0001F466\U0001F467"
+        response += f"\n{prefix} Level {level} {prefix}\n"
+
+        slots = index.free_slots(OPENING_TIME, CLOSING_TIME)
+        if not slots:
+            response += "Fully booked\n"
+        for start, end in slots:
+            response += f"• *{start.strftime('%H:%M')} - {end.strftime('%H:%M')}*\n"
+
+    return response
+
+def nearest_free_window(level, date, start, end):
+    """
+    Closest free window of the same length as start to end on level, or None
+    """
+    index = IntervalIndex.from_bookings(fetch_bookings_by_date(date), level)
+    return index.nearest_free(start, end, OPENING_TIME, CLOSING_TIME)
@@ -1,143 +1,65 @@
 import logging
 from callbacks.back import callback_back
-from constants import START_MARKUP, GET_MARKUP, WELCOME_MESSAGE, UTC_DIFF_HOURS
-from db.db import get_bookings_by_date, get_all_bookings
+from callbacks.payloads import GET_AVAILABILITY_SELECT_DATE, GET_AVAILABILITY_DATE_SELECTED, GET_AVAILABILITY_ALL_SELECTED
+from callbacks.replies import Reply, send
+from constants import START_MARKUP, WELCOME_MESSAGE
+from db.db import fetch_bookings_by_date, fetch_bookings_between
 from datetime import datetime, timedelta
-import pandas as pd
 from zoneinfo import ZoneInfo
+from markups import markup_cache
+from render import format_availability_message, format_availability_all
 
 logger = logging.getLogger('callback (get)')
 
-def callback_get_availability(bot):
-    callback_back(bot)(WELCOME_MESSAGE, START_MARKUP, "Get Availability")
+def callback_get_availability(bot, router):
+    callback_back(bot, router)(WELCOME_MESSAGE, START_MARKUP, "Get Availability")
 
-    @bot.callback_query_handler(func=lambda call: call.data == 'get_availability_select_date')
+    @router.route(GET_AVAILABILITY_SELECT_DATE)
     def select_date(call):
 
         bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
 
-        logger.info(f"{call.from_user.first_name} (@{call.from_user.username}) Checking Availability")
-        
-        bot.send_message(
-            call.message.chat.id,
-            "Which dates would you like to check?",
-            reply_markup=GET_MARKUP
-        )
+        logger.info("%s (@%s) Checking Availability", call.from_user.first_name, call.from_user.username)
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('get_availability_date_selected'))
-    def get_availability(call):
+        send(bot, call.message.chat.id, availability_dates_reply())
 
-        bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
-        date = call.data.split("+")[1]
+    @router.route(GET_AVAILABILITY_DATE_SELECTED)
+    def get_availability(call, date):
 
-        logger.info(f"{call.from_user.first_name} (@{call.from_user.username}) Checking {date} availability")
+        bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
 
-        response = get_availability_message(date)
+        logger.info("%s (@%s) Checking %s availability", call.from_user.first_name, call.from_user.username, date)
 
-        bot.send_message(
-            call.message.chat.id,
-            response,
-            reply_markup=START_MARKUP,
-            parse_mode='Markdown'
-        )
+        send(bot, call.message.chat.id, availability_reply(date))
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('get_availability_all_selected'))
+    @router.route(GET_AVAILABILITY_ALL_SELECTED)
     def get_availability_all(call):
 
         bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
 
         logger.info("Checking all availability")
 
-        bookings = get_all_bookings()
-        if bookings.empty:
-            logger.info("No bookings found")
-            bot.send_message(
-                call.message.chat.id,
-                "No bookings found",
-                reply_markup=START_MARKUP
-            )
-            return
-             
-        response = ""
-        bookings = bookings[bookings['status'] == "booked"]
-        bookings = bookings.sort_values(by=["timeslot_date", "level", "timeslot_start_time"])
-
-        # Define the date range you want to check (e.g., the next 7 days)
-        today_sgt = datetime.now(ZoneInfo("Asia/Singapore")).date()
-        date_range = [today_sgt + timedelta(days=i) for i in range(7)]
-        
-        # Iterate over each date in the date range
-        for date in date_range:
-            # Filter bookings for the current date
-            bookings_for_date = bookings[bookings["timeslot_date"] == date]
-            
-            if bookings_for_date.empty:
-                # No bookings for this date, so mark all lounges as unbooked
-                response += f"\U0001F4DA Lounge bookings for {date.strftime("%d/%m/%Y")}\U0001F4DA\nAll lounges are unbooked!\n\n"
-            else:
-                # There are bookings, so group by level and list the bookings
-                response += f"\U0001F4DA Lounge bookings for {date.strftime("%d/%m/%Y")}\U0001F4DA\n"
-                for level, level_group in bookings_for_date.groupby("level"):
-                    prefix = "\U0001F467\U0001F467" if level == '9' else "\U0001F466\U0001F466" if level == "10" else "\U0001F466\U0001F467"
-                    response += f"\n{prefix} Level {level} {prefix}\n"
-                    for _, row in level_group.iterrows():
-                        start_time = row["timeslot_start_time"].strftime("%H:%M")
-                        end_time = row["timeslot_end_time"].strftime("%H:%M")
-
-                        # Find time booked
-                        booking_time = row['booking_datetime'].replace(tzinfo=ZoneInfo('UTC'))
-                        booking_time = datetime.now(ZoneInfo('UTC')) - booking_time
-                        booking_time += timedelta(hours=UTC_DIFF_HOURS)
-                        booking_time = booking_time.seconds
-                        booking_time = "seconds" if booking_time < 60 else f"{round(booking_time / 60)} mins" if booking_time < 3600 else f"{round(booking_time / 3600)} hrs" if booking_time < 86400 else f"{round(booking_time / 86400)} days"
-
-                        response += f"• *{start_time} - {end_time}* by {row['first_name']} (@{row['username']}) {booking_time} ago\n"
-                response += "\n"  # Add a newline between different timeslot_date blocks
-
-        # Send the message with the response
-        bot.send_message(
-            call.message.chat.id,
-            response,
-            reply_markup=START_MARKUP,
-            parse_mode='Markdown'
-        )
-        
+        send(bot, call.message.chat.id, week_availability_reply())
+
+# Shared with the async engine (aio.callbacks)
+def availability_dates_reply():
+    return Reply("Which dates would you like to check?", markup_cache.get('get'))
+
+def availability_reply(date):
+    return Reply(get_availability_message(date), START_MARKUP, 'Markdown')
+
+def week_availability_reply():
+    """
+    The coming week (SGT) in one message
+    """
+    today_sgt = datetime.now(ZoneInfo("Asia/Singapore")).date()
+    bookings = fetch_bookings_between(today_sgt, today_sgt + timedelta(days=6))
+    if not bookings:
+        logger.info("No bookings found")
+        return Reply("No bookings found", START_MARKUP)
+
+    return Reply(format_availability_all(today_sgt, bookings), START_MARKUP, 'Markdown')
+
 # Helper function for get_availability callback – abstracted to use in booking and unbooking
 def get_availability_message(date):
-        bookings = get_bookings_by_date(date)
-        if bookings.empty:
-            return "No bookings found"
-        
-        bookings = bookings[bookings['status'] == "booked"]
-        response = f"\U0001F4DA Lounge bookings for {date}\U0001F4DA\n"
-        if bookings.empty:
-            response += "\nNo bookings for that day!\n"
-        else:
-            # Group bookings by level
-            for level in range(9, 12):
-                level_bookings = bookings[bookings['level'] == level]
-                level_bookings = level_bookings.sort_values(by='timeslot_start_time')
-                
-                if not level_bookings.empty:
-                    # Add the level header
-                    prefix = "\U0001F467\U0001F467" if level == 9 else "\U0001F466\U0001F466" if level == 10 else "\U0001F466\U0001F467"
-                    response += f"\n{prefix} Level {level} {prefix}\n"
-                    
-                    # Add each booking in the level
-                    for _, row in level_bookings.iterrows():
-                        start_time = row['timeslot_start_time'].strftime('%H:%M')
-                        end_time = row['timeslot_end_time'].strftime('%H:%M')
-                        first_name = row['first_name']
-                        username = row['username']
-
-                        # Find time booked
-                        booking_time = row['booking_datetime'].replace(tzinfo=ZoneInfo('UTC'))
-                        booking_time = datetime.now(ZoneInfo('UTC')) - booking_time
-                        booking_time += timedelta(hours=UTC_DIFF_HOURS)
-                        booking_time = booking_time.seconds
-                        booking_time = "seconds" if booking_time < 60 else f"{round(booking_time / 60)} mins" if booking_time < 3600 else f"{round(booking_time / 3600)} hrs" if booking_time < 86400 else f"{round(booking_time / 86400)} days"
-                        
-                        # Add booking details with bullet pointb
-                        response += f"• *{start_time} - {end_time}* by {first_name} (@{username}), {booking_time} ago\n"
-        
-        return response
\ No newline at end of file
+        return format_availability_message(date, fetch_bookings_by_date(date))
@@ -0,0 +1,34 @@
+from datetime import date
+from callbacks.router import CallbackData
+
+# Start
+GET_AVAILABILITY_SELECT_DATE = CallbackData('get_availability_select_date')
+BOOK_SELECT_LOUNGE = CallbackData('book_select_lounge')
+UNBOOK_SELECT = CallbackData('unbook_select')
+
+# Get availability: 'get_availability_date_selected+<dd/mm/YYYY>'
+GET_AVAILABILITY_DATE_SELECTED = CallbackData('get_availability_date_selected', 'date')
+GET_AVAILABILITY_ALL_SELECTED = CallbackData('get_availability_all_selected')
+
+# Free slots: 'free_slots_date_selected+<dd/mm/YYYY>'
+FREE_SLOTS_SELECT_DATE = CallbackData('free_slots_select_date')
+FREE_SLOTS_DATE_SELECTED = CallbackData('free_slots_date_selected', 'date')
+
+# Book: 'book_level_<level>', then 'book_date_selected+<level>+<dd/mm/YYYY>'
+BOOK_LEVEL = CallbackData('book_level', ('level', int), sep='_')
+BOOK_DATE_SELECTED = CallbackData('book_date_selected', ('level', int), 'selected_date')
+
+# Weekly booking: 'book_weekly_<level>', 'book_weekly_date_selected+<level>+<dd/mm/YYYY>', then 'book_weeks+<level>+<dd/mm/YYYY>+<weeks>'
+BOOK_WEEKLY = CallbackData('book_weekly', ('level', int), sep='_')
+BOOK_WEEKLY_DATE_SELECTED = CallbackData('book_weekly_date_selected', ('level', int), 'selected_date')
+BOOK_WEEKS = CallbackData('book_weeks', ('level', int), 'selected_date', ('weeks', int))
+
+# Unbook: 'unbook_selected_<level>_<booking_id>_<YYYY-MM-DD>'
+UNBOOK_SELECTED = CallbackData('unbook_selected', ('level', int), ('booking_id', int), ('timeslot_date', date.fromisoformat), sep='_')
+UNBOOK_ALL = CallbackData('unbook_all')
+
+def back(state):
+    """
+    Payload of the back button leaving state, e.g. 'Get Availability' -> 'back_get_availability'
+    """
+    return CallbackData(f'back_{state}'.lower().replace(' ', '_'))
@@ -0,0 +1,19 @@
+"""
+What a flow answers with, worked out once for both bot engines.
+
+The helpers next to each flow's handlers (callbacks.get_availability, callbacks.book, ...) parse and validate
+what the user sent, read or write bookings and return a Reply. They block, so the async engine runs them with
+asyncio.to_thread; each engine's handlers only remove markups, send replies and register steps.
+"""
+from typing import NamedTuple
+
+class Reply(NamedTuple):
+    text: str
+    markup: object = None
+    parse_mode: str = None
+
+def send(bot, chat_id, reply):
+    """
+    Send reply with a TeleBot or an AsyncTeleBot, returning what send_message returns (a coroutine for the latter)
+    """
+    return bot.send_message(chat_id, reply.text, reply_markup=reply.markup, parse_mode=reply.parse_mode)
@@ -0,0 +1,125 @@
+import logging
+from db.replica import acting_as
+from metrics import HANDLER_LATENCY, HANDLER_ERRORS, track
+
+logger = logging.getLogger("callback (router)")
+
+class CallbackData:
+    """
+    Typed encoder and decoder for one callback_data format: '<action><sep><field><sep><field>...'.
+    Fields are names, or (name, type) pairs whose type converts the decoded string.
+    """
+    def __init__(self, action, *fields, sep='+'):
+        self.action = action
+        self.sep = sep
+        self.fields = [field if isinstance(field, tuple) else (field, str) for field in fields]
+
+    def new(self, *values):
+        if len(values) != len(self.fields):
+            raise ValueError(f"{self.action} takes {len(self.fields)} values, got {len(values)}")
+
+        for value in values:
+            if self.sep in str(value):
+                raise ValueError(f"{value!r} contains the separator {self.sep!r} of {self.action}")
+
+        data = self.sep.join([self.action, *map(str, values)])
+        if len(data.encode()) > 64:
+            raise ValueError(f"callback_data {data!r} is longer than Telegram's 64 byte limit")
+        return data
+
+    def parse(self, data):
+        """
+        Returns the decoded field values as a tuple, in the order they were declared
+        """
+        if not self.fields:
+            return ()
+
+        values = data[len(self.action) + len(self.sep):].split(self.sep, len(self.fields) - 1)
+        if len(values) != len(self.fields):
+            raise ValueError(f"Malformed callback_data for {self.action}: {data!r}")
+
+        return tuple(convert(value) for (_, convert), value in zip(self.fields, values))
+
+class CallbackRouter:
+    """
+    Single callback_query handler that parses call.data once and dispatches through a dict keyed by action,
+    instead of telebot testing every handler's predicate in turn. Handlers run acting as the user who pressed the button.
+    """
+    def __init__(self):
+        self.routes = {} # action -> (payload, handler)
+
+    def route(self, payload):
+        """
+        Decorator registering handler(call, *values) for a CallbackData
+        """
+        def decorator(handler):
+            if payload.action in self.routes:
+                raise ValueError(f"Duplicate route for {payload.action}")
+            self.routes[payload.action] = (payload, handler)
+            return handler
+        return decorator
+
+    def resolve(self, data):
+        """
+        Returns (payload, handler) for call.data, or None. The cost depends on the number of separators
+        in data, not the number of routes.
+        """
+        route = self.routes.get(data)
+        if route is not None:
+            return route
+
+        # '+' never appears in an action, so everything before the first one is the action
+        action, sep, _ = data.partition('+')
+        if sep:
+            route = self.routes.get(action)
+            if route is not None and route[0].sep == '+':
+                return route
+
+        # '_' also appears inside actions, so try the longest prefix first
+        end = len(data)
+        while (end := data.rfind('_', 0, end)) > 0:
+            route = self.routes.get(data[:end])
+            if route is not None and route[0].sep == '_':
+                return route
+
+        return None
+
+    def decode(self, call):
+        """
+        Returns (action, handler, values) for a callback query, or None if it cannot be routed
+        """
+        route = self.resolve(call.data)
+        if route is None:
+            logger.warning("No route for callback data %r", call.data)
+            return None
+
+        payload, handler = route
+        try:
+            return payload.action, handler, payload.parse(call.data)
+        except ValueError as e:
+            logger.error("Error decoding callback data: %s", e)
+            return None
+
+    def dispatch(self, call):
+        decoded = self.decode(call)
+        if decoded is None:
+            return None
+
+        action, handler, values = decoded
+        with track(HANDLER_LATENCY, HANDLER_ERRORS, action), acting_as(call.from_user.id):
+            return handler(call, *values)
+
+    def install(self, bot):
+        bot.callback_query_handler(func=lambda call: True)(self.dispatch)
+
+    def install_async(self, bot):
+
+        @bot.callback_query_handler(func=lambda call: True)
+        async def dispatch(call):
+            decoded = self.decode(call)
+            if decoded is None:
+                return
+
+            action, handler, values = decoded
+            with track(HANDLER_LATENCY, HANDLER_ERRORS, action), acting_as(call.from_user.id):
+                await handler(call, *values)
@@ -1,103 +1,125 @@
 import logging
 from callbacks.back import callback_back
-from constants import START_MARKUP, WELCOME_MESSAGE
-from config import get_chat_ids
-from db.db import get_bookings_by_id, cancel_booking
+from callbacks.payloads import UNBOOK_SELECT, UNBOOK_SELECTED, UNBOOK_ALL
+from callbacks.replies import Reply, send
+from constants import START_MARKUP, WELCOME_MESSAGE, unbook_all_button
+from db.db import fetch_bookings_by_id, cancel_booking, cancel_bookings
 from helpers import create_buttons, create_markup
 from datetime import datetime, timedelta
-from callbacks.get_availability import get_availability_message
 from zoneinfo import ZoneInfo
 
 logger = logging.getLogger('callback (unbook)')
-CHAT_ID, TOPIC_THREAD_ID = get_chat_ids(testing=True)
 
-def callback_unbook(bot):
+def callback_unbook(bot, router, board):
 
-    callback_back(bot)(WELCOME_MESSAGE, START_MARKUP, "Unbook")
+    callback_back(bot, router)(WELCOME_MESSAGE, START_MARKUP, "Unbook")
 
-    @bot.callback_query_handler(func=lambda call: call.data == 'unbook_select')
+    @router.route(UNBOOK_SELECT)
     def unbook_select(call):
         
         bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
 
-        logger.info(f"{call.from_user.first_name} (@{call.from_user.username}) Unbooking (Select Booking)")
+        logger.info("%s (@%s) Unbooking (Select Booking)", call.from_user.first_name, call.from_user.username)
 
-        id = call.from_user.id
-        bookings = get_bookings_by_id(id)
+        send(bot, call.message.chat.id, unbook_select_reply(call.from_user.id))
 
-        # Filter for valid bookings, i.e. not expired
-        today_sgt = datetime.now(ZoneInfo("Asia/Singapore")).date() # Get current time in Singapore (SGT)
-        bookings = bookings[bookings["timeslot_date"] >= today_sgt]
+    @router.route(UNBOOK_SELECTED)
+    def unbook(call, level, booking_id, booking_date):
 
-        if bookings.empty:
-            logger.info("No bookings found to unbook")
-            bot.send_message(
-                call.message.chat.id,
-                "You have no bookings",
-                reply_markup=START_MARKUP
-            )
-            return
-        
-        logger.info(f"Found {len(bookings)} bookings to unbook")
-        names = []
-        callback_data = []
-        bookings['level'] = bookings['level'].astype(int)
-        bookings = bookings.sort_values(by=['level', 'timeslot_date', 'timeslot_start_time'])
-
-        for _, booking in bookings.iterrows():
+        bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
 
-            # Create name for button
-            booking_start_str = booking["timeslot_start_time"].strftime("%H:%M")
-            booking_end_str = booking["timeslot_end_time"].strftime("%H:%M")
-            name = f"Level {booking["level"]} / {booking["timeslot_date"]} / {booking_start_str} - {booking_end_str}"
+        logger.info("%s (@%s) Unbooking", call.from_user.first_name, call.from_user.username)
 
-            # Create name for callback function
-            callback = f"unbook_selected_{booking['level']}_{booking['booking_id']}_{booking['timeslot_date']}"
-            names.append(name)
-            callback_data.append(callback)
+        reply, dates = unbook_booking(level, booking_id, booking_date)
+        send(bot, call.message.chat.id, reply)
 
-        bot.send_message(
-            call.message.chat.id,
-            "Select a booking to unbook",
-            reply_markup=create_markup("UNBOOK SELECT", *create_buttons(names, callback_data))
-        )
+        # Update the group chat
+        board.touch(*dates)
 
-    @bot.callback_query_handler(func=lambda call: call.data.startswith('unbook_selected'))
-    def unbook(call):
+    @router.route(UNBOOK_ALL)
+    def unbook_all(call):
 
         bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id, reply_markup=None)
 
-        logger.info(f"{call.from_user.first_name} (@{call.from_user.username}) Unbooking")
-        
-        callback_info = call.data.split("_")
-        level = callback_info[-3]
-        booking_id = callback_info[-2]
-        
-        # Fetch the booking date (assuming the booking date is passed or fetched from the database)
-        booking_date_str = callback_info[-1]  # Assuming the date is passed as 'YYYY-MM-DD'
-        booking_date = datetime.strptime(booking_date_str, '%Y-%m-%d').date()
-
-        result = cancel_booking(level, booking_id)
-        if isinstance(result, Exception):
-            logger.info(f"Failed to unbook booking id: {booking_id}")
-            bot.send_message(
-                call.message.chat.id,
-                "Failed to unbook. Please try again."
-            )
-        else:
-            logger.info(f"Successfully unbooked booking id: {booking_id}")
-            bot.send_message(
-                call.message.chat.id,
-                "Booking successfully unbooked.",
-                reply_markup=START_MARKUP
-            )
-
-            # Update the group chat
-            today = datetime.today().date()
-            if booking_date == today:
-                response = get_availability_message(booking_date)
-                bot.send_message(
-                    CHAT_ID,
-                    response,
-                    message_thread_id=TOPIC_THREAD_ID
-                )
+        logger.info("%s (@%s) Unbooking All", call.from_user.first_name, call.from_user.username)
+
+        reply, dates = unbook_all_bookings(call.from_user.id)
+        send(bot, call.message.chat.id, reply)
+
+        # Update the group chat
+        board.touch(*dates)
+
+# Shared with the async engine (aio.callbacks)
+UNBOOK_FAILED = Reply("Failed to unbook. Please try again.")
+
+def unbook_select_reply(user_id):
+    """
+    The bookings user_id can still unbook, one button each
+    """
+    bookings = filter_unbookable(fetch_bookings_by_id(user_id))
+    if not bookings:
+        logger.info("No bookings found to unbook")
+        return Reply("You have no bookings", START_MARKUP)
+
+    logger.info("Found %s bookings to unbook", len(bookings))
+    return Reply("Select a booking to unbook", create_unbook_markup(bookings))
+
+def unbook_booking(level, booking_id, booking_date):
+    """
+    Returns the reply and the dates whose bookings changed
+    """
+    if not cancel_booking(level, booking_id, booking_date):
+        logger.info("Failed to unbook booking id: %s", booking_id)
+        return UNBOOK_FAILED, ()
+
+    logger.info("Successfully unbooked booking id: %s", booking_id)
+    return Reply("Booking successfully unbooked.", START_MARKUP), (booking_date,)
+
+def unbook_all_bookings(user_id):
+    """
+    Cancel every booking user_id can still unbook. Returns the reply and the dates whose bookings changed.
+    """
+    bookings = filter_unbookable(fetch_bookings_by_id(user_id))
+    cancelled = cancel_bookings([booking.booking_id for booking in bookings]) if bookings else []
+    if cancelled is None:
+        logger.info("Failed to unbook %s bookings", len(bookings))
+        return UNBOOK_FAILED, ()
+
+    logger.info("Successfully unbooked %s bookings", len(cancelled))
+    return (
+        Reply(f"{len(cancelled)} bookings unbooked.", START_MARKUP),
+        [booking.timeslot_date for booking in bookings if booking.booking_id in cancelled]
+    )
+
+def filter_unbookable(bookings):
+    """
+    Keep bookings that have not expired, i.e. from today (SGT) onwards
+    """
+    today_sgt = datetime.now(ZoneInfo("Asia/Singapore")).date() # Get current time in Singapore (SGT)
+    return [booking for booking in bookings if booking.timeslot_date >= today_sgt]
+
+def create_unbook_markup(bookings):
+    """
+    One button per booking, sorted by level, date and start time, then Unbook All if there is more than one
+    """
+    names = []
+    callback_data = []
+    bookings.sort(key=lambda booking: (booking.level, booking.timeslot_date, booking.timeslot_start_time))
+
+    for booking in bookings:
+
+        # Create name for button
+        booking_start_str = booking.timeslot_start_time.strftime("%H:%M")
+        booking_end_str = booking.timeslot_end_time.strftime("%H:%M")
+        name = f"Level {booking.level} / {booking.timeslot_date} / {booking_start_str} - {booking_end_str}"
+
+        # Create name for callback function
+        callback = UNBOOK_SELECTED.new(booking.level, booking.booking_id, booking.timeslot_date)
+        names.append(name)
+        callback_data.append(callback)
+
+    buttons = create_buttons(names, callback_data)
+    if len(bookings) > 1:
+        buttons.append(unbook_all_button)
+
+    return create_markup("UNBOOK SELECT", *buttons)
@@ -1,23 +1,30 @@
 import logging
 from constants import START_MARKUP, WELCOME_MESSAGE
+from conversations import conversation_store
+from metrics import timed_handler
+from outbound import on_error
 
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger("commands")
 
+def log_markup_error(e):
+    logger.error("Error removing previous markup: %s", e)
+
 def command_handlers(bot):
 
     @bot.message_handler(commands=['start', 'hello'])
+    @timed_handler('start')
     def send_start(message):
         chat_id = message.chat.id
         message_id = message.message_id
+
+        # Abandon any booking flow in progress
+        conversation_store.discard(chat_id, message.from_user.id)
         
-        # Remove the markup from the previous message if it exists
+        # Remove the markup from the previous message if it exists. Queued, a failure only fails the returned Future
         try:
-            bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id - 1, reply_markup=None)
-        except Exception as e: # Else do nothing
-            logger.error(f"Error removing previous markup: {e}")
+            on_error(bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id - 1, reply_markup=None), log_markup_error)
+        except Exception as e: # Sent directly, without the outbound queue
+            log_markup_error(e)
 
         bot.send_message(chat_id, "Welcome! What can I help you with?", reply_markup=START_MARKUP)
 
@@ -1,27 +1,100 @@
 import logging
 import os
 from dotenv import load_dotenv
+from logs import setup_logging, parse_sample_rates
 
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+load_dotenv()
+
+# Logging: LOG_LEVEL, LOG_FORMAT ('text' or 'kv' for key=value lines) and LOG_SAMPLE ('db=0.1,callback (get)=0.5'),
+# which keeps only that fraction of the INFO and DEBUG records from each named logger
+setup_logging(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    structured=os.getenv('LOG_FORMAT', 'text').lower() == 'kv',
+    sample_rates=parse_sample_rates(os.getenv('LOG_SAMPLE')),
 )
 logger = logging.getLogger("config")
 logger.info('Retrieving environment variables')
 
 try:
-    load_dotenv()
-
     BOT_TOKEN = os.getenv('BOT_TOKEN')
     TEST_CHAT_ID = os.getenv('TEST_CHAT_ID')
     TEST_TOPIC_THREAD_ID = os.getenv('TEST_TOPIC_THREAD_ID')
     PRODUCTION_CHAT_ID = os.getenv('PRODUCTION_CHAT_ID')
     PRODUCTION_TOPIC_THREAD_ID = os.getenv('PRODUCTION_TOPIC_THREAD_ID')
+    # Storage backend: 'postgres' (DATABASE_URL) or 'memory' (nothing persisted, for load tests and local runs)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'postgres').lower()
     DATABASE_URL = os.getenv('DATABASE_URL')
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    # Prepare the hot statements once per connection. Turn off behind a transaction-pooling PgBouncer.
+    DB_PREPARE_STATEMENTS = os.getenv('DB_PREPARE_STATEMENTS', 'true').lower() in ('1', 'true', 'yes')
+    AVAILABILITY_CACHE_SIZE = int(os.getenv('AVAILABILITY_CACHE_SIZE', 64))
+    AVAILABILITY_CACHE_TTL = float(os.getenv('AVAILABILITY_CACHE_TTL', 300))
+    # LISTEN for booking writes from other processes (the trigger from migration 5) and drop them from the local caches
+    DB_LISTEN = os.getenv('DB_LISTEN', 'true').lower() in ('1', 'true', 'yes')
+    # Read replica: bookings listed by user, by week and in full are read from DATABASE_REPLICA_URL (unset reads everything
+    # from DATABASE_URL). Its lag is checked every REPLICA_CHECK_INTERVAL seconds, and past REPLICA_MAX_LAG seconds, or while
+    # it is unreachable, reads go to the primary. A user's reads stay on the primary for REPLICA_STICKY_SECONDS after they write.
+    DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+    REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', 5))
+    REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 10))
+    REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
+    # Conversation state of the booking flow: 'memory', 'file' (SQLite at CONVERSATION_FILE) or 'postgres' (DATABASE_URL).
+    # A state expires CONVERSATION_TTL seconds after the last step; past CONVERSATION_MAX_ENTRIES the least recent are evicted.
+    CONVERSATION_BACKEND = os.getenv('CONVERSATION_BACKEND', 'memory').lower()
+    CONVERSATION_FILE = os.getenv('CONVERSATION_FILE', 'conversations.sqlite3')
+    CONVERSATION_TTL = float(os.getenv('CONVERSATION_TTL', 900))
+    CONVERSATION_MAX_ENTRIES = int(os.getenv('CONVERSATION_MAX_ENTRIES', 10000))
+
+    # Retention: clear bookings for slots more than KEEP_BOOKINGS_DAYS ago every RETENTION_INTERVAL seconds (0 disables)
+    RETENTION_INTERVAL = float(os.getenv('RETENTION_INTERVAL', 3600))
+    RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 1000))
+    RETENTION_ARCHIVE = os.getenv('RETENTION_ARCHIVE', 'false').lower() in ('1', 'true', 'yes')
+
+    # Partition bookings by timeslot_date month, keeping PARTITION_MONTHS_AHEAD months of empty partitions ready
+    PARTITION_BOOKINGS = os.getenv('PARTITION_BOOKINGS', 'false').lower() in ('1', 'true', 'yes')
+    PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', 3))
+
+    # Prometheus metrics on http://METRICS_HOST:METRICS_PORT/metrics (0 disables the endpoint)
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 9464))
+
+    # Outbound queue: Bot API sends are queued and paced under Telegram's flood limits (calls per second globally,
+    # per private chat with a burst, and per group chat). 0 for OUTBOUND_QUEUE_SIZE makes handlers send directly.
+    OUTBOUND_QUEUE_SIZE = int(os.getenv('OUTBOUND_QUEUE_SIZE', 1000))
+    OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', 30))
+    OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', 1))
+    OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', 3))
+    OUTBOUND_GROUP_RATE = float(os.getenv('OUTBOUND_GROUP_RATE', 20 / 60))
+    OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', 3))
+    OUTBOUND_WORKERS = int(os.getenv('OUTBOUND_WORKERS', 4))
+
+    # Availability board: today's bookings in one message in the group topic, edited in place BOARD_DEBOUNCE seconds
+    # after the first change, so a burst of bookings makes one edit. BOARD_PIN pins each day's board.
+    BOARD_DEBOUNCE = float(os.getenv('BOARD_DEBOUNCE', 3))
+    BOARD_PIN = os.getenv('BOARD_PIN', 'true').lower() in ('1', 'true', 'yes')
+
+    # Bot engine: 'sync' (TeleBot) or 'async' (AsyncTeleBot, polling only)
+    BOT_ENGINE = os.getenv('BOT_ENGINE', 'sync').lower()
+
+    # Update ingestion: 'polling' or 'webhook'. A webhook needs WEBHOOK_SECRET, or with WEBHOOK_URL gets a random one;
+    # WEBHOOK_OFFLINE (no WEBHOOK_URL) serves recorded updates from tools.post_update on 127.0.0.1 without it.
+    BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+    WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', os.getenv('PORT', 8443)))
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+    WEBHOOK_OFFLINE = os.getenv('WEBHOOK_OFFLINE', 'false').lower() in ('1', 'true', 'yes')
+    WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 4))
+    WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 100))
     
     logger.info('Successfully retrieved environment variables')
 
 except Exception as e:
-    logger.info(f'Error while retrieving environment variables: {e}')
+    logger.info('Error while retrieving environment variables: %s', e)
 
 def get_chat_ids(testing = True):
     return (TEST_CHAT_ID, TEST_TOPIC_THREAD_ID) if testing else (PRODUCTION_CHAT_ID, PRODUCTION_TOPIC_THREAD_ID)
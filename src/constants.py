@@ -1,14 +1,19 @@
 import logging
 from telebot import types
-from helpers import create_markup, create_date_options
-from datetime import datetime, timezone
+from helpers import create_markup, PrebuiltMarkup
+from callbacks import payloads
+from datetime import datetime, time, timezone
 from zoneinfo import ZoneInfo
 
 logger = logging.getLogger("constants")
-logger.info(f"TODAY (UTC TIMEZONE): {datetime.now(ZoneInfo('UTC'))}")
+logger.info("TODAY (UTC TIMEZONE): %s", datetime.now(ZoneInfo('UTC')))
 
 # Miscellaneous
 KEEP_BOOKINGS_DAYS = 30
+OPENING_TIME = time(8, 0) # Free slots are listed between opening and closing
+CLOSING_TIME = time(23, 59)
+WEEKLY_BOOKING_WEEKS = (2, 4, 8, 12) # Options offered for a weekly booking
+LEVELS = (9, 10, 11) # Lounge levels that can be booked
 WELCOME_MESSAGE = "Welcome to Garuda Lounge Bot. How can I help you?"
 EXIT_MESSAGE = "Thank you. Bye."
 CANCEL_MESSAGE = "Enter 'cancel' to cancel booking'"
@@ -30,19 +35,22 @@ COLUMNS = [
 # Timezone data
 delta = datetime.now(ZoneInfo('UTC')) - datetime.now(ZoneInfo('Asia/Singapore'))
 UTC_DIFF_HOURS = delta.total_seconds() / 3600
-logger.info(f"TIME DIFFERENCE (HOURS): {round(UTC_DIFF_HOURS, 2)}")
+logger.info("TIME DIFFERENCE (HOURS): %.2f", UTC_DIFF_HOURS)
 
 # MARKUPS
-get_availability_button = types.InlineKeyboardButton('Get Lounge Availability', callback_data='get_availability_select_date')
-get_all_button = types.InlineKeyboardButton('Get All Dates', callback_data='get_availability_all_selected')
-book_button = types.InlineKeyboardButton('Book Lounge', callback_data='book_select_lounge')
-unbook_button = types.InlineKeyboardButton('Unbook Lounge', callback_data='unbook_select') # returns all the bookings he has
-book_level_9_button = types.InlineKeyboardButton('\U0001F467\U0001F467 Level 9 \U0001F467\U0001F467', callback_data='book_level_9')
-book_level_10_button = types.InlineKeyboardButton('\U0001F466\U0001F466 Level 10 \U0001F466\U0001F466', callback_data='book_level_10')
-book_level_11_button = types.InlineKeyboardButton('\U0001F466\U0001F467 Level 11 \U0001F466\U0001F467', callback_data='book_level_11')
-get_back_button = types.InlineKeyboardButton('Back', callback_data='back_get_availability')
-book_back_button = types.InlineKeyboardButton('Back', callback_data='back_book')
+get_availability_button = types.InlineKeyboardButton('Get Lounge Availability', callback_data=payloads.GET_AVAILABILITY_SELECT_DATE.new())
+free_slots_button = types.InlineKeyboardButton('Show Free Slots', callback_data=payloads.FREE_SLOTS_SELECT_DATE.new())
+get_all_button = types.InlineKeyboardButton('Get All Dates', callback_data=payloads.GET_AVAILABILITY_ALL_SELECTED.new())
+book_button = types.InlineKeyboardButton('Book Lounge', callback_data=payloads.BOOK_SELECT_LOUNGE.new())
+unbook_button = types.InlineKeyboardButton('Unbook Lounge', callback_data=payloads.UNBOOK_SELECT.new()) # returns all the bookings he has
+book_level_9_button = types.InlineKeyboardButton('\U0001F467\U0001F467 Level 9 \U0001F467\U0001F467', callback_data=payloads.BOOK_LEVEL.new(9))
+book_level_10_button = types.InlineKeyboardButton('\U0001F466\U0001F466 Level 10 \U0001F466\U0001F466', callback_data=payloads.BOOK_LEVEL.new(10))
+book_level_11_button = types.InlineKeyboardButton('\U0001F466\U0001F467 Level 11 \U0001F466\U0001F467', callback_data=payloads.BOOK_LEVEL.new(11))
+get_back_button = types.InlineKeyboardButton('Back', callback_data=payloads.back('Get Availability').new())
+book_back_button = types.InlineKeyboardButton('Back', callback_data=payloads.back('Book').new())
+unbook_all_button = types.InlineKeyboardButton('Unbook All', callback_data=payloads.UNBOOK_ALL.new())
+free_slots_back_button = types.InlineKeyboardButton('Back', callback_data=payloads.back('Free Slots').new())
 
-START_MARKUP = create_markup('START MARKUP', get_availability_button, book_button, unbook_button)
-BOOK_MARKUP_1 = create_markup('BOOK MARKUP LEVEL 1', book_level_9_button, book_level_10_button, book_level_11_button, book_back_button)
-GET_MARKUP = create_markup('GET MARKUP', get_all_button, *create_date_options(callback_prefix="get_availability_date_selected"), get_back_button)
+START_MARKUP = PrebuiltMarkup(create_markup('START MARKUP', get_availability_button, free_slots_button, book_button, unbook_button))
+BOOK_MARKUP_1 = PrebuiltMarkup(create_markup('BOOK MARKUP LEVEL 1', book_level_9_button, book_level_10_button, book_level_11_button, book_back_button))
+# Markups listing dates change every day, see markups.py
@@ -0,0 +1,336 @@
+"""
+State of multi-step conversations (the booking flow asks for a start time, then an end time), keyed by chat and user.
+
+Replaces register_next_step_handler, which keeps a closure per chat until the user replies: abandoned flows
+stay in memory forever and every flow is lost on restart. Here a state is the name of the next step and its
+arguments. States expire ttl seconds after they were set, the least recently set are evicted past max_entries,
+and with a backing they are written through to a SQLite file or the Postgres conversations table and restored on start.
+"""
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from config import CONVERSATION_BACKEND, CONVERSATION_FILE, CONVERSATION_TTL, CONVERSATION_MAX_ENTRIES
+from db.query import create_conversations_table_query, save_conversation_query, delete_conversation_query, get_conversations_query, delete_expired_conversations_query
+from db.replica import acting_as
+from metrics import CONVERSATIONS, CONVERSATION_EVENTS
+
+logger = logging.getLogger("conversations")
+
+class SQLiteBacking:
+    """
+    Conversation states in a SQLite file, for a single bot process that should resume flows after a restart
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        self._conn.execute(create_conversations_table_query())
+
+    def _execute(self, query, *args):
+        with self._lock:
+            return self._conn.execute(query.replace("%s", "?"), args).fetchall()
+
+    def save(self, chat_id, user_id, step, args, expires_at):
+        self._execute(save_conversation_query(), chat_id, user_id, step, args, expires_at)
+
+    def delete(self, chat_id, user_id):
+        self._execute(delete_conversation_query(), chat_id, user_id)
+
+    def load(self, now):
+        return self._execute(get_conversations_query(), now)
+
+    def delete_expired(self, now):
+        self._execute(delete_expired_conversations_query(), now)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class PostgresBacking:
+    """
+    Conversation states in the conversations table (migration 4), shared by every process on DATABASE_URL
+    """
+    def __init__(self, db_handler):
+        self.db_handler = db_handler
+
+    def save(self, chat_id, user_id, step, args, expires_at):
+        self.db_handler.run("save_conversation", chat_id, user_id, step, args, expires_at)
+
+    def delete(self, chat_id, user_id):
+        self.db_handler.run("delete_conversation", chat_id, user_id)
+
+    def load(self, now):
+        return self.db_handler.run("get_conversations", now)
+
+    def delete_expired(self, now):
+        self.db_handler.run("delete_expired_conversations", now)
+
+    def close(self):
+        pass
+
+class ConversationStore:
+    """
+    Thread-safe map of (chat_id, user_id) -> (step, args) with a TTL and LRU eviction.
+    Lookups never leave memory. Writes to the backing, if any, are queued and applied in order by one background
+    thread, so handlers never wait on disk or the database. Arguments must be JSON serializable when there is a backing.
+    """
+    def __init__(self, ttl=900.0, max_entries=10000, backing=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backing = backing
+
+        self._entries = OrderedDict() # (chat_id, user_id) -> (step, args, expires_at), least recently set first
+        self._lock = threading.Lock()
+
+        self.sets = 0
+        self.resumed = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.restored = 0
+
+        self._writes = None
+        if backing is not None:
+            self._writes = queue.SimpleQueue()
+            self._writer = threading.Thread(target=self._write_behind, name="conversations", daemon=True)
+            self._writer.start()
+
+    def _write(self, operation, *args):
+        if self._writes is not None:
+            self._writes.put((operation, args))
+
+    def _write_behind(self):
+        while (write := self._writes.get()) is not None:
+            operation, args = write
+            try:
+                getattr(self.backing, operation)(*args)
+            except Exception as e:
+                logger.error("Error applying conversation %s %s: %s", operation, args[:2], e)
+
+    def _purge(self, now):
+        """
+        Drop expired states from the front. Call with the lock held.
+        """
+        while self._entries:
+            key, (_, _, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+            self.expirations += 1
+            self._write("delete", *key)
+
+    def set(self, chat_id, user_id, step, *args):
+        """
+        Make step (a name) with args the next step of user_id in chat_id, replacing any pending one
+        """
+        now = time.time()
+        encoded = json.dumps(args) if self._writes is not None else None # Fails here rather than on the writer thread
+
+        with self._lock:
+            key = (chat_id, user_id)
+            self._entries[key] = (step, args, now + self.ttl)
+            self._entries.move_to_end(key)
+            self.sets += 1
+            self._write("save", chat_id, user_id, step, encoded, now + self.ttl)
+
+            self._purge(now)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                self._write("delete", *evicted)
+
+    def pending(self, chat_id, user_id):
+        with self._lock:
+            entry = self._entries.get((chat_id, user_id))
+            if entry is None:
+                return False
+
+            if entry[2] <= time.time():
+                del self._entries[(chat_id, user_id)]
+                self.expirations += 1
+                self._write("delete", chat_id, user_id)
+                return False
+
+            return True
+
+    def pop(self, chat_id, user_id):
+        """
+        Remove and return (step, args) for user_id in chat_id, or None if nothing unexpired is pending
+        """
+        with self._lock:
+            entry = self._entries.pop((chat_id, user_id), None)
+            if entry is None:
+                return None
+
+            self._write("delete", chat_id, user_id)
+            step, args, expires_at = entry
+            if expires_at <= time.time():
+                self.expirations += 1
+                return None
+
+            self.resumed += 1
+            return step, args
+
+    def discard(self, chat_id, user_id):
+        """
+        Abandon the pending step, if any. Returns whether there was one.
+        """
+        with self._lock:
+            if self._entries.pop((chat_id, user_id), None) is None:
+                return False
+
+            self._write("delete", chat_id, user_id)
+            return True
+
+    def restore(self):
+        """
+        Load the unexpired states from the backing, keeping the max_entries that expire last.
+        Call once on start, after migrations. Returns the number restored.
+        """
+        if self.backing is None:
+            return 0
+
+        now = time.time()
+        try:
+            self.backing.delete_expired(now)
+            rows = self.backing.load(now)
+        except Exception as e:
+            logger.error("Error restoring conversations: %s", e)
+            return 0
+
+        with self._lock:
+            for chat_id, user_id, step, args, expires_at in rows[-self.max_entries:]:
+                self._entries[(chat_id, user_id)] = (step, tuple(json.loads(args)), expires_at)
+            self.restored += min(len(rows), self.max_entries)
+
+        logger.info("Restored %s conversations", min(len(rows), self.max_entries))
+        return min(len(rows), self.max_entries)
+
+    def clear(self):
+        with self._lock:
+            for key in self._entries:
+                self._write("delete", *key)
+            self._entries.clear()
+
+    def _memory(self):
+        """
+        Approximate bytes held by the states. Call with the lock held.
+        """
+        size = sys.getsizeof(self._entries)
+        for key, entry in self._entries.items():
+            size += sys.getsizeof(key) + sum(map(sys.getsizeof, key)) + sys.getsizeof(entry) + sys.getsizeof(entry[2])
+            size += sys.getsizeof(entry[1]) + sum(map(sys.getsizeof, entry[1]))
+        return size
+
+    def stats(self):
+        with self._lock:
+            self._purge(time.time())
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._memory(),
+                "sets": self.sets,
+                "resumed": self.resumed,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "restored": self.restored,
+            }
+
+    def close(self):
+        """
+        Apply the queued writes and close the backing
+        """
+        if self._writes is not None:
+            self._writes.put(None)
+            self._writer.join()
+            self._writes = None
+            self.backing.close()
+
+class StepRouter:
+    """
+    Sends a user's next text message to the step pending for them instead of the normal message handlers.
+    Steps are registered by function name, so a state restored after a restart still finds its handler.
+    Steps run acting as the user who sent the message.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.steps = {} # name -> handler
+
+    def step(self, handler):
+        """
+        Decorator registering handler(message, *args) as a step
+        """
+        if handler.__name__ in self.steps:
+            raise ValueError(f"Duplicate step {handler.__name__}")
+        self.steps[handler.__name__] = handler
+        return handler
+
+    def register(self, chat_id, user_id, handler, *args):
+        """
+        The next message from user_id in chat_id goes to handler(message, *args)
+        """
+        if self.steps.get(handler.__name__) is not handler:
+            raise ValueError(f"{handler.__name__} is not a registered step")
+        self.store.set(chat_id, user_id, handler.__name__, *args)
+
+    def pending(self, message):
+        return message.from_user is not None and self.store.pending(message.chat.id, message.from_user.id)
+
+    def resume(self, message):
+        state = self.store.pop(message.chat.id, message.from_user.id)
+        if state is None:
+            return None
+
+        step, args = state
+        handler = self.steps.get(step)
+        if handler is None:
+            logger.warning("Dropping conversation at unknown step %s", step)
+            return None
+
+        with acting_as(message.from_user.id):
+            return handler(message, *args)
+
+    def install(self, bot):
+        bot.register_message_handler(self.resume, func=self.pending, content_types=['text'])
+
+    def install_async(self, bot):
+        async def resume(message):
+            with acting_as(message.from_user.id):
+                result = self.resume(message)
+                if result is not None:
+                    await result
+
+        bot.register_message_handler(resume, func=self.pending, content_types=['text'])
+
+def create_conversation_store(backend):
+    """
+    'memory' (the default) keeps states in this process only. 'file' also writes them to the SQLite file CONVERSATION_FILE,
+    'postgres' to the conversations table on DATABASE_URL.
+    """
+    backing = None
+    if backend == 'file':
+        backing = SQLiteBacking(CONVERSATION_FILE)
+    elif backend == 'postgres':
+        from db.db import db_handler
+
+        if db_handler is None:
+            logger.warning("CONVERSATION_BACKEND is postgres but the storage backend is not. Keeping conversations in memory.")
+        else:
+            backing = PostgresBacking(db_handler)
+
+    return ConversationStore(ttl=CONVERSATION_TTL, max_entries=CONVERSATION_MAX_ENTRIES, backing=backing)
+
+conversation_store = create_conversation_store(CONVERSATION_BACKEND)
+atexit.register(conversation_store.close)
+
+# Read on every metrics scrape
+CONVERSATIONS.set_function(lambda: {(key,): value for key, value in conversation_store.stats().items() if key in ("entries", "bytes")})
+CONVERSATION_EVENTS.set_function(lambda: {
+    (event,): value for event, value in conversation_store.stats().items() if event in ("sets", "resumed", "expirations", "evictions", "restored")
+})
@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL.
+    Every invalidation bumps a generation counter, so a load that raced with a write is never stored.
+    """
+    def __init__(self, name, max_entries=64, ttl=300.0):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries = OrderedDict() # key -> (value, expires_at)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Returns (True, value) on a hit and (False, generation) on a miss.
+        Pass the generation back to put() so stale loads are dropped.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+
+                del self._entries[key]
+                self.expirations += 1
+
+            self.misses += 1
+            return False, self._generation
+
+    def put(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+            return True
+
+    def get_or_load(self, key, loader):
+        """
+        Return the cached value for key, or call loader() and cache its result unless it is None.
+        """
+        hit, value = self.get(key)
+        if hit:
+            return value
+
+        generation = value
+        value = loader()
+        if value is not None:
+            self.put(key, value, generation)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
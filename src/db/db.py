@@ -1,36 +1,132 @@
 import atexit
 import psycopg2
-from constants import KEEP_BOOKINGS_DAYS, UTC_DIFF_HOURS, COLUMNS
-from config import DATABASE_URL
+from contextlib import contextmanager
+from constants import UTC_DIFF_HOURS, COLUMNS
+from config import (
+    STORAGE_BACKEND, DATABASE_URL, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_PREPARE_STATEMENTS, AVAILABILITY_CACHE_SIZE,
+    AVAILABILITY_CACHE_TTL, DATABASE_REPLICA_URL, REPLICA_CHECK_INTERVAL, REPLICA_MAX_LAG, REPLICA_STICKY_SECONDS
+)
 from datetime import datetime, timedelta, date
 import logging
-import pandas as pd
-from .query import drop_table_query, create_tables_query, add_booking_query, get_all_bookings_query, get_bookings_by_date_query, get_bookings_by_id_query, cancel_booking_query
+from .cache import LRUCache
+from .models import Booking
+from .notify import BookingListener
+from .pool import ConnectionPool
+from .query import drop_table_query, create_tables_query
+from .replica import ReplicaMonitor, StickyUsers, current_user
+from .statements import STATEMENTS, WRITE, ONE, ALL
+from .storage import Storage, StorageError
 from zoneinfo import ZoneInfo
+from metrics import QUERY_LATENCY, QUERY_ERRORS, DB_POOL, CACHE_EVENTS, READ_ROUTES, track
 
 logger = logging.getLogger("db")
 
-class DatabaseHandler:
-    def __init__(self, db_url):
+class DatabaseHandler(Storage):
+    """
+    Postgres storage backend, on a pool of psycopg2 connections.
+    The hot statements come from db.statements and are prepared once per connection unless prepare is off,
+    which a transaction-pooling PgBouncer needs.
+    With a replica_url, the reads registered with replica=True run on a second pool there (see db.replica);
+    replica.start() begins checking its lag, and until the first check passes they stay on the primary.
+    """
+    def __init__(
+            self, db_url, min_size=1, max_size=10, timeout=30.0, prepare=True,
+            replica_url=None, replica_check_interval=5.0, replica_max_lag=10.0, sticky_seconds=10.0
+        ):
         self.db_url = db_url
-        self.connection = None
-        self.connect()
+        self.prepare = prepare
+        self.pool = ConnectionPool(db_url, min_size=min_size, max_size=max_size, timeout=timeout)
+
+        self.replica_pool = None
+        self.replica = None
+        self.sticky_seconds = sticky_seconds
+        self.sticky = StickyUsers()
+        if replica_url:
+            self.replica_pool = ConnectionPool(replica_url, min_size=min_size, max_size=max_size, timeout=timeout)
+            self.replica = ReplicaMonitor(self._replica_lag, interval=replica_check_interval, max_lag=replica_max_lag)
 
     def drop_table(self):
         logger.info("Dropping tables")
         self.execute_query(drop_table_query())
 
-    def connect(self):
-        if self.connection is None or self.connection.closed != 0:
+    @contextmanager
+    def connect(self, pool=None):
+        """
+        Borrow a connection from pool (the primary's by default) for the duration of the block.
+        Yields None if no connection could be obtained.
+        """
+        pool = pool or self.pool
+        try:
+            conn = pool.getconn()
+        except Exception as e:
+            logger.error("Error while connecting to PostgreSQL database: %s", e)
+            yield None
+            return
+
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            pool.putconn(conn, discard=discard or conn.closed != 0)
+
+    @contextmanager
+    def transaction(self, name, commit=False, pool=None):
+        """
+        (connection, cursor) on a connection from pool (the primary's by default) for the duration of the block,
+        timed under name. Commits at the end if commit is set. Raises StorageError if there is no connection or the block fails.
+        """
+        with track(QUERY_LATENCY, QUERY_ERRORS, name):
             try:
-                logger.info("Connecting to PostgreSQL database...")
-                self.connection = psycopg2.connect(self.db_url)
-                logger.info("Successfully connected to PostgreSQL database.")
-
-            except Exception as e:
-                logger.error(f"Error while connecting to PostgreSQL database: {e}")
-                self.connection = None
-        return self.connection
+                with self.connect(pool) as conn:
+                    if conn is None:
+                        raise StorageError(f"No database connection for {name}")
+
+                    with conn.cursor() as cursor:
+                        yield conn, cursor
+                    if commit:
+                        conn.commit()
+                        self._wrote()
+            except psycopg2.Error as e:
+                logger.error("Error executing %s: %s", name, e)
+                raise StorageError(f"Error executing {name}: {e}") from e
+
+    def _wrote(self):
+        """
+        Keep the acting user's reads on the primary until the replica has surely replayed what they wrote
+        """
+        user_id = current_user.get()
+        if self.replica is not None and user_id is not None:
+            self.sticky.add(user_id, max(self.sticky_seconds, self.replica.lag or 0.0))
+
+    def _replica_lag(self):
+        with self.transaction("replica_lag", pool=self.replica_pool) as (conn, cursor):
+            return self._execute(conn, cursor, STATEMENTS["replica_lag"], ())[0]
+
+    def _read_pool(self, statement):
+        """
+        The pool to run the READ statement on, counted under its route
+        """
+        if not statement.replica:
+            READ_ROUTES.inc("primary")
+            return self.pool
+
+        user_id = current_user.get()
+        if user_id is not None and user_id in self.sticky:
+            READ_ROUTES.inc("sticky")
+            return self.pool
+
+        if not self.replica.healthy:
+            READ_ROUTES.inc("unhealthy")
+            return self.pool
+
+        READ_ROUTES.inc("replica")
+        return self.replica_pool
+
+    def pool_stats(self):
+        return self.pool.stats()
     
     def create_table(self):
         self.execute_query(create_tables_query())
@@ -41,72 +137,149 @@ class DatabaseHandler:
         FROM information_schema.columns
         WHERE table_name = %s;
         """
-        result = self.execute_query(query, table_name)
-        if isinstance(result, Exception):
-            logger.error(f"Error fetching schema for table '{table_name}': {result}")
+        try:
+            result = self.execute_query(query, table_name)
+        except StorageError as e:
+            logger.error("Error fetching schema for table '%s': %s", table_name, e)
             return None
-        else:
-            logger.info(f"Schema for table '{table_name}':")
-            for row in result:
-                logger.info(f"Column: {row[0]}, Type: {row[1]}")
-            return result
+
+        logger.info("Schema for table '%s':", table_name)
+        for row in result:
+            logger.info("Column: %s, Type: %s", row[0], row[1])
+        return result
 
     def execute_query(self, query, *args):
-        conn = self.connect()
-        if conn is None:
-            return None
+        """
+        Run ad hoc SQL in its own transaction. Returns its rows if it produced any, otherwise True.
+        The bot's own queries go through run() instead.
+        """
+        with self.transaction("adhoc", commit=True) as (conn, cursor):
+            cursor.execute(query, args)
+            return cursor.fetchall() if cursor.description else True
 
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute(query, args)
-
-                if query.strip().upper().startswith("SELECT"):
-                    result = cursor.fetchall()
-                    logger.info("Successfully executed query")
-                    return result
-                else:
-                    conn.commit()
-                    logger.info(f"Successfully executed query: {query}")
-                    return True
-        except Exception as e:
-            logger.error(f"Error executing query: {e}")
-            return e
-    
-    def clear_old_bookings(self):
-        conn = self.connect()
-        if conn is None:
-            logger.error("Failed to connect to the database to clear old bookings")
-            return 
+    def _execute(self, conn, cursor, statement, args):
+        if not self.prepare:
+            cursor.execute(statement.sql, args)
+        else:
+            if statement.name not in conn.prepared:
+                cursor.execute(statement.prepare)
+                conn.prepared.add(statement.name)
+            cursor.execute(statement.execute, args)
+
+        logger.debug("Executed %s", statement.name)
+        if statement.fetch == ALL:
+            return cursor.fetchall()
+        if statement.fetch == ONE:
+            return cursor.fetchone()
+        return None
+
+    def run(self, name, *args, **params):
+        """
+        Execute the registered statement name with positional args or named params in its own transaction,
+        committing it if the statement is a write. Returns what the statement's fetch says: all rows, one row or None.
+        Reads registered with replica=True run on the replica if there is one and _read_pool picks it.
+        """
+        statement = STATEMENTS[name]
+        if statement.kind != WRITE and self.replica is not None and self._read_pool(statement) is self.replica_pool:
+            try:
+                with self.transaction(name, pool=self.replica_pool) as (conn, cursor):
+                    return self._execute(conn, cursor, statement, params or args)
+            except StorageError:
+                # The primary has everything the replica has, so the read is retried there
+                READ_ROUTES.inc("fallback")
+                self.replica.mark_down(f"{name} failed on the replica")
+
+        with self.transaction(name, commit=statement.kind == WRITE) as (conn, cursor):
+            return self._execute(conn, cursor, statement, params or args)
+
+    def add_booking(self, level, booking_datetime, username, first_name, user_chat_id, timeslot_date, timeslot_start_time, timeslot_end_time, status):
+        self.run("add_booking", level, booking_datetime, username, first_name, user_chat_id, timeslot_date, timeslot_start_time, timeslot_end_time, status)
+        return True
 
-        try:
-            with conn.cursor() as cursor:
-                # Calculate the date before which data should be deleted
-                cutoff_date = datetime.now(ZoneInfo('utc')) + timedelta(hours=UTC_DIFF_HOURS) - timedelta(days=KEEP_BOOKINGS_DAYS)
-                cutoff_date_str = cutoff_date.strftime('%Y-%m-%d %H:%M:%S')
+    def all_bookings(self, from_date):
+        return self.run("get_all_bookings", from_date)
 
-                # SQL query to delete bookings older than the cutoff date
-                query = """
-                DELETE FROM bookings
-                WHERE booking_datetime < %s
-                """
-                
-                logger.info(f"Deleting bookings older than {KEEP_BOOKINGS_DAYS} days from 'bookings' table.")
+    def bookings_between(self, start_date, end_date, status):
+        return self.run(f"get_bookings_between_{status}", start_date, end_date)
 
-                cursor.execute(query, (cutoff_date_str,))
-                rows_deleted = cursor.rowcount
-                conn.commit()  # Commit the deletion
+    def bookings_by_date(self, timeslot_date, status):
+        return self.run(f"get_bookings_by_date_{status}", timeslot_date)
 
-                logger.info(f"Deleted {rows_deleted} bookings older than {KEEP_BOOKINGS_DAYS} days from 'bookings' table.")
+    def bookings_by_id(self, user_chat_id, status, from_date):
+        return self.run(f"get_bookings_by_id_{status}", user_chat_id, from_date)
 
-        except Exception as e:
-            logger.error(f"Error clearing old bookings: {e}")
+    def cancel_booking(self, booking_id, timeslot_date=None):
+        if timeslot_date is None:
+            return self.run("cancel_booking", booking_id)
+        return self.run("cancel_booking_by_date", booking_id, timeslot_date)
+
+    def book_if_free(self, **params):
+        """
+        Takes the (level, date) lock and runs book_if_free in one transaction
+        """
+        with self.transaction("book_if_free", commit=True) as (conn, cursor):
+            self._execute(conn, cursor, STATEMENTS["lock_level_date"], params)
+            return self._execute(conn, cursor, STATEMENTS["book_if_free"], params)
+
+    def book_many(self, timeslot_dates, **params):
+        """
+        Takes the (level, date) locks for every date and runs book_many in one transaction
+        """
+        params["timeslot_dates"] = sorted(set(timeslot_dates))
+        with self.transaction("book_many", commit=True) as (conn, cursor):
+            self._execute(conn, cursor, STATEMENTS["lock_level_dates"], params)
+            return self._execute(conn, cursor, STATEMENTS["book_many"], params)
+
+    def cancel_bookings(self, booking_ids):
+        return self.run("cancel_bookings", list(booking_ids))
+
+    def _delete_old_bookings_batch(self, cutoff, batch_size, archive):
+        name = "delete_old_bookings_batch_archive" if archive else "delete_old_bookings_batch"
+        return self.run(name, cutoff=cutoff, batch_size=batch_size)[0]
 
     def close(self):
-        if self.connection and self.connection.closed == 0:
-            self.connection.close()
-            logger.info("Closed PostgreSQL connection.")
+        if self.replica is not None:
+            self.replica.stop()
+            self.replica_pool.close()
+        self.pool.close()
+
+def create_storage(backend):
+    """
+    'postgres' (the default) connects to DATABASE_URL. 'memory' keeps bookings in this process and needs no server.
+    """
+    if backend == 'memory':
+        from .memory import MemoryStorage
+
+        logger.info("Using in-memory storage. Bookings are lost on restart.")
+        return MemoryStorage()
+
+    return DatabaseHandler(
+        DATABASE_URL, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE, timeout=DB_POOL_TIMEOUT, prepare=DB_PREPARE_STATEMENTS,
+        replica_url=DATABASE_REPLICA_URL, replica_check_interval=REPLICA_CHECK_INTERVAL, replica_max_lag=REPLICA_MAX_LAG,
+        sticky_seconds=REPLICA_STICKY_SECONDS
+    )
+
+storage = create_storage(STORAGE_BACKEND)
+
+# The Postgres backend, for migrations, partitioning and ad hoc SQL. None with any other backend.
+db_handler = storage if isinstance(storage, DatabaseHandler) else None
+
+# Booked slots keyed by timeslot_date. Writes in this process invalidate the affected date before returning.
+availability_cache = LRUCache("availability", max_entries=AVAILABILITY_CACHE_SIZE, ttl=AVAILABILITY_CACHE_TTL)
 
-db_handler = DatabaseHandler(DATABASE_URL)
+# Booking writes from every process (this one included), once started. None with any other backend,
+# where there is only this process.
+booking_listener = BookingListener(DATABASE_URL) if db_handler is not None else None
+if booking_listener is not None:
+    booking_listener.subscribe(lambda level, timeslot_date: availability_cache.invalidate(timeslot_date), availability_cache.clear)
+
+# Read on every metrics scrape
+if db_handler is not None:
+    DB_POOL.set_function(lambda: {(state,): db_handler.pool_stats()[state] for state in ("size", "idle", "in_use", "waiting")})
+CACHE_EVENTS.set_function(lambda: {
+    (availability_cache.name, event): availability_cache.stats()[event]
+    for event in ("hits", "misses", "evictions", "expirations", "invalidations")
+})
 
 def add_booking(
         level: int, booking_date: date, username: str, first_name: str, user_chat_id: str,
@@ -118,100 +291,259 @@ def add_booking(
     logger.info("Adding booking")
 
     try:
-        timeslot_date = datetime.strptime(timeslot_date, '%d/%m/%Y').strftime('%Y-%m-%d')
+        timeslot_date = datetime.strptime(timeslot_date, '%d/%m/%Y').date()
     except ValueError as e:
-        logger.error(f"Invalid date format: {e}")
-        return pd.DataFrame()  # Return empty DataFrame
-
-    result = db_handler.execute_query(add_booking_query(), level, booking_date, username, first_name, user_chat_id, timeslot_date, timeslot_start_time, timeslot_end_time, "booked")
+        logger.error("Invalid date format: %s", e)
+        return False
 
-    if isinstance(result, Exception):
-        logger.error(f"Error adding booking: {result}")
+    try:
+        storage.add_booking(level, booking_date, username, first_name, user_chat_id, timeslot_date, timeslot_start_time, timeslot_end_time, "booked")
+    except StorageError as e:
+        logger.error("Error adding booking: %s", e)
         return False
-    
+    finally:
+        availability_cache.invalidate(timeslot_date)
+
     return True
 
-def get_all_bookings():
+def book_if_free(
+        level: int, booking_date: date, username: str, first_name: str, user_chat_id: str,
+        timeslot_date: str, timeslot_start_time: str, timeslot_end_time: str
+    ):
     """
-    Fetch all bookings for coming week
+    Atomically add a booking if the timeslot does not clash with an existing booking.
+    Returns (booking_id, None) on success, (None, (clash_start, clash_end)) on a clash and (None, None) on error.
     """
-    logger.info(f"Getting all bookings")
+    logger.info("Adding booking if free")
 
-    today = datetime.today() + timedelta(hours=UTC_DIFF_HOURS)
-    today_str = today.date().strftime('%Y-%m-%d')  # Convert to YYYY-MM-DD format
+    try:
+        timeslot_date = datetime.strptime(timeslot_date, '%d/%m/%Y').date()
+    except ValueError as e:
+        logger.error("Invalid date format: %s", e)
+        return None, None
+
+    try:
+        result = storage.book_if_free(
+            level=level, booking_datetime=booking_date, username=username, first_name=first_name, user_chat_id=user_chat_id,
+            timeslot_date=timeslot_date, timeslot_start_time=timeslot_start_time, timeslot_end_time=timeslot_end_time
+        )
+    except StorageError as e:
+        logger.error("Error adding booking: %s", e)
+        return None, None
+
+    availability_cache.invalidate(timeslot_date)
+
+    status, booking_id, start_time, end_time = result
+    if status == "clash":
+        logger.info("Booking clashes with booking id: %s", booking_id)
+        return None, (start_time, end_time)
 
-    # Use parameterized query
-    result = db_handler.execute_query(get_all_bookings_query(), today_str)
+    logger.info("Successfully added booking id: %s", booking_id)
+    return booking_id, None
 
-    if isinstance(result, Exception):
+def book_many(
+        level: int, booking_date: date, username: str, first_name: str, user_chat_id: str,
+        timeslot_dates: list, timeslot_start_time: str, timeslot_end_time: str
+    ):
+    """
+    Book the same level and times on every date in timeslot_dates (dates or DD/MM/YYYY strings) in one transaction, all or nothing.
+    Returns (booking_ids, None) on success, (None, {date: [(clash_start, clash_end), ...]}) if any date clashes
+    and (None, None) on error.
+    """
+    logger.info("Adding %s bookings if free", len(timeslot_dates))
+
+    dates = [parse_timeslot_date(timeslot_date) for timeslot_date in timeslot_dates]
+    if not dates or None in dates:
+        return None, None
+
+    try:
+        rows = storage.book_many(
+            dates, level=level, booking_datetime=booking_date, username=username, first_name=first_name, user_chat_id=user_chat_id,
+            timeslot_start_time=timeslot_start_time, timeslot_end_time=timeslot_end_time
+        )
+    except StorageError as e:
+        logger.error("Error adding bookings: %s", e)
+        return None, None
+
+    for timeslot_date in set(dates):
+        availability_cache.invalidate(timeslot_date)
+
+    clashes = {}
+    for status, booking_id, timeslot_date, start_time, end_time in rows:
+        if status == "clash":
+            clashes.setdefault(timeslot_date, []).append((start_time, end_time))
+
+    if clashes:
+        logger.info("Bookings clash on %s", ", ".join(map(str, clashes)))
+        return None, clashes
+
+    booking_ids = [row[1] for row in rows]
+    logger.info("Successfully added booking ids: %s", booking_ids)
+    return booking_ids, None
+
+def parse_timeslot_date(timeslot_date):
+    """
+    Accepts a date or a DD/MM/YYYY string. Returns a date, or None if the string is invalid.
+    """
+    if isinstance(timeslot_date, date):
+        return timeslot_date
+
+    try:
+        return datetime.strptime(timeslot_date, '%d/%m/%Y').date()
+    except Exception as e:
+        logger.error("Invalid date format: %s", e)
+        return None
+
+def to_bookings(rows):
+    """
+    Wrap raw rows from a storage backend in Booking records
+    """
+    return list(map(Booking._make, rows))
+
+def fetch_all_bookings():
+    """
+    Fetch all bookings from today onwards as a list of Booking records
+    """
+    logger.debug("Getting all bookings")
+
+    today = datetime.today() + timedelta(hours=UTC_DIFF_HOURS)
+
+    try:
+        result = storage.all_bookings(today.date())
+    except StorageError:
         logger.error("Error retrieving all bookings")
-        return pd.DataFrame()
+        return []
 
-    bookings_df = pd.DataFrame(result, columns=COLUMNS)
+    logger.debug("Successfully retrieved all bookings")
+    return to_bookings(result)
 
-    logger.info("Successfully retrieved all bookings")
+def fetch_bookings_between(start_date, end_date, status="booked"):
+    """
+    Fetch bookings with timeslot_date from start_date to end_date inclusive, as a list of Booking records
+    ordered by timeslot_date, level and timeslot_start_time
+    """
+    logger.debug("Getting bookings between %s and %s", start_date, end_date)
 
-    return bookings_df
+    try:
+        result = storage.bookings_between(start_date, end_date, status)
+    except StorageError:
+        logger.error("Error retrieving bookings between %s and %s", start_date, end_date)
+        return []
 
-def get_bookings_by_date(timeslot_date):
+    return to_bookings(result)
+
+def fetch_bookings_by_date(timeslot_date):
     """
-    Fetch bookings where timeslot_date matches.
-    Returns a Pandas DataFrame containing all matching bookings.
+    Fetch booked bookings where timeslot_date matches as a list of Booking records.
+    Served from availability_cache when possible.
     """
-    logger.info("Getting bookings by date")
+    timeslot_date = parse_timeslot_date(timeslot_date)
+    if timeslot_date is None:
+        return []
 
-    if not isinstance(timeslot_date, date):
-        try:
-            # Convert the date from DD/MM/YYYY to YYYY-MM-DD format
-            timeslot_date = datetime.strptime(timeslot_date, '%d/%m/%Y').strftime('%Y-%m-%d')
-        except Exception as e:
-            logger.error(f"Invalid date format: {e}")
-            return pd.DataFrame()  # Return an empty DataFrame
-    
-    # Execute the query with timeslot_date as the parameter for each level
-    result = db_handler.execute_query(get_bookings_by_date_query(), timeslot_date, "booked")
+    bookings = availability_cache.get_or_load(timeslot_date, lambda: _load_bookings_by_date(timeslot_date))
+    return list(bookings) if bookings is not None else []
 
-    # Return an empty DataFrame in case of error
-    if isinstance(result, Exception):
-        logger.error(f"Error retrieving bookings for {timeslot_date}")
-        return pd.DataFrame()
-    
-    bookings_df = pd.DataFrame(result, columns=COLUMNS)
+def _load_bookings_by_date(timeslot_date):
+    logger.debug("Getting bookings by date")
+
+    # Errors return None so they are not cached
+    try:
+        result = storage.bookings_by_date(timeslot_date, "booked")
+    except StorageError:
+        logger.error("Error retrieving bookings for %s", timeslot_date)
+        return None
 
-    logger.info(f"Successfully retrieved bookings for {timeslot_date}")
-    return bookings_df
+    logger.debug("Successfully retrieved bookings for %s", timeslot_date)
+    return tuple(to_bookings(result))
 
-def get_bookings_by_id(id):
+def fetch_bookings_by_id(id, from_date=None):
+    """
+    Fetch booked bookings made by user_chat_id from from_date (default today, SGT) onwards as a list of Booking records
+    """
+    logger.debug("Getting bookings by id")
 
-    logger.info("Getting bookings by id")
+    if from_date is None:
+        from_date = datetime.now(ZoneInfo("Asia/Singapore")).date()
 
-    # Execute the query with timeslot_date as the parameter for each level
-    result = db_handler.execute_query(get_bookings_by_id_query(), id, "booked")
+    try:
+        result = storage.bookings_by_id(id, "booked", from_date)
+    except StorageError:
+        logger.error("Error retrieving bookings for %s", id)
+        return []
 
-    # Return an empty DataFrame in case of error
-    if isinstance(result, Exception):
-        logger.error("Error retrieving all bookings")
-        return pd.DataFrame()
-    
-    bookings_df = pd.DataFrame(result, columns=COLUMNS)
+    logger.debug("Successfully retrieved bookings for %s", id)
+    return to_bookings(result)
 
-    logger.info(f"Successfully retrieved bookings for {id}")
-    return bookings_df
+# DataFrame layer for bulk and analytics use. The bot itself works on Booking records.
+def to_dataframe(bookings):
+    import pandas as pd # Only needed for analytics, so keep it off the import path of the bot
+
+    return pd.DataFrame(bookings, columns=COLUMNS)
+
+def get_all_bookings():
+    """
+    Fetch all bookings from today onwards.
+    Returns a Pandas DataFrame containing all matching bookings.
+    """
+    return to_dataframe(fetch_all_bookings())
 
-def cancel_booking(level: int, booking_id: str):
+def get_bookings_by_date(timeslot_date):
     """
-    Cancel booking by changing booking status of booking_id
+    Fetch bookings where timeslot_date matches.
+    Returns a Pandas DataFrame containing all matching bookings.
     """
-    logger.info(f"Cancelling booking id: {booking_id}")
+    return to_dataframe(fetch_bookings_by_date(timeslot_date))
 
-    logger.info(f"Updating status of booking from level_{level} to 'cancelled'")
-    result = db_handler.execute_query(cancel_booking_query(), booking_id)
+def get_bookings_by_id(id):
+    """
+    Fetch bookings made by user_chat_id.
+    Returns a Pandas DataFrame containing all matching bookings.
+    """
+    return to_dataframe(fetch_bookings_by_id(id))
 
-    if isinstance(result, Exception):
-        logger.error(f"Error cancelling booking id: {booking_id}")
+def cancel_booking(level: int, booking_id: str, timeslot_date: date = None):
+    """
+    Cancel booking by changing booking status of booking_id. Returns False if it failed or there was no such booking.
+    Passing the booking's timeslot_date lets a partitioned table go straight to its partition.
+    """
+    logger.info("Cancelling booking id: %s", booking_id)
+
+    logger.debug("Updating status of booking from level_%s to 'cancelled'", level)
+    try:
+        result = storage.cancel_booking(booking_id, timeslot_date)
+    except StorageError:
+        logger.error("Error cancelling booking id: %s", booking_id)
         return False
-    else:
-        logger.info(f"Successfully updated booking id: {booking_id} to 'cancelled'")
-        return True
 
-atexit.register(db_handler.close)
+    if not result:
+        logger.info("No booking with id %s to cancel", booking_id)
+        return False
+
+    for (timeslot_date,) in result:
+        availability_cache.invalidate(timeslot_date)
+
+    logger.info("Successfully updated booking id: %s to 'cancelled'", booking_id)
+    return True
+
+def cancel_bookings(booking_ids):
+    """
+    Cancel every booked booking in booking_ids with one statement.
+    Returns the ids that were cancelled, or None on error.
+    """
+    logger.info("Cancelling booking ids: %s", booking_ids)
+
+    try:
+        result = storage.cancel_bookings(booking_ids)
+    except StorageError:
+        logger.error("Error cancelling booking ids: %s", booking_ids)
+        return None
+
+    for timeslot_date in {timeslot_date for _, timeslot_date in result}:
+        availability_cache.invalidate(timeslot_date)
+
+    cancelled = [booking_id for booking_id, _ in result]
+    logger.info("Successfully updated booking ids: %s to 'cancelled'", cancelled)
+    return cancelled
+
+atexit.register(storage.close)
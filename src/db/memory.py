@@ -0,0 +1,155 @@
+import itertools
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, time
+from .models import Booking
+from .storage import Storage
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def _as_time(value):
+    return time.fromisoformat(value) if isinstance(value, str) else value
+
+class MemoryStorage(Storage):
+    """
+    Bookings kept in this process, indexed by timeslot_date and user_chat_id. Nothing survives a restart,
+    so it is for load tests, benchmarks and running the bot without a database server.
+    One lock guards everything, which also makes book_if_free atomic.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._ids = itertools.count(1)
+            self._rows = {} # booking_id -> Booking
+            self._by_date = {} # timeslot_date -> [booking_id, ...]
+            self._dates = [] # Sorted keys of _by_date, for range scans
+            self._by_user = {} # user_chat_id -> {booking_id, ...}
+            self.archive = {} # booking_id -> Booking, rows retention archived
+
+    def _insert(self, level, booking_datetime, username, first_name, user_chat_id, timeslot_date, timeslot_start_time, timeslot_end_time, status):
+        booking = Booking(
+            next(self._ids),
+            # TIMESTAMP columns drop the offset and keep the wall clock, so do the same
+            booking_datetime.replace(tzinfo=None) if booking_datetime.tzinfo else booking_datetime,
+            level, username, first_name, user_chat_id,
+            _as_date(timeslot_date), _as_time(timeslot_start_time), _as_time(timeslot_end_time), status
+        )
+
+        self._rows[booking.booking_id] = booking
+        ids = self._by_date.get(booking.timeslot_date)
+        if ids is None:
+            ids = self._by_date[booking.timeslot_date] = []
+            insort(self._dates, booking.timeslot_date)
+        ids.append(booking.booking_id)
+        self._by_user.setdefault(booking.user_chat_id, set()).add(booking.booking_id)
+        return booking
+
+    def _remove(self, booking):
+        del self._rows[booking.booking_id]
+        ids = self._by_date[booking.timeslot_date]
+        ids.remove(booking.booking_id)
+        if not ids:
+            del self._by_date[booking.timeslot_date]
+            del self._dates[bisect_left(self._dates, booking.timeslot_date)]
+        self._by_user[booking.user_chat_id].discard(booking.booking_id)
+
+    def _on_dates(self, start_date, end_date=None):
+        """
+        Rows with timeslot_date from start_date to end_date inclusive (or onwards), in date order
+        """
+        first = bisect_left(self._dates, start_date)
+        last = len(self._dates) if end_date is None else bisect_right(self._dates, end_date)
+        return [self._rows[booking_id] for day in self._dates[first:last] for booking_id in self._by_date[day]]
+
+    def add_booking(self, level, booking_datetime, username, first_name, user_chat_id, timeslot_date, timeslot_start_time, timeslot_end_time, status):
+        with self._lock:
+            self._insert(level, booking_datetime, username, first_name, user_chat_id, timeslot_date, timeslot_start_time, timeslot_end_time, status)
+        return True
+
+    def _clashes(self, level, timeslot_date, start, end):
+        return [
+            booking for booking in map(self._rows.__getitem__, self._by_date.get(timeslot_date, ()))
+            if booking.level == level and booking.status == "booked"
+            and booking.timeslot_start_time < end and booking.timeslot_end_time > start
+        ]
+
+    def book_if_free(self, **params):
+        timeslot_date = _as_date(params["timeslot_date"])
+        start, end = _as_time(params["timeslot_start_time"]), _as_time(params["timeslot_end_time"])
+
+        with self._lock:
+            clashes = self._clashes(params["level"], timeslot_date, start, end)
+            if clashes:
+                clash = min(clashes, key=lambda booking: booking.timeslot_start_time)
+                return "clash", clash.booking_id, clash.timeslot_start_time, clash.timeslot_end_time
+
+            booking = self._insert(status="booked", **params)
+            return "booked", booking.booking_id, booking.timeslot_start_time, booking.timeslot_end_time
+
+    def book_many(self, timeslot_dates, **params):
+        timeslot_dates = sorted(set(map(_as_date, timeslot_dates)))
+        start, end = _as_time(params["timeslot_start_time"]), _as_time(params["timeslot_end_time"])
+
+        with self._lock:
+            clashes = [
+                ("clash", booking.booking_id, booking.timeslot_date, booking.timeslot_start_time, booking.timeslot_end_time)
+                for timeslot_date in timeslot_dates
+                for booking in sorted(self._clashes(params["level"], timeslot_date, start, end), key=lambda booking: booking.timeslot_start_time)
+            ]
+            if clashes:
+                return clashes
+
+            bookings = [self._insert(status="booked", timeslot_date=timeslot_date, **params) for timeslot_date in timeslot_dates]
+            return [("booked", booking.booking_id, booking.timeslot_date, booking.timeslot_start_time, booking.timeslot_end_time) for booking in bookings]
+
+    def all_bookings(self, from_date):
+        with self._lock:
+            return self._on_dates(from_date)
+
+    def bookings_between(self, start_date, end_date, status):
+        with self._lock:
+            rows = [booking for booking in self._on_dates(start_date, end_date) if booking.status == status]
+        return sorted(rows, key=lambda booking: (booking.timeslot_date, booking.level, booking.timeslot_start_time))
+
+    def bookings_by_date(self, timeslot_date, status):
+        with self._lock:
+            return [booking for booking in map(self._rows.__getitem__, self._by_date.get(timeslot_date, ())) if booking.status == status]
+
+    def bookings_by_id(self, user_chat_id, status, from_date):
+        with self._lock:
+            return [
+                booking for booking in map(self._rows.__getitem__, sorted(self._by_user.get(user_chat_id, ())))
+                if booking.status == status and booking.timeslot_date >= from_date
+            ]
+
+    def cancel_booking(self, booking_id, timeslot_date=None):
+        with self._lock:
+            booking = self._rows.get(booking_id)
+            if booking is None or booking.status != "booked" or (timeslot_date is not None and booking.timeslot_date != timeslot_date):
+                return []
+
+            self._rows[booking_id] = booking._replace(status="cancelled")
+            return [(booking.timeslot_date,)]
+
+    def cancel_bookings(self, booking_ids):
+        with self._lock:
+            cancelled = []
+            for booking_id in booking_ids:
+                booking = self._rows.get(booking_id)
+                if booking is not None and booking.status == "booked":
+                    self._rows[booking_id] = booking._replace(status="cancelled")
+                    cancelled.append((booking_id, booking.timeslot_date))
+            return cancelled
+
+    def _delete_old_bookings_batch(self, cutoff, batch_size, archive):
+        with self._lock:
+            batch = list(itertools.islice((self._rows[booking_id] for day in self._dates[:bisect_left(self._dates, cutoff)] for booking_id in self._by_date[day]), batch_size))
+            for booking in batch:
+                self._remove(booking)
+                if archive:
+                    self.archive.setdefault(booking.booking_id, booking)
+            return len(batch)
@@ -0,0 +1,65 @@
+import logging
+from .query import create_tables_query, create_indexes_query, create_archive_table_query, create_conversations_table_query, create_booking_notify_trigger_query, create_boards_table_query, index_retention_by_timeslot_date_query, create_migrations_table_query, get_applied_migrations_query, add_migration_query
+
+logger = logging.getLogger("db (migrations)")
+
+# Any constant works as long as nothing else takes the same advisory lock
+MIGRATION_LOCK_KEY = 4120
+
+# (version, name, query). Append new migrations to the end and never edit applied ones.
+MIGRATIONS = [
+    (1, "create bookings table", create_tables_query()),
+    (2, "add booking indexes", create_indexes_query()),
+    (3, "create bookings archive table", create_archive_table_query()),
+    (4, "create conversations table", create_conversations_table_query()),
+    (5, "notify booking changes", create_booking_notify_trigger_query()),
+    (6, "create boards table", create_boards_table_query()),
+    (7, "index retention by timeslot_date", index_retention_by_timeslot_date_query()),
+]
+
+def run_migrations(db_handler):
+    """
+    Bring the schema up to date, applying each pending migration in its own transaction.
+    Safe to run from several processes at once: the advisory lock makes later runners wait and then skip.
+    Returns the list of applied versions, or None if the database could not be reached.
+    """
+    with db_handler.connect() as conn:
+        if conn is None:
+            logger.error("Failed to connect to the database to run migrations")
+            return None
+
+        applied = []
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_KEY,))
+                try:
+                    cursor.execute(create_migrations_table_query())
+                    cursor.execute(get_applied_migrations_query())
+                    done = {row[0] for row in cursor.fetchall()}
+                    conn.commit()
+
+                    for version, name, query in MIGRATIONS:
+                        if version in done:
+                            continue
+
+                        logger.info("Applying migration %s: %s", version, name)
+                        cursor.execute(query)
+                        cursor.execute(add_migration_query(), (version, name))
+                        conn.commit()
+                        applied.append(version)
+
+                finally:
+                    conn.rollback()
+                    cursor.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_KEY,))
+                    conn.commit()
+
+        except Exception as e:
+            logger.error("Error running migrations: %s", e)
+            return None
+
+        if applied:
+            logger.info("Applied migrations %s", applied)
+        else:
+            logger.info("Database schema is up to date")
+
+        return applied
@@ -0,0 +1,17 @@
+from datetime import date, datetime, time
+from typing import NamedTuple
+
+class Booking(NamedTuple):
+    """
+    One row of the bookings table, in the same order as COLUMNS and the table itself.
+    """
+    booking_id: int
+    booking_datetime: datetime
+    level: int
+    username: str
+    first_name: str
+    user_chat_id: int
+    timeslot_date: date
+    timeslot_start_time: time
+    timeslot_end_time: time
+    status: str
@@ -0,0 +1,130 @@
+"""
+Booking writes from every process, as they commit, through Postgres LISTEN/NOTIFY.
+
+Migration 5 puts a trigger on bookings that notifies BOOKING_CHANNEL with the (level, timeslot_date) of every row
+a statement writes, whichever process or tool wrote it. A BookingListener holds one connection of its own
+(outside the pool, since it never gives it back), LISTENs on it and passes each change to its subscribers,
+so their local caches drop what changed without polling the table.
+"""
+import logging
+import select
+import threading
+import time
+from datetime import date
+import psycopg2
+from metrics import BOOKING_NOTIFICATIONS, NOTIFY_LAG
+from .query import listen_query
+
+logger = logging.getLogger("db (notify)")
+
+def parse_notification(payload):
+    """
+    (level, timeslot_date, seconds since the writing statement started) from a trigger payload,
+    or None if the payload is not one
+    """
+    try:
+        level, timeslot_date, sent = payload.split(" ")
+        return int(level), date.fromisoformat(timeslot_date), time.time() - float(sent)
+    except ValueError:
+        return None
+
+class BookingListener:
+    """
+    Daemon thread LISTENing for booking changes. Subscribers are called on it with (level, timeslot_date)
+    for each change, and their reset callback runs on every (re)connect, since changes made while nobody
+    was listening are lost.
+    """
+    def __init__(self, db_url, poll_interval=1.0, max_backoff=30.0):
+        self.db_url = db_url
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+
+        self._subscribers = [] # (on_change, on_reset)
+        self._stop = threading.Event()
+        self._thread = None
+        self.connected = threading.Event()
+
+    def subscribe(self, on_change, on_reset=None):
+        """
+        on_change(level, timeslot_date) for every change, on_reset() whenever changes may have been missed
+        """
+        self._subscribers.append((on_change, on_reset))
+
+    def _reset(self):
+        for _, on_reset in self._subscribers:
+            if on_reset is not None:
+                on_reset()
+
+    def _apply(self, changes):
+        for level, timeslot_date in changes:
+            for on_change, _ in self._subscribers:
+                try:
+                    on_change(level, timeslot_date)
+                except Exception as e:
+                    logger.error("Error applying change to level %s on %s: %s", level, timeslot_date, e)
+
+    def _drain(self, conn):
+        """
+        Apply the notifications received so far, each (level, date) once
+        """
+        conn.poll()
+        changes = {}
+        while conn.notifies:
+            notification = conn.notifies.pop(0)
+            change = parse_notification(notification.payload)
+            if change is None:
+                logger.warning("Ignoring notification %r", notification.payload)
+                continue
+
+            level, timeslot_date, lag = change
+            changes[(level, timeslot_date)] = None
+            NOTIFY_LAG.observe(max(lag, 0))
+
+        BOOKING_NOTIFICATIONS.inc("received", amount=len(changes))
+        self._apply(changes)
+
+    def _listen(self):
+        # Keepalives, so a connection that died silently is noticed rather than listened on forever
+        conn = psycopg2.connect(self.db_url, keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(listen_query())
+
+            self._reset()
+            self.connected.set()
+            logger.info("Listening for booking changes")
+
+            while not self._stop.is_set():
+                if select.select([conn], [], [], self.poll_interval) != ([], [], []):
+                    self._drain(conn)
+        finally:
+            self.connected.clear()
+            conn.close()
+
+    def _run(self):
+        backoff = 0.5
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self._listen()
+            except (psycopg2.Error, OSError) as e:
+                # Back off while reconnecting fails, and start over after a connection that held
+                backoff = 1.0 if time.monotonic() - started > self.max_backoff else min(backoff * 2, self.max_backoff)
+                logger.error("Lost the booking change listener: %s. Reconnecting in %.0f s", e, backoff)
+                BOOKING_NOTIFICATIONS.inc("reconnects")
+                self._reset()
+                self._stop.wait(backoff)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="booking-listener", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
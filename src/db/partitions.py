@@ -0,0 +1,147 @@
+import logging
+import re
+from datetime import date
+from .migrations import MIGRATION_LOCK_KEY
+from .query import (
+    create_partitioned_table_query, rename_unpartitioned_bookings_query, copy_unpartitioned_bookings_query, create_indexes_query,
+    index_retention_by_timeslot_date_query, create_booking_notify_trigger_query,
+    get_booking_date_range_query, is_partitioned_query, get_partitions_query, create_partition_query, detach_partition_query, drop_partition_query
+)
+
+logger = logging.getLogger("db (partitions)")
+
+PARTITION_NAME = re.compile(r"^bookings_(\d{4})_(\d{2})$")
+
+def add_months(month, months):
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def partition_name(month):
+    return f"bookings_{month:%Y_%m}"
+
+def partition_month(name):
+    """
+    First day of the month a partition covers, or None if name is not a monthly partition
+    """
+    match = PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+def is_partitioned(cursor):
+    cursor.execute(is_partitioned_query())
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+def create_partitions(cursor, first_month, last_month):
+    """
+    Create the monthly partitions from first_month to last_month inclusive that do not exist yet.
+    Returns the names of the partitions created.
+    """
+    cursor.execute(get_partitions_query())
+    existing = {name for (name,) in cursor.fetchall()}
+
+    created = []
+    month = first_month.replace(day=1)
+    while month <= last_month:
+        name = partition_name(month)
+        if name not in existing:
+            cursor.execute(create_partition_query(name, month, add_months(month, 1)))
+            created.append(name)
+        month = add_months(month, 1)
+
+    return created
+
+def convert_to_partitioned(cursor, today, months_ahead=3):
+    """
+    Rebuild an unpartitioned bookings table as a partitioned one, keeping every row and the booking_id sequence.
+    Run inside one transaction: bookings is locked until it commits, so expect a pause on large tables.
+    """
+    cursor.execute(get_booking_date_range_query())
+    first_date, last_date = cursor.fetchone()
+
+    first_month = min(first_date or today, today).replace(day=1)
+    last_month = max(last_date or today, add_months(today.replace(day=1), months_ahead))
+
+    cursor.execute(rename_unpartitioned_bookings_query())
+    cursor.execute(create_partitioned_table_query())
+    created = create_partitions(cursor, first_month, last_month)
+    cursor.execute(create_indexes_query())
+    cursor.execute(index_retention_by_timeslot_date_query())
+    cursor.execute(copy_unpartitioned_bookings_query())
+    # The old table's trigger went with it. Added after the copy so the copied rows are not announced.
+    cursor.execute(create_booking_notify_trigger_query())
+
+    return created
+
+def expire_partitions(cursor, cutoff, detach=False):
+    """
+    Remove every monthly partition that ends on or before cutoff: detached, so it stays behind as a plain table,
+    or dropped. Either way it is a catalog change, not a scan.
+    Returns the names of the partitions removed.
+    """
+    cursor.execute(get_partitions_query())
+
+    removed = []
+    for (name,) in cursor.fetchall():
+        month = partition_month(name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+
+        cursor.execute(detach_partition_query(name) if detach else drop_partition_query(name))
+        removed.append(name)
+
+    return sorted(removed)
+
+def partition_bookings(db_handler, today, months_ahead=3):
+    """
+    Convert bookings to a partitioned table if it is not one yet, then make sure partitions exist
+    from this month to months_ahead months ahead. Holds the migration lock so only one process converts.
+    Returns the names of the partitions created, or None on failure.
+    """
+    with db_handler.connect() as conn:
+        if conn is None:
+            logger.error("Failed to connect to the database to partition bookings")
+            return None
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s);", (MIGRATION_LOCK_KEY,))
+
+                if is_partitioned(cursor):
+                    created = create_partitions(cursor, today, add_months(today.replace(day=1), months_ahead))
+                else:
+                    logger.info("Converting bookings to a partitioned table")
+                    created = convert_to_partitioned(cursor, today, months_ahead)
+
+            conn.commit()
+        except Exception as e:
+            logger.error("Error partitioning bookings: %s", e)
+            return None
+
+        if created:
+            logger.info("Created partitions %s", created)
+        return created
+
+def maintain_partitions(db_handler, today, cutoff, months_ahead=3, detach=False):
+    """
+    Retention for a partitioned table: create upcoming partitions and remove the ones that only hold slots
+    before cutoff (see retention_cutoff). Rows before cutoff in a month that ends after it wait for the month to end.
+    Returns the names of the partitions removed, or None on failure.
+    """
+    with db_handler.connect() as conn:
+        if conn is None:
+            logger.error("Failed to connect to the database to maintain partitions")
+            return None
+
+        try:
+            with conn.cursor() as cursor:
+                created = create_partitions(cursor, today, add_months(today.replace(day=1), months_ahead))
+                removed = expire_partitions(cursor, cutoff, detach=detach)
+            conn.commit()
+        except Exception as e:
+            logger.error("Error maintaining partitions: %s", e)
+            return None
+
+    if created:
+        logger.info("Created partitions %s", created)
+    logger.info("%s %s partitions older than %s: %s", 'Detached' if detach else 'Dropped', len(removed), cutoff, removed)
+    return removed
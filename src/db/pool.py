@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger("db (pool)")
+
+class PoolTimeout(Exception):
+    pass
+
+class Connection(extensions.connection):
+    """
+    psycopg2 connection that remembers which named statements have been prepared on it.
+    Prepared statements live as long as the session, so a new connection starts with none.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of psycopg2 connections.
+    Each checkout hands the caller its own connection, so concurrent handlers never share a socket or a transaction.
+    """
+    def __init__(self, db_url, min_size=1, max_size=10, timeout=30.0, health_check_interval=30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size (min={min_size}, max={max_size})")
+
+        self.db_url = db_url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle = [] # (connection, last_used)
+        self._size = 0 # Open connections, idle or in use
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        # Stats
+        self._checkouts = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+        self._timeouts = 0
+        self._discarded = 0
+
+        for _ in range(min_size):
+            try:
+                self._idle.append((self._connect(), time.monotonic()))
+                self._size += 1
+            except Exception as e:
+                logger.error("Error while connecting to PostgreSQL database: %s", e)
+                break
+
+    def _connect(self):
+        logger.info("Connecting to PostgreSQL database...")
+        conn = psycopg2.connect(self.db_url, connection_factory=Connection)
+        logger.info("Successfully connected to PostgreSQL database.")
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed != 0:
+            return False
+
+        # Roll back anything a previous borrower left open
+        if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                return False
+
+        # Only ping connections that have been idle for a while, so hot checkouts stay free
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        self._discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _reserve(self, deadline):
+        """
+        Claim a slot in the pool. Returns an idle connection, or None if the caller should open a new one.
+        """
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+
+                if self._idle:
+                    self._in_use += 1
+                    return self._idle.pop()
+
+                if self._size < self.max_size:
+                    # Reserve the slot before connecting so other threads cannot overshoot max_size
+                    self._size += 1
+                    self._in_use += 1
+                    return None, None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"Timed out after {self.timeout}s waiting for a database connection")
+
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+    def _release_slot(self, conn=None):
+        with self._cond:
+            if conn is not None:
+                self._discard(conn)
+            self._size -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    def getconn(self):
+        start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            conn, last_used = self._reserve(deadline)
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+                break
+
+            # Health check runs outside the lock so a slow ping never blocks other checkouts
+            if self._is_healthy(conn, last_used):
+                break
+
+            logger.warning("Discarding unhealthy connection from pool")
+            self._release_slot(conn)
+
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+
+        return conn
+
+    def putconn(self, conn, discard=False):
+        if not discard and conn.closed == 0 and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+
+            if discard or self._closed or conn.closed != 0:
+                self._discard(conn)
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "checkouts": self._checkouts,
+                "checkout_avg_ms": (self._checkout_time_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                "checkout_max_ms": self._checkout_time_max * 1000,
+                "checkout_total_s": self._checkout_time_total,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._size = self._in_use
+            self._cond.notify_all()
+        logger.info("Closed PostgreSQL connection pool.")
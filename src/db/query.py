@@ -1,6 +1,15 @@
+# Booking statuses. Queries filter on them as literals, not parameters, so the partial indexes
+# on status = 'booked' still match once a prepared statement switches to a generic plan.
+STATUSES = ("booked", "cancelled")
+
+def status_literal(status):
+    if status not in STATUSES:
+        raise ValueError(f"Unknown booking status {status!r}")
+    return f"'{status}'"
+
 def create_tables_query():
     query = """
-    CREATE TABLE bookings (
+    CREATE TABLE IF NOT EXISTS bookings (
         booking_id SERIAL PRIMARY KEY,
         booking_datetime TIMESTAMP NOT NULL,
         level INT NOT NULL,
@@ -15,6 +24,77 @@ def create_tables_query():
     """
     return query
 
+def create_indexes_query():
+    """
+    Indexes for the hot queries. Partial indexes only cover live bookings, which are a small slice of the table.
+    """
+    query = """
+    CREATE INDEX IF NOT EXISTS bookings_booked_date_level_idx
+        ON bookings (timeslot_date, level, timeslot_start_time)
+        WHERE status = 'booked';
+
+    CREATE INDEX IF NOT EXISTS bookings_booked_user_idx
+        ON bookings (user_chat_id, timeslot_date)
+        WHERE status = 'booked';
+
+    CREATE INDEX IF NOT EXISTS bookings_timeslot_date_idx
+        ON bookings (timeslot_date);
+
+    CREATE INDEX IF NOT EXISTS bookings_booking_datetime_idx
+        ON bookings (booking_datetime);
+    """
+    return query
+
+def index_retention_by_timeslot_date_query():
+    """
+    Retention cuts on timeslot_date (bookings_timeslot_date_idx) in both modes, so the booking_datetime index
+    from migration 2 only slows down inserts
+    """
+    query = """
+    CREATE INDEX IF NOT EXISTS bookings_timeslot_date_idx
+        ON bookings (timeslot_date);
+
+    DROP INDEX IF EXISTS bookings_booking_datetime_idx;
+    """
+    return query
+
+def create_archive_table_query():
+    """
+    Same columns as bookings, without the sequence, plus when the row was archived
+    """
+    query = """
+    CREATE TABLE IF NOT EXISTS bookings_archive (
+        booking_id INT PRIMARY KEY,
+        booking_datetime TIMESTAMP NOT NULL,
+        level INT NOT NULL,
+        username VARCHAR(255),
+        first_name VARCHAR(255),
+        user_chat_id BIGINT NOT NULL,
+        timeslot_date DATE NOT NULL,
+        timeslot_start_time TIME NOT NULL,
+        timeslot_end_time TIME NOT NULL,
+        status VARCHAR(50),
+        archived_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+    """
+    return query
+
+def create_migrations_table_query():
+    query = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+    """
+    return query
+
+def get_applied_migrations_query():
+    return "SELECT version FROM schema_migrations;"
+
+def add_migration_query():
+    return "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);"
+
 def drop_table_query():
     return "DROP TABLE IF EXISTS bookings;"
 
@@ -43,30 +123,397 @@ def get_all_bookings_query():
     """
     return query
 
-def get_bookings_by_date_query():
-    query = """
+def get_bookings_between_query(status="booked"):
+    query = f"""
+    SELECT *
+    FROM bookings
+    WHERE
+        timeslot_date BETWEEN %s AND %s AND
+        status = {status_literal(status)}
+    ORDER BY timeslot_date, level, timeslot_start_time;
+    """
+    return query
+
+def get_bookings_by_date_query(status="booked"):
+    query = f"""
     SELECT * 
     FROM bookings
     WHERE 
         timeslot_date = %s AND
-        status = %s;
+        status = {status_literal(status)};
     """
     return query
 
-def get_bookings_by_id_query():
-    query = """
+def get_bookings_by_id_query(status="booked"):
+    """
+    The timeslot_date lower bound lets a partitioned table skip past months
+    """
+    query = f"""
     SELECT *
     FROM bookings
     WHERE 
         user_chat_id = %s AND
-        status = %s;
+        status = {status_literal(status)} AND
+        timeslot_date >= %s;
+    """
+    return query
+
+def cancel_booking_query(by_date=False):
+    """
+    With by_date, also matches timeslot_date = %s so a partitioned table only touches one partition.
+    Only booked bookings match, so cancelling twice returns no rows the second time.
+    """
+    query = f"""
+    UPDATE bookings
+    SET status = 'cancelled'
+    WHERE booking_id = %s{" AND timeslot_date = %s" if by_date else ""} AND status = 'booked'
+    RETURNING timeslot_date;
+    """
+    return query
+
+def lock_level_date_query():
+    """
+    Serialises bookers of the same (level, date) for the rest of the transaction
+    """
+    return "SELECT pg_advisory_xact_lock(%(level)s::int, %(timeslot_date)s::date - DATE '2000-01-01');"
+
+def book_if_free_query():
+    """
+    Inserts a booking only if it does not overlap an existing booking on the same level and date.
+    Run it after lock_level_date_query in the same transaction, as a separate statement, so it sees
+    anything committed while the lock was awaited.
+    The casts give each parameter a type when the statement is prepared.
+    Returns ('booked', booking_id, start, end) or ('clash', booking_id, start, end) of the earliest clash.
+    """
+    query = """
+    WITH clash AS (
+        SELECT booking_id, timeslot_start_time, timeslot_end_time
+        FROM bookings
+        WHERE
+            level = %(level)s AND
+            timeslot_date = %(timeslot_date)s AND
+            status = 'booked' AND
+            timeslot_start_time < %(timeslot_end_time)s AND
+            timeslot_end_time > %(timeslot_start_time)s
+        ORDER BY timeslot_start_time
+        LIMIT 1
+    ), inserted AS (
+        INSERT INTO bookings (
+            level,
+            booking_datetime,
+            username,
+            first_name,
+            user_chat_id,
+            timeslot_date,
+            timeslot_start_time,
+            timeslot_end_time,
+            status
+        )
+        SELECT %(level)s::int, %(booking_datetime)s::timestamp, %(username)s::varchar, %(first_name)s::varchar, %(user_chat_id)s::bigint,
+            %(timeslot_date)s::date, %(timeslot_start_time)s::time, %(timeslot_end_time)s::time, 'booked'
+        WHERE NOT EXISTS (SELECT 1 FROM clash)
+        RETURNING booking_id, timeslot_start_time, timeslot_end_time
+    )
+    SELECT 'booked', booking_id, timeslot_start_time, timeslot_end_time FROM inserted
+    UNION ALL
+    SELECT 'clash', booking_id, timeslot_start_time, timeslot_end_time FROM clash;
     """
     return query
 
-def cancel_booking_query():
+def cancel_bookings_query():
+    """
+    Cancel every booked booking whose id is in the %s array. Returns (booking_id, timeslot_date) for each one cancelled.
+    """
     query = """
     UPDATE bookings
     SET status = 'cancelled'
-    WHERE booking_id = %s
-    """ 
-    return query
\ No newline at end of file
+    WHERE booking_id = ANY(%s::int[]) AND status = 'booked'
+    RETURNING booking_id, timeslot_date;
+    """
+    return query
+
+def lock_level_dates_query():
+    """
+    lock_level_date_query for every date in %(timeslot_dates)s, taken in date order so two bulk bookers cannot deadlock
+    """
+    query = """
+    SELECT pg_advisory_xact_lock(%(level)s::int, timeslot_date - DATE '2000-01-01')
+    FROM (
+        SELECT DISTINCT timeslot_date
+        FROM unnest(%(timeslot_dates)s::date[]) AS timeslot_date
+        ORDER BY timeslot_date
+    ) AS dates;
+    """
+    return query
+
+def book_many_query():
+    """
+    book_if_free_query for the same level and times on every date in %(timeslot_dates)s, all or nothing:
+    one set-based clash check, then one INSERT for every date only if nothing clashed.
+    Run it after lock_level_dates_query in the same transaction.
+    Returns ('booked', booking_id, date, start, end) for each booking made, or ('clash', ...) for every clashing booking.
+    """
+    query = """
+    WITH slots AS (
+        SELECT DISTINCT unnest(%(timeslot_dates)s::date[]) AS timeslot_date
+    ), clash AS (
+        SELECT b.booking_id, b.timeslot_date, b.timeslot_start_time, b.timeslot_end_time
+        FROM slots
+        JOIN bookings AS b ON b.timeslot_date = slots.timeslot_date
+        WHERE
+            b.level = %(level)s::int AND
+            b.status = 'booked' AND
+            b.timeslot_start_time < %(timeslot_end_time)s::time AND
+            b.timeslot_end_time > %(timeslot_start_time)s::time
+    ), inserted AS (
+        INSERT INTO bookings (
+            level,
+            booking_datetime,
+            username,
+            first_name,
+            user_chat_id,
+            timeslot_date,
+            timeslot_start_time,
+            timeslot_end_time,
+            status
+        )
+        SELECT %(level)s::int, %(booking_datetime)s::timestamp, %(username)s::varchar, %(first_name)s::varchar, %(user_chat_id)s::bigint,
+            slots.timeslot_date, %(timeslot_start_time)s::time, %(timeslot_end_time)s::time, 'booked'
+        FROM slots
+        WHERE NOT EXISTS (SELECT 1 FROM clash)
+        ORDER BY slots.timeslot_date
+        RETURNING booking_id, timeslot_date, timeslot_start_time, timeslot_end_time
+    )
+    SELECT 'booked', booking_id, timeslot_date, timeslot_start_time, timeslot_end_time FROM inserted
+    UNION ALL
+    SELECT 'clash', booking_id, timeslot_date, timeslot_start_time, timeslot_end_time FROM clash
+    ORDER BY 3, 4;
+    """
+    return query
+
+def delete_old_bookings_batch_query(archive=False):
+    """
+    Delete up to %(batch_size)s bookings for slots before %(cutoff)s (a date), copying them to bookings_archive first if archive is set.
+    Old means the slot, not when it was booked: a weekly series booked long ago still has future occurrences.
+    SKIP LOCKED leaves rows another transaction holds to a later batch instead of waiting on them.
+    Returns one row with the number of rows deleted.
+    """
+    columns = """booking_id, booking_datetime, level, username, first_name, user_chat_id,
+            timeslot_date, timeslot_start_time, timeslot_end_time, status"""
+
+    archived = f"""
+    , archived AS (
+        INSERT INTO bookings_archive ({columns})
+        SELECT {columns} FROM deleted
+        ON CONFLICT (booking_id) DO NOTHING
+    )""" if archive else ""
+
+    query = f"""
+    WITH batch AS (
+        SELECT booking_id
+        FROM bookings
+        WHERE timeslot_date < %(cutoff)s
+        LIMIT %(batch_size)s
+        FOR UPDATE SKIP LOCKED
+    ), deleted AS (
+        DELETE FROM bookings
+        WHERE booking_id IN (SELECT booking_id FROM batch)
+        RETURNING {columns}
+    ){archived}
+    SELECT COUNT(*) FROM deleted;
+    """
+    return query
+
+# Conversation state. Plain SQL that SQLite also runs, once %s becomes ?.
+def create_conversations_table_query():
+    """
+    The pending step of each (chat_id, user_id), its JSON encoded arguments and when it expires (Unix time)
+    """
+    query = """
+    CREATE TABLE IF NOT EXISTS conversations (
+        chat_id BIGINT NOT NULL,
+        user_id BIGINT NOT NULL,
+        step VARCHAR(255) NOT NULL,
+        args TEXT NOT NULL,
+        expires_at DOUBLE PRECISION NOT NULL,
+        PRIMARY KEY (chat_id, user_id)
+    );
+    """
+    return query
+
+def save_conversation_query():
+    query = """
+    INSERT INTO conversations (chat_id, user_id, step, args, expires_at)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (chat_id, user_id) DO UPDATE
+    SET step = excluded.step, args = excluded.args, expires_at = excluded.expires_at;
+    """
+    return query
+
+def delete_conversation_query():
+    return "DELETE FROM conversations WHERE chat_id = %s AND user_id = %s;"
+
+def get_conversations_query():
+    return "SELECT chat_id, user_id, step, args, expires_at FROM conversations WHERE expires_at > %s ORDER BY expires_at;"
+
+def delete_expired_conversations_query():
+    return "DELETE FROM conversations WHERE expires_at <= %s;"
+
+# Availability boards, one message per chat and day
+def create_boards_table_query():
+    query = """
+    CREATE TABLE IF NOT EXISTS boards (
+        chat_id BIGINT NOT NULL,
+        board_date DATE NOT NULL,
+        message_id BIGINT NOT NULL,
+        PRIMARY KEY (chat_id, board_date)
+    );
+    """
+    return query
+
+def get_board_query():
+    return "SELECT message_id FROM boards WHERE chat_id = %s AND board_date = %s;"
+
+def get_previous_board_query():
+    return "SELECT message_id FROM boards WHERE chat_id = %s AND board_date < %s ORDER BY board_date DESC LIMIT 1;"
+
+def save_board_query():
+    """
+    Keeps only the latest board of the chat; older ones are never edited again
+    """
+    query = """
+    WITH old AS (
+        DELETE FROM boards WHERE chat_id = %(chat_id)s AND board_date < %(board_date)s
+    )
+    INSERT INTO boards (chat_id, board_date, message_id)
+    VALUES (%(chat_id)s, %(board_date)s, %(message_id)s)
+    ON CONFLICT (chat_id, board_date) DO UPDATE SET message_id = excluded.message_id;
+    """
+    return query
+
+# Change notifications. Every process LISTENs on BOOKING_CHANNEL; the trigger sends '<level> <YYYY-MM-DD> <epoch>'
+# for each (level, timeslot_date) a statement writes, epoch being when the statement started.
+BOOKING_CHANNEL = "booking_changes"
+
+def create_booking_notify_trigger_query():
+    """
+    Row trigger on bookings. On a partitioned table it is cloned onto every partition, including ones created later.
+    Identical notifications in one transaction are delivered once, so a bulk write sends one per (level, date).
+    """
+    query = f"""
+    CREATE OR REPLACE FUNCTION notify_booking_change() RETURNS trigger AS $$
+    DECLARE
+        sent TEXT := extract(epoch FROM statement_timestamp())::TEXT;
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM pg_notify('{BOOKING_CHANNEL}', OLD.level || ' ' || to_char(OLD.timeslot_date, 'YYYY-MM-DD') || ' ' || sent);
+        END IF;
+        IF TG_OP = 'INSERT' THEN
+            PERFORM pg_notify('{BOOKING_CHANNEL}', NEW.level || ' ' || to_char(NEW.timeslot_date, 'YYYY-MM-DD') || ' ' || sent);
+        ELSIF TG_OP = 'UPDATE' THEN
+            IF (NEW.level, NEW.timeslot_date) IS DISTINCT FROM (OLD.level, OLD.timeslot_date) THEN
+                PERFORM pg_notify('{BOOKING_CHANNEL}', NEW.level || ' ' || to_char(NEW.timeslot_date, 'YYYY-MM-DD') || ' ' || sent);
+            END IF;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS bookings_notify ON bookings;
+    CREATE TRIGGER bookings_notify
+        AFTER INSERT OR UPDATE OR DELETE ON bookings
+        FOR EACH ROW EXECUTE FUNCTION notify_booking_change();
+    """
+    return query
+
+def listen_query():
+    return f"LISTEN {BOOKING_CHANNEL};"
+
+# Read replicas
+def replica_lag_query():
+    """
+    Seconds the server's replay is behind the primary. 0 on a primary, or on a replica streaming with nothing left
+    to replay; otherwise the age of the last transaction it replayed, NULL if it has replayed none yet.
+    """
+    query = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN EXISTS (SELECT 1 FROM pg_stat_wal_receiver) AND pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())::FLOAT8
+    END;
+    """
+    return query
+
+# Partitioning. Partition names come from partition_name(), never from user input.
+def create_partitioned_table_query():
+    """
+    bookings partitioned by timeslot_date month. The primary key has to include the partition key;
+    booking_id still comes from one sequence, so it stays unique on its own.
+    """
+    query = """
+    CREATE SEQUENCE IF NOT EXISTS bookings_booking_id_seq;
+
+    CREATE TABLE bookings (
+        booking_id INT NOT NULL DEFAULT nextval('bookings_booking_id_seq'),
+        booking_datetime TIMESTAMP NOT NULL,
+        level INT NOT NULL,
+        username VARCHAR(255),
+        first_name VARCHAR(255),
+        user_chat_id BIGINT NOT NULL,
+        timeslot_date DATE NOT NULL,
+        timeslot_start_time TIME NOT NULL,
+        timeslot_end_time TIME NOT NULL,
+        status VARCHAR(50),
+        PRIMARY KEY (booking_id, timeslot_date)
+    ) PARTITION BY RANGE (timeslot_date);
+
+    ALTER SEQUENCE bookings_booking_id_seq OWNED BY bookings.booking_id;
+    """
+    return query
+
+def rename_unpartitioned_bookings_query():
+    """
+    Move the plain table and its indexes out of the way so the partitioned table can take their names.
+    The sequence is detached first so dropping the old table later does not drop it.
+    """
+    query = """
+    ALTER SEQUENCE IF EXISTS bookings_booking_id_seq OWNED BY NONE;
+    ALTER TABLE bookings RENAME TO bookings_unpartitioned;
+    ALTER INDEX IF EXISTS bookings_pkey RENAME TO bookings_unpartitioned_pkey;
+    DROP INDEX IF EXISTS bookings_booked_date_level_idx;
+    DROP INDEX IF EXISTS bookings_booked_user_idx;
+    DROP INDEX IF EXISTS bookings_timeslot_date_idx;
+    DROP INDEX IF EXISTS bookings_booking_datetime_idx;
+    """
+    return query
+
+def copy_unpartitioned_bookings_query():
+    query = """
+    INSERT INTO bookings SELECT * FROM bookings_unpartitioned;
+    DROP TABLE bookings_unpartitioned;
+    """
+    return query
+
+def get_booking_date_range_query():
+    return "SELECT MIN(timeslot_date), MAX(timeslot_date) FROM bookings;"
+
+def is_partitioned_query():
+    return "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('bookings');"
+
+def get_partitions_query():
+    query = """
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = to_regclass('bookings');
+    """
+    return query
+
+def create_partition_query(name, start, end):
+    return f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF bookings FOR VALUES FROM ('{start}') TO ('{end}');"
+
+def detach_partition_query(name):
+    return f"ALTER TABLE bookings DETACH PARTITION {name};"
+
+def drop_partition_query(name):
+    return f"DROP TABLE {name};"
@@ -0,0 +1,115 @@
+"""
+Reads on a streaming replica of the primary.
+
+DatabaseHandler runs the statements registered with replica=True on the replica's pool, and everything else
+on the primary. A ReplicaMonitor measures how far the replica's replay is behind every interval; while it is
+unreachable or further behind than max_lag, or a read on it just failed, reads go to the primary instead.
+
+Handlers run acting_as(user_id). A write made acting as a user keeps that user's reads on the primary for a while
+(StickyUsers), so they see their own booking or cancellation straight away however far behind the replica is.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from metrics import REPLICA_LAG, REPLICA_UP
+
+logger = logging.getLogger("db (replica)")
+
+# The user the current handler acts for, None outside handlers. Context variables follow asyncio.to_thread.
+current_user = ContextVar("db_user", default=None)
+
+@contextmanager
+def acting_as(user_id):
+    token = current_user.set(user_id)
+    try:
+        yield
+    finally:
+        current_user.reset(token)
+
+class StickyUsers:
+    """
+    Users whose reads stay on the primary until a deadline
+    """
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._until = {} # user_id -> time.monotonic() deadline
+        self._lock = threading.Lock()
+
+    def add(self, user_id, seconds):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._until) >= self.max_entries:
+                self._until = {user: until for user, until in self._until.items() if until > now}
+            self._until[user_id] = max(self._until.get(user_id, 0.0), now + seconds)
+
+    def __contains__(self, user_id):
+        until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+class ReplicaMonitor:
+    """
+    Daemon thread calling check() every interval, which returns how many seconds the replica is behind
+    (None if it cannot tell). The replica is healthy while the last check succeeded within max_lag
+    and no read has failed on it since.
+    """
+    def __init__(self, check, interval=5.0, max_lag=10.0):
+        self.check = check
+        self.interval = interval
+        self.max_lag = max_lag
+
+        self.lag = None # Seconds behind at the last check, None before the first and after a failed one
+        self.healthy = False
+        self._stop = threading.Event()
+        self._thread = None
+        REPLICA_UP.set(0)
+
+    def _set_healthy(self, healthy, reason):
+        if healthy != self.healthy:
+            if healthy:
+                logger.info("Reading from the replica again")
+            else:
+                logger.warning("Reading from the primary: %s", reason)
+        self.healthy = healthy
+        REPLICA_UP.set(int(healthy))
+
+    def measure(self):
+        try:
+            lag = self.check()
+        except Exception as e:
+            self.lag = None
+            self._set_healthy(False, f"replica check failed: {e}")
+            return
+
+        self.lag = lag
+        if lag is None:
+            self._set_healthy(False, "the replica has not replayed anything yet")
+            return
+
+        REPLICA_LAG.set(lag)
+        self._set_healthy(lag <= self.max_lag, f"the replica is {lag:.1f} s behind")
+
+    def mark_down(self, reason):
+        """
+        Take the replica out of use until the next check
+        """
+        self._set_healthy(False, reason)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.measure()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="replica-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
@@ -0,0 +1,55 @@
+import logging
+import threading
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from .partitions import maintain_partitions
+from .storage import retention_cutoff
+
+logger = logging.getLogger("db (retention)")
+
+class RetentionScheduler:
+    """
+    Daemon thread that runs retention on storage every interval seconds, starting straight away.
+    Either way bookings for slots before retention_cutoff() go: a partitioned Postgres table drops
+    (or with archive, detaches) whole expired partitions instead of deleting rows.
+    """
+    def __init__(self, storage, interval=3600.0, batch_size=1000, archive=False, pause=0.1, partitioned=False, months_ahead=3):
+        self.storage = storage
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archive = archive
+        self.pause = pause
+        self.partitioned = partitioned
+        self.months_ahead = months_ahead
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+
+        self.runs = 0
+        self.deleted = 0
+
+    def start(self):
+        logger.info("Clearing old bookings every %.0f s in batches of %s%s", self.interval, self.batch_size, ' with archiving' if self.archive else '')
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                today = datetime.now(ZoneInfo("Asia/Singapore")).date()
+                cutoff = retention_cutoff(today)
+                if self.partitioned:
+                    maintain_partitions(self.storage, today, cutoff, months_ahead=self.months_ahead, detach=self.archive)
+                else:
+                    deleted = self.storage.clear_old_bookings(
+                        batch_size=self.batch_size, archive=self.archive, pause=self.pause, stop=self._stop, cutoff=cutoff
+                    )
+                    self.deleted += deleted or 0
+                self.runs += 1
+            except Exception as e:
+                logger.error("Error in retention run: %s", e)
+
+            self._stop.wait(self.interval)
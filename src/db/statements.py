@@ -0,0 +1,79 @@
+"""
+Registry of the statements the bot runs on every update, built from the db.query builders.
+Each one is prepared once per connection and then executed by name, so Postgres parses and plans it once
+instead of on every call. The metadata says how to run it, so nothing has to be guessed from the SQL.
+"""
+import re
+from typing import NamedTuple
+from .query import (
+    STATUSES, add_booking_query, get_all_bookings_query, get_bookings_between_query, get_bookings_by_date_query, get_bookings_by_id_query,
+    cancel_booking_query, cancel_bookings_query, lock_level_date_query, book_if_free_query, lock_level_dates_query, book_many_query,
+    delete_old_bookings_batch_query, save_conversation_query, delete_conversation_query, get_conversations_query,
+    delete_expired_conversations_query, get_board_query, get_previous_board_query, save_board_query, replica_lag_query
+)
+
+# kind
+READ = "read"
+WRITE = "write" # Committed after it runs
+
+# fetch
+NONE = "none"
+ONE = "one"
+ALL = "all"
+
+PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s")
+
+class Statement(NamedTuple):
+    name: str
+    sql: str # psycopg2 placeholders, for running it unprepared
+    kind: str
+    fetch: str
+    prepare: str # PREPARE name AS ... with $n placeholders
+    execute: str # EXECUTE name (...) taking the same arguments as sql
+    replica: bool = False # A read a replica a little behind the primary may serve
+
+STATEMENTS = {}
+
+def register(name, sql, kind, fetch, replica=False):
+    """
+    Add sql to the registry under name. Named parameters keep one $n however often they appear.
+    """
+    placeholders = []
+
+    def number(match):
+        if match.group(1) is None or match.group(0) not in placeholders:
+            placeholders.append(match.group(0))
+            return f"${len(placeholders)}"
+        return f"${placeholders.index(match.group(0)) + 1}"
+
+    body = PLACEHOLDER.sub(number, sql).strip().rstrip(";").replace("%%", "%")
+    execute = f"EXECUTE {name} ({', '.join(placeholders)})" if placeholders else f"EXECUTE {name}"
+
+    STATEMENTS[name] = Statement(name, sql, kind, fetch, f"PREPARE {name} AS {body}", execute, replica)
+    return STATEMENTS[name]
+
+register("add_booking", add_booking_query(), WRITE, NONE)
+register("get_all_bookings", get_all_bookings_query(), READ, ALL, replica=True)
+for status in STATUSES:
+    register(f"get_bookings_between_{status}", get_bookings_between_query(status), READ, ALL, replica=True)
+    # Loads availability_cache, whose entries every user is served until the next write invalidates them,
+    # so a load must see the write that invalidated it
+    register(f"get_bookings_by_date_{status}", get_bookings_by_date_query(status), READ, ALL)
+    register(f"get_bookings_by_id_{status}", get_bookings_by_id_query(status), READ, ALL, replica=True)
+register("cancel_booking", cancel_booking_query(), WRITE, ALL)
+register("cancel_booking_by_date", cancel_booking_query(by_date=True), WRITE, ALL)
+register("cancel_bookings", cancel_bookings_query(), WRITE, ALL)
+register("lock_level_date", lock_level_date_query(), READ, NONE)
+register("book_if_free", book_if_free_query(), WRITE, ONE)
+register("lock_level_dates", lock_level_dates_query(), READ, NONE)
+register("book_many", book_many_query(), WRITE, ALL)
+register("delete_old_bookings_batch", delete_old_bookings_batch_query(), WRITE, ONE)
+register("delete_old_bookings_batch_archive", delete_old_bookings_batch_query(archive=True), WRITE, ONE)
+register("save_conversation", save_conversation_query(), WRITE, NONE)
+register("delete_conversation", delete_conversation_query(), WRITE, NONE)
+register("get_conversations", get_conversations_query(), READ, ALL)
+register("delete_expired_conversations", delete_expired_conversations_query(), WRITE, NONE)
+register("get_board", get_board_query(), READ, ONE)
+register("get_previous_board", get_previous_board_query(), READ, ONE)
+register("save_board", save_board_query(), WRITE, NONE)
+register("replica_lag", replica_lag_query(), READ, ONE)
@@ -0,0 +1,138 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+from constants import KEEP_BOOKINGS_DAYS
+
+logger = logging.getLogger("db (storage)")
+
+def retention_cutoff(today=None):
+    """
+    Bookings for slots before this date are old enough to clear: KEEP_BOOKINGS_DAYS before today (SGT).
+    When a booking was made does not count, since a weekly series is booked once for months of slots.
+    """
+    if today is None:
+        today = datetime.now(ZoneInfo("Asia/Singapore")).date()
+    return today - timedelta(days=KEEP_BOOKINGS_DAYS)
+
+class StorageError(Exception):
+    """
+    A storage operation failed, or the store could not be reached
+    """
+
+class Storage(ABC):
+    """
+    Everything db.db needs from a bookings store; a backend missing any abstract method cannot be instantiated.
+    Rows are tuples in COLUMNS order. Failures raise StorageError.
+    """
+    @abstractmethod
+    def add_booking(self, level, booking_datetime, username, first_name, user_chat_id, timeslot_date, timeslot_start_time, timeslot_end_time, status):
+        """
+        Returns True
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def book_if_free(self, **params):
+        """
+        Insert the booking unless it overlaps a booked slot on the same level and date.
+        Returns ('booked', booking_id, start, end) or ('clash', booking_id, start, end) of the earliest clash.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def book_many(self, timeslot_dates, **params):
+        """
+        book_if_free for every date in timeslot_dates, all or nothing.
+        Returns ('booked', booking_id, date, start, end) rows for the bookings made, or ('clash', ...) rows
+        for every booked slot that clashed, ordered by date and start time.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def all_bookings(self, from_date):
+        """
+        Rows of every status with timeslot_date on or after from_date
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def bookings_between(self, start_date, end_date, status):
+        """
+        Rows from start_date to end_date inclusive ordered by timeslot_date, level and timeslot_start_time
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def bookings_by_date(self, timeslot_date, status):
+        raise NotImplementedError
+
+    @abstractmethod
+    def bookings_by_id(self, user_chat_id, status, from_date):
+        raise NotImplementedError
+
+    @abstractmethod
+    def cancel_booking(self, booking_id, timeslot_date=None):
+        """
+        Returns a (timeslot_date,) row for each booking cancelled
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def cancel_bookings(self, booking_ids):
+        """
+        Cancel the booked bookings among booking_ids. Returns a (booking_id, timeslot_date) row for each one cancelled.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _delete_old_bookings_batch(self, cutoff, batch_size, archive):
+        """
+        Delete up to batch_size bookings with timeslot_date before cutoff. Returns the number deleted.
+        """
+        raise NotImplementedError
+
+    def clear_old_bookings(self, batch_size=1000, archive=False, pause=0.0, stop=None, cutoff=None):
+        """
+        Delete bookings for slots before cutoff (default retention_cutoff()) in batches of batch_size, each in its own
+        short transaction, so inserts never wait behind one long DELETE. Archives the rows first if archive is set.
+        Sleeps pause seconds between batches and gives up early once the stop event is set.
+        Returns the number of bookings deleted, or None if the first batch failed.
+        """
+        if cutoff is None:
+            cutoff = retention_cutoff()
+
+        logger.info("Deleting bookings for slots before %s in batches of %s.", cutoff, batch_size)
+
+        total = 0
+        batches = 0
+        started = time.perf_counter()
+        while stop is None or not stop.is_set():
+            batch_started = time.perf_counter()
+            try:
+                rows = self._delete_old_bookings_batch(cutoff, batch_size, archive)
+            except StorageError as e:
+                logger.error("Error clearing old bookings: %s", e)
+                if batches == 0:
+                    return None
+                break
+
+            batches += 1
+            total += rows
+            logger.info("Retention batch %s: %sdeleted %s bookings in %.1f ms", batches, 'archived and ' if archive else '', rows, (time.perf_counter() - batch_started) * 1000)
+
+            if rows < batch_size:
+                break
+
+            if pause:
+                if stop is not None:
+                    stop.wait(pause)
+                else:
+                    time.sleep(pause)
+
+        logger.info("Deleted %s bookings for slots before %s in %s batches (%.2f s).", total, cutoff, batches, time.perf_counter() - started)
+        return total
+
+    def close(self):
+        pass
@@ -1,12 +1,10 @@
 import logging
 from telebot import types
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 import re
 import calendar
 
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger("helpers")
 
 def validate_time_format(time_str, end=False):
@@ -30,6 +28,19 @@ def validate_time_format(time_str, end=False):
     except ValueError:
         return False
 
+def parse_time(time_str):
+    """
+    Converts a time validated by validate_time_format into a datetime.time
+    """
+    return datetime.strptime(time_str, '%H%M' if len(time_str) == 4 else '%H:%M').time()
+
+def weekly_dates(first_date, weeks):
+    """
+    first_date (DD/MM/YYYY) and the same weekday in each of the following weeks, weeks dates in all
+    """
+    first = datetime.strptime(first_date, '%d/%m/%Y').date()
+    return [first + timedelta(weeks=week) for week in range(weeks)]
+
 def create_markup(name, *buttons):
     try:
         markup = types.InlineKeyboardMarkup()
@@ -37,13 +48,26 @@ def create_markup(name, *buttons):
         for button in buttons:
             markup = markup.add(button)
 
-        logger.info(f"Successfully created {name}")
+        logger.debug("Successfully created %s", name)
         return markup
     
     except Exception as e:
-        logger.error(f"Error while creating markup {name}: {e}")
+        logger.error("Error while creating markup %s: %s", name, e)
         return e
 
+class PrebuiltMarkup(types.InlineKeyboardMarkup):
+    """
+    A finished markup, serialized once. TeleBot calls to_json() on every send, which returns the stored string.
+    Do not add buttons to it.
+    """
+    def __init__(self, markup):
+        super().__init__(row_width=markup.row_width)
+        self.keyboard = markup.keyboard
+        self._json = markup.to_json()
+
+    def to_json(self):
+        return self._json
+
 def create_buttons(names: list[str], callback_data: list[str], purpose = 'unknown'):
     """
     Returns a list of buttons based on parameters
@@ -51,7 +75,7 @@ def create_buttons(names: list[str], callback_data: list[str], purpose = 'unknow
     if len(names) != len(callback_data):
         logger.info("names and callback_data arguments have unequal lengths")
 
-    logger.info(f'Creating buttons for {purpose}')
+    logger.debug('Creating buttons for %s', purpose)
 
     buttons = []
     for i in range(len(names)):
@@ -60,16 +84,20 @@ def create_buttons(names: list[str], callback_data: list[str], purpose = 'unknow
 
     return buttons
 
-def create_date_options(days = 7, callback_prefix = "date_selected"):
+def create_date_options(payload, *values, days = 7, today = None):
     """
-    Returns a list of buttons for markup options
+    Returns a list of buttons for markup options, with callback_data payload.new(*values, <dd/mm/YYYY>),
+    for days dates from today (default today in SGT)
     """
+    if today is None:
+        today = datetime.now(ZoneInfo("Asia/Singapore")).date()
+
     buttons = []
 
     for i in range(days):
-        day = datetime.today() + timedelta(days=i)
+        day = today + timedelta(days=i)
         day_str = day.strftime("%d/%m/%Y")
-        option = types.InlineKeyboardButton(day_str + " (Today)" if i == 0 else day_str + f" ({calendar.day_name[day.weekday()][:3]})", callback_data=f"{callback_prefix}+{day_str}")
+        option = types.InlineKeyboardButton(day_str + " (Today)" if i == 0 else day_str + f" ({calendar.day_name[day.weekday()][:3]})", callback_data=payload.new(*values, day_str))
         buttons.append(option)
     
     return buttons
@@ -0,0 +1,92 @@
+from bisect import bisect_right
+from datetime import time
+
+def to_minutes(t):
+    return t.hour * 60 + t.minute
+
+def from_minutes(minutes):
+    return time(minutes // 60, minutes % 60)
+
+class IntervalIndex:
+    """
+    Sort-and-sweep over one (level, date)'s booked intervals: sorted and merged once, then swept for the free gaps.
+    Built per request from the cached bookings of the date; it only answers read-side questions, clashes are still
+    decided by book_if_free's SQL.
+    Times are datetime.time; intervals are half-open [start, end), so back to back bookings leave no gap.
+    """
+    def __init__(self, intervals=()):
+        self.starts = []
+        self.ends = []
+
+        for start, end in sorted((to_minutes(start), to_minutes(end)) for start, end in intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    @classmethod
+    def from_bookings(cls, bookings, level):
+        return cls(
+            (booking.timeslot_start_time, booking.timeslot_end_time)
+            for booking in bookings
+            if booking.level == level and booking.status == "booked"
+        )
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _gaps(self, opening, closing):
+        gaps = []
+        cursor = opening
+        for start, end in zip(self.starts, self.ends):
+            if start > cursor:
+                gaps.append((cursor, min(start, closing)))
+            cursor = max(cursor, end)
+            if cursor >= closing:
+                break
+
+        if cursor < closing:
+            gaps.append((cursor, closing))
+        return [(start, end) for start, end in gaps if end > start]
+
+    def free_slots(self, opening, closing):
+        """
+        Free gaps between opening and closing, as (start, end) times
+        """
+        return [(from_minutes(start), from_minutes(end)) for start, end in self._gaps(to_minutes(opening), to_minutes(closing))]
+
+    def nearest_free(self, start, end, opening, closing):
+        """
+        The free window of the same length as [start, end) whose start is closest to start, or None if none fits
+        """
+        start, end = to_minutes(start), to_minutes(end)
+        length = end - start
+        gaps = self._gaps(to_minutes(opening), to_minutes(closing))
+
+        def candidate(gap):
+            gap_start, gap_end = gap
+            if gap_end - gap_start < length:
+                return None
+            return min(max(start, gap_start), gap_end - length)
+
+        # Walk outwards from the gap the request starts in, stopping at the first fit on each side
+        best = None
+        middle = bisect_right([gap_start for gap_start, _ in gaps], start)
+        for indices in (range(middle - 1, -1, -1), range(middle, len(gaps))):
+            for i in indices:
+                window_start = candidate(gaps[i])
+                if window_start is not None:
+                    if best is None or abs(window_start - start) < abs(best - start):
+                        best = window_start
+                    break
+
+        if best is None:
+            return None
+        return from_minutes(best), from_minutes(best + length)
+
+def index_bookings(bookings, levels=range(9, 12)):
+    """
+    One IntervalIndex per level from a single day's bookings
+    """
+    return {level: IntervalIndex.from_bookings(bookings, level) for level in levels}
@@ -0,0 +1,126 @@
+"""
+Central logging setup. Call setup_logging() once, before anything logs; config.py does this on import.
+
+Records are put on a queue by the thread that logs them and formatted and written by a background listener,
+so handlers never wait on stderr. Hot loggers can be sampled, and messages should use %-style arguments
+so nothing is formatted for records that are filtered out.
+"""
+import atexit
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else came from extra= and is printed as key=value
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+_handler = None
+
+def _quote(value):
+    value = str(value)
+    if value == "" or any(char in value for char in " =\"\n"):
+        return "\"" + value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") + "\""
+    return value
+
+class KeyValueFormatter(logging.Formatter):
+    """
+    ts=... level=INFO logger=db msg="..." followed by any extra= fields, one record per line
+    """
+    def format(self, record):
+        fields = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields.update((key, value) for key, value in vars(record).items() if key not in STANDARD_ATTRIBUTES)
+        if record.exc_info:
+            fields["exc"] = self.formatException(record.exc_info)
+
+        return " ".join(f"{key}={_quote(value)}" for key, value in fields.items())
+
+class TextFormatter(logging.Formatter):
+    """
+    The format the bot has always used, with extra= fields appended as key=value
+    """
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record):
+        line = super().format(record)
+        extra = " ".join(f"{key}={_quote(value)}" for key, value in vars(record).items() if key not in STANDARD_ATTRIBUTES)
+        return f"{line} {extra}" if extra else line
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the INFO and DEBUG records from the given loggers. Warnings and errors always pass.
+    """
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = self.rates.get(record.name)
+        return rate is None or random.random() < rate
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread instead of doing it in the caller
+    """
+    def prepare(self, record):
+        return record
+
+def parse_sample_rates(value):
+    """
+    'db=0.1,callback (get)=0.5' -> {'db': 0.1, 'callback (get)': 0.5}
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        name, _, rate = item.rpartition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+def setup_logging(level="INFO", structured=False, sample_rates=None, stream=None):
+    """
+    Route all logging through a queue to a background writer. Calling it again replaces the previous setup.
+    """
+    global _listener, _handler
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(KeyValueFormatter() if structured else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    _handler = LazyQueueHandler(log_queue)
+    if sample_rates:
+        _handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logging():
+    """
+    Flush everything still queued and detach the queue handler
+    """
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+
+atexit.register(shutdown_logging)
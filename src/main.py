@@ -1,23 +1,79 @@
+import asyncio
 import logging
 import telebot
-from config import BOT_TOKEN
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from config import BOT_TOKEN, BOT_ENGINE, DB_LISTEN, RETENTION_INTERVAL, RETENTION_BATCH_SIZE, RETENTION_ARCHIVE, PARTITION_BOOKINGS, PARTITION_MONTHS_AHEAD, METRICS_HOST, METRICS_PORT, BOT_MODE, WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_OFFLINE, WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE
 from commands import command_handlers
+from conversations import conversation_store
 from callbacks.callbacks import callback_handlers
+from db.db import storage, db_handler, booking_listener
+from db.migrations import run_migrations
+from db.partitions import partition_bookings
+from db.retention import RetentionScheduler
+from metrics import instrument_telegram, start_metrics_server
+from outbound import create_send_scheduler
+from webhook import run_webhook
 
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger("main")
 logger.info('Starting application...')
 
 def main():
-    bot = telebot.TeleBot(BOT_TOKEN)
+    instrument_telegram()
+    if METRICS_PORT:
+        start_metrics_server(METRICS_HOST, METRICS_PORT)
 
+    # Schema and partitions only apply to the Postgres backend
+    partitioned = PARTITION_BOOKINGS and db_handler is not None
+    if db_handler is not None:
+        run_migrations(db_handler)
+
+        if partitioned:
+            partition_bookings(db_handler, datetime.now(ZoneInfo("Asia/Singapore")).date(), months_ahead=PARTITION_MONTHS_AHEAD)
+
+        # After migrations, which add the trigger it listens to
+        if DB_LISTEN:
+            booking_listener.start()
+
+        if db_handler.replica is not None:
+            db_handler.replica.start()
+
+    # Booking flows in progress when the bot last stopped, if conversations are persisted
+    conversation_store.restore()
+
+    if RETENTION_INTERVAL > 0:
+        RetentionScheduler(
+            storage, interval=RETENTION_INTERVAL, batch_size=RETENTION_BATCH_SIZE, archive=RETENTION_ARCHIVE,
+            partitioned=partitioned, months_ahead=PARTITION_MONTHS_AHEAD
+        ).start()
+
+    if BOT_ENGINE == 'async':
+        from aio.bot import run_polling # aiohttp is only needed by the async engine
+
+        asyncio.run(run_polling(BOT_TOKEN))
+        return
+
+    # Webhook workers run handlers themselves to keep each chat in order, so telebot's own thread pool is not needed
+    bot = telebot.TeleBot(BOT_TOKEN, threaded=BOT_MODE != 'webhook')
+
+    # Handlers queue their sends instead of waiting on Telegram
+    scheduler = create_send_scheduler()
+    if scheduler is not None:
+        scheduler.install(bot)
+
+    # Commands before pending steps, so /start abandons a flow instead of being read as its answer
     command_handlers(bot)
     
     callback_handlers(bot)
 
-    bot.polling()
+    if BOT_MODE == 'webhook':
+        run_webhook(
+            bot, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH,
+            secret=WEBHOOK_SECRET, url=WEBHOOK_URL, workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE_SIZE, offline=WEBHOOK_OFFLINE
+        )
+    else:
+        bot.remove_webhook()
+        bot.polling()
 
 if __name__ == '__main__':
     main()
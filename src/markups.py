@@ -0,0 +1,97 @@
+"""
+Inline keyboards listing the coming week's dates, built once per Singapore day instead of on every tap.
+
+Markups are keyed by (purpose, level, SGT date). All of them are built for the current day in one go,
+and again on the first lookup after Singapore midnight, so a long-running process never offers yesterday's dates.
+Lookups in between are a clock read and a dict lookup, and return a PrebuiltMarkup whose JSON is already serialized.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, time as day_time, timedelta
+from zoneinfo import ZoneInfo
+from telebot import types
+from callbacks import payloads
+from constants import LEVELS, get_all_button, get_back_button, free_slots_back_button, book_back_button
+from helpers import create_markup, create_date_options, PrebuiltMarkup
+
+logger = logging.getLogger("markups")
+
+SGT = ZoneInfo("Asia/Singapore")
+
+def create_get_markup(today, level=None):
+    return create_markup('GET MARKUP', get_all_button, *create_date_options(payloads.GET_AVAILABILITY_DATE_SELECTED, today=today), get_back_button)
+
+def create_free_slots_markup(today, level=None):
+    return create_markup('FREE SLOTS MARKUP', *create_date_options(payloads.FREE_SLOTS_DATE_SELECTED, today=today), free_slots_back_button)
+
+def create_book_date_markup(today, level):
+    """
+    Dates to book on level, then the weekly booking option and back
+    """
+    weekly_button = types.InlineKeyboardButton('\U0001F501 Book Weekly \U0001F501', callback_data=payloads.BOOK_WEEKLY.new(level))
+    return create_markup("BOOK LEVEL 2", *create_date_options(payloads.BOOK_DATE_SELECTED, level, today=today), weekly_button, book_back_button)
+
+def create_book_weekly_markup(today, level):
+    """
+    First dates a weekly booking on level can start on
+    """
+    return create_markup("BOOK WEEKLY", *create_date_options(payloads.BOOK_WEEKLY_DATE_SELECTED, level, today=today), book_back_button)
+
+# purpose -> (build(today, level), levels it is built for)
+PURPOSES = {
+    'get': (create_get_markup, (None,)),
+    'free_slots': (create_free_slots_markup, (None,)),
+    'book': (create_book_date_markup, LEVELS),
+    'book_weekly': (create_book_weekly_markup, LEVELS),
+}
+
+class MarkupCache:
+    """
+    Thread-safe. A rollover builds the new day's markups aside and swaps them in, so lookups never wait on it
+    and never see a mix of two days.
+    """
+    def __init__(self, purposes):
+        self.purposes = purposes
+        self._day = (None, {}) # (SGT date, {(purpose, level, date): PrebuiltMarkup})
+        self._rolls_at = 0.0 # time.time() of the next Singapore midnight
+        self._lock = threading.Lock()
+
+        self.rollovers = 0
+        self.misses = 0
+
+    def _roll(self, now):
+        with self._lock:
+            if now < self._rolls_at: # Another thread rolled over first
+                return
+
+            today = datetime.fromtimestamp(now, SGT).date()
+            markups = {
+                (purpose, level, today): PrebuiltMarkup(build(today, level))
+                for purpose, (build, levels) in self.purposes.items()
+                for level in levels
+            }
+            self._day = (today, markups)
+            self._rolls_at = datetime.combine(today + timedelta(days=1), day_time(), SGT).timestamp()
+            self.rollovers += 1
+
+        logger.info("Built %s markups for %s", len(markups), today)
+
+    def get(self, purpose, level=None):
+        """
+        The markup for purpose (and level) today in SGT
+        """
+        now = time.time()
+        if now >= self._rolls_at:
+            self._roll(now)
+
+        today, markups = self._day
+        markup = markups.get((purpose, level, today))
+        if markup is None: # A level no button offers, so not worth keeping
+            self.misses += 1
+            build, _ = self.purposes[purpose]
+            return build(today, level)
+        return markup
+
+markup_cache = MarkupCache(PURPOSES)
+markup_cache.get('get') # Build today's markups on start rather than on the first tap
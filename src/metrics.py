@@ -0,0 +1,277 @@
+"""
+In-process metrics exposed in the Prometheus text format.
+Recording is a lock, a bisect and two additions, cheap enough to leave on in production.
+"""
+import functools
+import inspect
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("metrics")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in values]
+
+class Gauge(Metric):
+    """
+    Set directly, or give it a function that is called on every scrape. The function returns a number,
+    or a dict of label tuple -> number for labelled gauges.
+    """
+    type = "gauge"
+
+    def __init__(self, name, help, labelnames=(), function=None):
+        super().__init__(name, help, labelnames)
+        self._values = {}
+        self.function = function
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def set_function(self, function):
+        self.function = function
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+
+        if self.function is not None:
+            try:
+                result = self.function()
+                values.update(result if isinstance(result, dict) else {(): result})
+            except Exception as e:
+                logger.error("Error collecting %s: %s", self.name, e)
+
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in values.items()]
+
+class CounterFunction(Gauge):
+    """
+    Counter read from a function on every scrape, for components that already keep their own counts
+    """
+    type = "counter"
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {} # labels -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self):
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+
+        lines = self.header()
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), values[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, f'le="{bound}"')} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {values[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+HANDLER_LATENCY = REGISTRY.register(Histogram("bot_handler_seconds", "Time spent in each update handler", ["handler"]))
+HANDLER_ERRORS = REGISTRY.register(Counter("bot_handler_errors_total", "Update handlers that raised", ["handler"]))
+QUERY_LATENCY = REGISTRY.register(Histogram("db_query_seconds", "Database query time, by query name", ["query"]))
+QUERY_ERRORS = REGISTRY.register(Counter("db_query_errors_total", "Database queries that failed, by query name", ["query"]))
+TELEGRAM_LATENCY = REGISTRY.register(Histogram("telegram_api_seconds", "Telegram Bot API call time, by method", ["method"]))
+TELEGRAM_ERRORS = REGISTRY.register(Counter("telegram_api_errors_total", "Telegram Bot API calls that failed, by method", ["method"]))
+QUEUE_DEPTH = REGISTRY.register(Gauge("bot_queue_depth", "Items waiting in each internal queue", ["queue"]))
+UPDATES_DROPPED = REGISTRY.register(Counter("bot_updates_dropped_total", "Updates refused because their queue was full", ["queue"]))
+DB_POOL = REGISTRY.register(Gauge("db_pool_connections", "Database pool connections, by state", ["state"]))
+CACHE_EVENTS = REGISTRY.register(CounterFunction("cache_events_total", "Cache lookups, evictions and invalidations, by cache and event", ["cache", "event"]))
+BOOKING_NOTIFICATIONS = REGISTRY.register(Counter("db_booking_notifications_total", "Booking changes heard from the database ('received') and listener reconnects", ["event"]))
+NOTIFY_LAG = REGISTRY.register(Histogram("db_notify_lag_seconds", "Time from a booking write to this process hearing of it"))
+REPLICA_LAG = REGISTRY.register(Gauge("db_replica_lag_seconds", "How far the read replica's replay was behind the primary at the last check"))
+REPLICA_UP = REGISTRY.register(Gauge("db_replica_up", "1 while reads may go to the read replica, 0 while they fall back to the primary"))
+READ_ROUTES = REGISTRY.register(Counter("db_read_routes_total", "Reads with a replica configured, by where they ran: 'replica', or the primary because the statement needs it ('primary'), the user just wrote ('sticky'), the replica is unhealthy ('unhealthy') or the replica read failed ('fallback')", ["route"]))
+OUTBOUND_QUEUE = REGISTRY.register(Gauge("bot_outbound_queue_depth", "Bot API calls waiting to be sent, by priority", ["priority"]))
+OUTBOUND_WAIT = REGISTRY.register(Histogram("bot_outbound_wait_seconds", "Time Bot API calls spent queued, by priority", ["priority"]))
+OUTBOUND_RETRIES = REGISTRY.register(Counter("bot_outbound_retries_total", "Bot API calls retried after a 429, by method", ["method"]))
+OUTBOUND_DROPPED = REGISTRY.register(Counter("bot_outbound_dropped_total", "Bot API calls given up on, by reason (full queue, out of retries, cancelled, other error)", ["reason"]))
+BOARD_EVENTS = REGISTRY.register(Counter("bot_board_events_total", "Availability board changes reported, and boards sent, edited, left unchanged or failed", ["event"]))
+CONVERSATIONS = REGISTRY.register(Gauge("bot_conversations", "Pending conversation states ('entries') and their approximate size ('bytes')", ["measure"]))
+CONVERSATION_EVENTS = REGISTRY.register(CounterFunction("bot_conversation_events_total", "Conversation states set, resumed, expired, evicted and restored", ["event"]))
+
+class track:
+    """
+    Context manager timing the block into histogram and counting it in errors if it raises.
+    A class rather than @contextmanager, which costs a generator per use.
+    """
+    __slots__ = ("histogram", "errors", "labels", "start")
+
+    def __init__(self, histogram, errors, *labels):
+        self.histogram = histogram
+        self.errors = errors
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        if exc_type is not None and issubclass(exc_type, Exception):
+            self.errors.inc(*self.labels)
+        return False
+
+def timed_handler(name):
+    """
+    Decorator recording a handler's latency and errors under name. Works on sync and async handlers.
+    """
+    def decorator(handler):
+        if inspect.iscoroutinefunction(handler):
+            @functools.wraps(handler)
+            async def async_wrapper(*args, **kwargs):
+                with track(HANDLER_LATENCY, HANDLER_ERRORS, name):
+                    return await handler(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            with track(HANDLER_LATENCY, HANDLER_ERRORS, name):
+                return handler(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def instrument_telegram():
+    """
+    Wrap telebot's request functions so every Bot API call is timed by method. Safe to call more than once.
+    """
+    from telebot import apihelper
+
+    if not getattr(apihelper._make_request, "instrumented", False):
+        make_request = apihelper._make_request
+
+        def timed_make_request(token, method_name, *args, **kwargs):
+            with track(TELEGRAM_LATENCY, TELEGRAM_ERRORS, method_name):
+                return make_request(token, method_name, *args, **kwargs)
+
+        timed_make_request.instrumented = True
+        apihelper._make_request = timed_make_request
+
+    try:
+        from telebot import asyncio_helper # Needs aiohttp, which only the async engine installs
+    except ImportError:
+        return
+
+    if not getattr(asyncio_helper._process_request, "instrumented", False):
+        process_request = asyncio_helper._process_request
+
+        async def timed_process_request(token, url, *args, **kwargs):
+            with track(TELEGRAM_LATENCY, TELEGRAM_ERRORS, url):
+                return await process_request(token, url, *args, **kwargs)
+
+        timed_process_request.instrumented = True
+        asyncio_helper._process_request = timed_process_request
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.partition("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+def start_metrics_server(host, port):
+    """
+    Serve /metrics from a daemon thread. Returns the server.
+    """
+    server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%s/metrics", host, server.server_address[1])
+    return server
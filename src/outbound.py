@@ -0,0 +1,356 @@
+"""
+Outbound Bot API calls queued and sent by a scheduler thread that keeps under Telegram's flood limits,
+so handlers never wait on the API and never see a 429.
+
+Every call spends a token from a global bucket and one from its chat's bucket; group chats get a slower one.
+Direct replies (private chats) go before group posts. Calls to the same chat are sent one at a time,
+in the order they were queued. A 429 puts the call back at the head of its chat's queue until retry_after has passed.
+"""
+import asyncio
+import atexit
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from config import OUTBOUND_QUEUE_SIZE, OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_GROUP_RATE, OUTBOUND_MAX_RETRIES, OUTBOUND_WORKERS
+from metrics import OUTBOUND_QUEUE, OUTBOUND_WAIT, OUTBOUND_RETRIES, OUTBOUND_DROPPED
+
+logger = logging.getLogger("outbound")
+
+# Priorities, lowest first
+REPLY = 0
+BROADCAST = 1
+PRIORITY_NAMES = {REPLY: "reply", BROADCAST: "broadcast"}
+
+# Bot methods that are queued, and the position of chat_id among their positional arguments.
+# Once queued they return a Future at once and never raise in the handler: a failed call only fails its Future
+# (logged here), so handlers that care use on_error.
+QUEUED_METHODS = {"send_message": 0, "edit_message_text": 1, "edit_message_reply_markup": 0}
+
+def on_error(result, callback):
+    """
+    Call callback(error) once result fails, if it is the Future of a queued call. Anything else is left alone.
+    """
+    def done(future):
+        error = CancelledError() if future.cancelled() else future.exception()
+        if error is not None:
+            callback(error)
+
+    if isinstance(result, Future):
+        result.add_done_callback(done)
+    return result
+
+class QueueFull(Exception):
+    """
+    The outbound queue was full, so the call was dropped
+    """
+
+def is_group(chat_id):
+    """
+    Group and channel ids are negative. chat_id may be a string, as CHAT_ID is.
+    """
+    try:
+        return int(chat_id) < 0
+    except (TypeError, ValueError):
+        return False
+
+def retry_after(error):
+    """
+    Seconds a 429 said to wait, or None if error is not a 429
+    """
+    if getattr(error, "error_code", None) != 429:
+        return None
+    return (getattr(error, "result_json", None) or {}).get("parameters", {}).get("retry_after", 1)
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def delay(self, now):
+        """
+        Seconds until a token is available
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+class Outgoing:
+    __slots__ = ("seq", "priority", "chat_id", "method", "function", "args", "kwargs", "future", "queued_at", "attempts")
+
+    def __init__(self, seq, priority, chat_id, method, function, args, kwargs):
+        self.seq = seq
+        self.priority = priority
+        self.chat_id = chat_id
+        self.method = method
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+
+class SendScheduler:
+    """
+    Priority queue of Bot API calls, one FIFO per chat, drained by a scheduler thread into a pool of workers
+    (or onto the event loop, for the async engine). Queued methods return a concurrent.futures.Future of the result.
+    """
+    def __init__(
+            self, global_rate=30.0, chat_rate=1.0, chat_burst=3, group_rate=20 / 60,
+            max_queue=1000, max_retries=3, workers=4):
+        self.global_bucket = TokenBucket(global_rate, max(1, global_rate))
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.workers = workers
+
+        self._chats = {} # chat_id -> deque of Outgoing
+        self._buckets = {} # chat_id -> TokenBucket
+        self._not_before = {} # chat_id -> monotonic time a 429 said to wait until
+        self._in_flight = set() # chat_ids with a call being sent
+        self._size = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._executor = None
+        self._loop = None
+
+    def _bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = (
+                TokenBucket(self.group_rate, 1) if is_group(chat_id) else TokenBucket(self.chat_rate, self.chat_burst)
+            )
+        return bucket
+
+    def submit(self, method, function, chat_id, args, kwargs, priority=None):
+        """
+        Queue function(*args, **kwargs), a call to chat_id. Returns its Future.
+        priority defaults to BROADCAST for group chats and REPLY otherwise.
+        """
+        if priority is None:
+            priority = BROADCAST if is_group(chat_id) else REPLY
+
+        item = Outgoing(next(self._seq), priority, chat_id, method, function, args, kwargs)
+        with self._cond:
+            if self._size >= self.max_queue:
+                OUTBOUND_DROPPED.inc("full")
+                logger.warning("Outbound queue full, dropping %s to %s", method, chat_id)
+                item.future.set_exception(QueueFull(f"Outbound queue full, dropped {method} to {chat_id}"))
+                return item.future
+
+            self._chats.setdefault(chat_id, deque()).append(item)
+            self._size += 1
+            self._cond.notify()
+        return item.future
+
+    def _next(self, now):
+        """
+        The call to send now, or (None, seconds to wait, None meaning until something changes). Call with the lock held.
+        """
+        best = None
+        wait = None
+        for chat_id, calls in self._chats.items():
+            if chat_id in self._in_flight:
+                continue
+
+            delay = max(self._not_before.get(chat_id, 0) - now, self._bucket(chat_id).delay(now))
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+
+            item = calls[0]
+            if best is None or (item.priority, item.seq) < (best.priority, best.seq):
+                best = item
+
+        if best is None:
+            return None, wait
+
+        delay = self.global_bucket.delay(now)
+        if delay > 0:
+            return None, delay
+        return best, 0
+
+    def _run(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                item, wait = self._next(now)
+                if item is None:
+                    if self._stopping and not self._size and not self._in_flight:
+                        return
+                    self._cond.wait(wait)
+                    continue
+
+                self.global_bucket.take()
+                self._bucket(item.chat_id).take()
+                self._not_before.pop(item.chat_id, None)
+
+                calls = self._chats[item.chat_id]
+                calls.popleft()
+                if not calls:
+                    del self._chats[item.chat_id]
+                self._size -= 1
+                self._in_flight.add(item.chat_id)
+
+                OUTBOUND_WAIT.observe(now - item.queued_at, PRIORITY_NAMES[item.priority])
+                self._dispatch(item)
+
+                if len(self._buckets) > 2 * self.max_queue:
+                    self._prune(now)
+
+    def _prune(self, now):
+        """
+        Forget the buckets of idle chats that have refilled, which hold no state. Call with the lock held.
+        """
+        for chat_id in [chat_id for chat_id in self._buckets if chat_id not in self._chats and chat_id not in self._in_flight]:
+            bucket = self._buckets[chat_id]
+            bucket.delay(now)
+            if bucket.tokens >= bucket.burst:
+                del self._buckets[chat_id]
+
+    def _dispatch(self, item):
+        if self._loop is None:
+            self._executor.submit(self._call, item)
+            return
+
+        try:
+            future = asyncio.run_coroutine_threadsafe(item.function(*item.args, **item.kwargs), self._loop)
+        except RuntimeError as e: # The event loop has closed
+            self._executor.submit(self._done, item, None, e)
+            return
+        future.add_done_callback(lambda future: self._finished(item, future))
+
+    def _finished(self, item, future):
+        """
+        Done callback of a call run on the event loop. A coroutine the loop cancelled (on shutdown) still releases its chat.
+        """
+        if future.cancelled():
+            self._done(item, None, CancelledError())
+            return
+
+        error = future.exception()
+        self._done(item, None if error else future.result(), error)
+
+    def _call(self, item):
+        try:
+            result = item.function(*item.args, **item.kwargs)
+        except Exception as e:
+            self._done(item, None, e)
+            return
+        self._done(item, result, None)
+
+    def _done(self, item, result, error):
+        wait = retry_after(error)
+        with self._cond:
+            self._in_flight.discard(item.chat_id)
+            if wait is not None and item.attempts < self.max_retries:
+                item.attempts += 1
+                self._not_before[item.chat_id] = time.monotonic() + wait
+                self._chats.setdefault(item.chat_id, deque()).appendleft(item)
+                self._size += 1
+                self._cond.notify()
+
+                OUTBOUND_RETRIES.inc(item.method)
+                logger.warning("%s to %s hit the flood limit, retrying in %s s", item.method, item.chat_id, wait)
+                return
+            self._cond.notify()
+
+        if error is None:
+            item.future.set_result(result)
+            return
+
+        if isinstance(error, CancelledError):
+            OUTBOUND_DROPPED.inc("cancelled")
+            logger.warning("%s to %s was cancelled", item.method, item.chat_id)
+            item.future.cancel()
+            return
+
+        OUTBOUND_DROPPED.inc("retries" if wait is not None else "error")
+        logger.warning("%s to %s failed: %s", item.method, item.chat_id, error)
+        item.future.set_exception(error)
+
+    def depths(self):
+        with self._cond:
+            depths = dict.fromkeys(PRIORITY_NAMES.values(), 0)
+            for calls in self._chats.values():
+                for item in calls:
+                    depths[PRIORITY_NAMES[item.priority]] += 1
+            return depths
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="outbound")
+        self._thread = threading.Thread(target=self._run, name="outbound-scheduler", daemon=True)
+        self._thread.start()
+        OUTBOUND_QUEUE.set_function(lambda: {(priority,): depth for priority, depth in self.depths().items()})
+        atexit.register(self.close)
+        return self
+
+    def close(self, timeout=10.0):
+        """
+        Send what is still queued, waiting up to timeout seconds, then stop
+        """
+        if self._thread is None:
+            return
+
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Outbound queue not drained after %s s, %s calls left unsent", timeout, self._size)
+        self._executor.shutdown(wait=False)
+        self._thread = None
+
+    def _queued(self, method, function, position):
+        def queued(*args, priority=None, **kwargs):
+            chat_id = kwargs["chat_id"] if "chat_id" in kwargs else args[position] if len(args) > position else None
+            return self.submit(method, function, chat_id, args, kwargs, priority)
+        return queued
+
+    def install(self, bot):
+        """
+        Queue bot's QUEUED_METHODS from now on. They return a Future instead of waiting for the result,
+        so errors reach handlers through the Future (see on_error) and are no longer raised by the call.
+        """
+        for method, position in QUEUED_METHODS.items():
+            setattr(bot, method, self._queued(method, getattr(bot, method), position))
+        return self.start()
+
+    def install_async(self, bot, loop):
+        """
+        install() for an AsyncTeleBot whose calls run on loop. Awaiting a queued method returns its Future at once.
+        """
+        self._loop = loop
+        for method, position in QUEUED_METHODS.items():
+            queued = self._queued(method, getattr(bot, method), position)
+
+            async def queued_async(*args, queued=queued, **kwargs):
+                return queued(*args, **kwargs)
+
+            setattr(bot, method, queued_async)
+        return self.start()
+
+def create_send_scheduler():
+    """
+    The scheduler configured by the OUTBOUND_ settings, or None if OUTBOUND_QUEUE_SIZE is 0 and handlers send directly
+    """
+    if OUTBOUND_QUEUE_SIZE <= 0:
+        return None
+
+    return SendScheduler(
+        global_rate=OUTBOUND_GLOBAL_RATE, chat_rate=OUTBOUND_CHAT_RATE, chat_burst=OUTBOUND_CHAT_BURST, group_rate=OUTBOUND_GROUP_RATE,
+        max_queue=OUTBOUND_QUEUE_SIZE, max_retries=OUTBOUND_MAX_RETRIES, workers=OUTBOUND_WORKERS
+    )
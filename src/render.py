@@ -0,0 +1,106 @@
+"""
+Availability messages for one date or the coming week.
+
+The clock is read once per message. The "booked x ago" ages of the whole result set are bucketed and rounded
+in a single numpy operation, and like the time strings they are looked up rather than formatted.
+Each message is built as a list of parts and joined once.
+"""
+from datetime import datetime, timedelta
+from itertools import groupby
+from zoneinfo import ZoneInfo
+import numpy as np
+from constants import LEVELS, UTC_DIFF_HOURS
+
+LEVEL_PREFIXES = {9: "\U0001F467\U0001F467", 10: "\U0001F466\U0001F466", 11: "\U0001F466\U0001F467"}
+CLOCK = [f"{hour:02}:{minute:02}" for hour in range(24) for minute in range(60)] # Minute of the day -> 'HH:MM'
+
+# Ages below each limit (in seconds) are given in the unit of the same index
+AGE_LIMITS = np.array([60, 3600, 86400])
+AGE_UNITS = np.array([1, 60, 3600, 86400])
+# Every "booked x ago" label, so ages are looked up rather than formatted. Label n (from 1) of a unit is at its offset + n.
+AGE_LABELS = ["seconds", *(f"{n} mins" for n in range(1, 61)), *(f"{n} hrs" for n in range(1, 25)), *(f"{n} days" for n in range(1, 367))]
+AGE_OFFSETS = np.array([0, 0, 60, 84])
+
+def booked_now():
+    """
+    The current time on the clock booking_datetime is stored in
+    """
+    return datetime.now(ZoneInfo('UTC')).replace(tzinfo=None) + timedelta(hours=UTC_DIFF_HOURS)
+
+def booked_ago(bookings, now):
+    """
+    How long before now each booking was made, e.g. 'seconds', '5 mins', '2 days'
+    """
+    if not bookings:
+        return []
+
+    seconds = np.array([(now - booking.booking_datetime).total_seconds() for booking in bookings])
+    units = np.searchsorted(AGE_LIMITS, seconds, side='right')
+    labels = np.where(units == 0, 0, AGE_OFFSETS[units] + np.rint(seconds / AGE_UNITS[units]).astype(np.int64))
+    return [AGE_LABELS[label] if label < len(AGE_LABELS) else f"{label - AGE_OFFSETS[3]} days" for label in labels.tolist()]
+
+def booking_lines(bookings, now, separator):
+    """
+    One bullet per booking, in the order given
+    """
+    return [
+        f"• *{CLOCK[start.hour * 60 + start.minute]} - {CLOCK[end.hour * 60 + end.minute]}* "
+        f"by {booking.first_name} (@{booking.username}){separator} {age} ago\n"
+        for booking, start, end, age in zip(
+            bookings,
+            (booking.timeslot_start_time for booking in bookings),
+            (booking.timeslot_end_time for booking in bookings),
+            booked_ago(bookings, now)
+        )
+    ]
+
+def level_header(level):
+    prefix = LEVEL_PREFIXES.get(level, LEVEL_PREFIXES[11])
+    return f"\n{prefix} Level {level} {prefix}\n"
+
+def format_availability_message(date, bookings, now=None):
+    """
+    Bookings on date, by level and start time
+    """
+    if not bookings:
+        return "No bookings found"
+
+    bookings = sorted(
+        (booking for booking in bookings if booking.status == "booked" and booking.level in LEVELS),
+        key=lambda booking: (booking.level, booking.timeslot_start_time)
+    )
+    parts = [f"\U0001F4DA Lounge bookings for {date}\U0001F4DA\n"]
+    if not bookings:
+        parts.append("\nNo bookings for that day!\n")
+        return "".join(parts)
+
+    lines = booking_lines(bookings, now or booked_now(), ",")
+    for level, group in groupby(zip(bookings, lines), key=lambda pair: pair[0].level):
+        parts.append(level_header(level))
+        parts.extend(line for _, line in group)
+    return "".join(parts)
+
+def format_availability_all(start_date, bookings, days=7, now=None):
+    """
+    Week view in one pass over bookings, which must be sorted by timeslot_date, level and timeslot_start_time
+    """
+    lines = booking_lines(bookings, now or booked_now(), "")
+    lines_by_date = {
+        date: list(group)
+        for date, group in groupby(zip(bookings, lines), key=lambda pair: pair[0].timeslot_date)
+    }
+
+    parts = []
+    for date in (start_date + timedelta(days=i) for i in range(days)):
+        parts.append(f"\U0001F4DA Lounge bookings for {date.strftime('%d/%m/%Y')}\U0001F4DA\n")
+        date_lines = lines_by_date.get(date)
+        if not date_lines:
+            # No bookings for this date, so mark all lounges as unbooked
+            parts.append("All lounges are unbooked!\n\n")
+            continue
+
+        for level, group in groupby(date_lines, key=lambda pair: pair[0].level):
+            parts.append(level_header(level))
+            parts.extend(line for _, line in group)
+        parts.append("\n") # A newline between dates
+    return "".join(parts)
@@ -0,0 +1,47 @@
+import asyncio
+import time
+import unittest
+from outbound import SendScheduler, on_error
+
+class Bot:
+    """
+    AsyncTeleBot stand-in whose send_message is cancelled for the text "cancel"
+    """
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        if text == "cancel":
+            raise asyncio.CancelledError()
+        self.sent.append((chat_id, text))
+        return text
+
+    async def edit_message_text(self, text, chat_id):
+        pass
+
+    async def edit_message_reply_markup(self, chat_id):
+        pass
+
+class AsyncSchedulerTests(unittest.TestCase):
+    def test_cancelled_call_releases_its_chat(self):
+        bot = Bot()
+        errors = []
+
+        async def main():
+            scheduler = SendScheduler(chat_rate=100, chat_burst=10).install_async(bot, asyncio.get_running_loop())
+            cancelled = on_error(await bot.send_message(1, "cancel"), errors.append)
+            sent = await bot.send_message(1, "after")
+
+            self.assertEqual(await asyncio.wait_for(asyncio.wrap_future(sent), 5), "after")
+            self.assertTrue(cancelled.cancelled())
+
+            started = time.monotonic()
+            await asyncio.to_thread(scheduler.close, 5.0)
+            return time.monotonic() - started
+
+        self.assertLess(asyncio.run(main()), 1.0)
+        self.assertEqual(bot.sent, [(1, "after")])
+        self.assertEqual(len(errors), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Behaviour every storage backend must share, run against MemoryStorage.
+From src/:
+    python -m unittest discover tests
+"""
+import unittest
+from datetime import date, datetime, time, timedelta
+from db.memory import MemoryStorage
+from db.models import Booking
+from db.storage import Storage, retention_cutoff
+
+TODAY = date(2026, 10, 18)
+CUTOFF = retention_cutoff(TODAY)
+
+def params(level=9, user_chat_id=1, start=time(10), end=time(11), booked_at=datetime(2026, 10, 1, 12)):
+    """
+    Keyword arguments of book_if_free and book_many, less the date
+    """
+    return dict(
+        level=level, booking_datetime=booked_at, username="user", first_name="User", user_chat_id=user_chat_id,
+        timeslot_start_time=start, timeslot_end_time=end
+    )
+
+class StorageContract:
+    """
+    Mixed into a TestCase whose make_storage() returns an empty backend
+    """
+    def make_storage(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.storage = self.make_storage()
+
+    def tearDown(self):
+        self.storage.close()
+
+    def rows(self, from_date=TODAY):
+        return [Booking(*row) for row in self.storage.all_bookings(from_date)]
+
+    def test_book_if_free_books_a_free_slot(self):
+        result = self.storage.book_if_free(timeslot_date=TODAY, **params())
+
+        self.assertEqual(result[0], "booked")
+        self.assertEqual(result[2:], (time(10), time(11)))
+        booking, = self.storage.bookings_by_date(TODAY, "booked")
+        self.assertEqual(Booking(*booking).booking_id, result[1])
+
+    def test_book_if_free_reports_the_earliest_clash(self):
+        first = self.storage.book_if_free(timeslot_date=TODAY, **params(start=time(10), end=time(11)))
+        self.storage.book_if_free(timeslot_date=TODAY, **params(start=time(12), end=time(13)))
+
+        self.assertEqual(
+            self.storage.book_if_free(timeslot_date=TODAY, **params(user_chat_id=2, start=time(10, 30), end=time(12, 30))),
+            ("clash", first[1], time(10), time(11))
+        )
+        self.assertEqual(len(self.rows()), 2)
+
+    def test_back_to_back_and_other_levels_do_not_clash(self):
+        self.storage.book_if_free(timeslot_date=TODAY, **params(start=time(10), end=time(11)))
+
+        self.assertEqual(self.storage.book_if_free(timeslot_date=TODAY, **params(start=time(11), end=time(12)))[0], "booked")
+        self.assertEqual(self.storage.book_if_free(timeslot_date=TODAY, **params(level=10))[0], "booked")
+
+    def test_cancel_booking_frees_the_slot(self):
+        booking_id = self.storage.book_if_free(timeslot_date=TODAY, **params())[1]
+
+        self.assertEqual(self.storage.cancel_booking(booking_id, TODAY + timedelta(days=1)), [])
+        self.assertEqual([tuple(row) for row in self.storage.cancel_booking(booking_id, TODAY)], [(TODAY,)])
+        self.assertEqual(self.storage.cancel_booking(booking_id), [])
+        self.assertEqual(self.storage.bookings_by_date(TODAY, "booked"), [])
+        self.assertEqual(self.storage.book_if_free(timeslot_date=TODAY, **params(user_chat_id=2))[0], "booked")
+
+    def test_cancel_bookings_skips_cancelled_ones(self):
+        first = self.storage.book_if_free(timeslot_date=TODAY, **params())[1]
+        second = self.storage.book_if_free(timeslot_date=TODAY, **params(level=10))[1]
+        self.storage.cancel_booking(first)
+
+        self.assertEqual([tuple(row) for row in self.storage.cancel_bookings([first, second])], [(second, TODAY)])
+        self.assertEqual(self.storage.bookings_by_id(1, "booked", TODAY), [])
+
+    def test_book_many_books_every_week(self):
+        weeks = [TODAY + timedelta(weeks=week) for week in range(4)]
+
+        results = self.storage.book_many(weeks, **params())
+
+        self.assertEqual([result[0] for result in results], ["booked"] * 4)
+        self.assertEqual([result[2] for result in results], weeks)
+        self.assertEqual([Booking(*row).timeslot_date for row in self.storage.bookings_by_id(1, "booked", TODAY)], weeks)
+
+    def test_book_many_is_all_or_nothing(self):
+        weeks = [TODAY + timedelta(weeks=week) for week in range(4)]
+        clash = self.storage.book_if_free(timeslot_date=weeks[2], **params(user_chat_id=2, start=time(10, 30), end=time(11, 30)))
+
+        self.assertEqual(self.storage.book_many(weeks, **params()), [("clash", clash[1], weeks[2], time(10, 30), time(11, 30))])
+        self.assertEqual(len(self.rows()), 1)
+
+    def test_retention_keeps_future_slots_of_an_old_series(self):
+        weeks = [TODAY + timedelta(weeks=week) for week in range(12)]
+        self.storage.book_many(weeks, **params(booked_at=datetime.combine(TODAY - timedelta(days=31), time(9))))
+
+        self.assertEqual(self.storage.clear_old_bookings(cutoff=CUTOFF), 0)
+        self.assertEqual(len(self.storage.all_bookings(TODAY)), 12)
+
+    def test_retention_clears_slots_before_the_cutoff(self):
+        for timeslot_date in (CUTOFF - timedelta(days=1), CUTOFF, TODAY):
+            self.storage.book_if_free(timeslot_date=timeslot_date, **params(booked_at=datetime(2020, 1, 1)))
+
+        self.assertEqual(self.storage.clear_old_bookings(batch_size=1, cutoff=CUTOFF), 1)
+        self.assertEqual([row[6] for row in self.storage.all_bookings(CUTOFF - timedelta(days=7))], [CUTOFF, TODAY])
+
+class MemoryStorageTests(StorageContract, unittest.TestCase):
+    def make_storage(self):
+        return MemoryStorage()
+
+class StorageTests(unittest.TestCase):
+    def test_incomplete_backend_cannot_be_instantiated(self):
+        class Incomplete(Storage):
+            def book_if_free(self, **params):
+                return "booked", 1, params["timeslot_start_time"], params["timeslot_end_time"]
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import http.client
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+from webhook import SECRET_HEADER, UpdateDispatcher, create_request_handler, webhook_secret
+
+class WebhookSecretTests(unittest.TestCase):
+    def test_configured_secret_is_used(self):
+        self.assertEqual(webhook_secret("s3cret", "https://example.org", False), "s3cret")
+
+    def test_registered_webhook_gets_a_random_secret(self):
+        first = webhook_secret(None, "https://example.org", False)
+        self.assertGreaterEqual(len(first), 32)
+        self.assertNotEqual(first, webhook_secret("", "https://example.org", False))
+
+    def test_no_secret_is_refused_outside_offline_mode(self):
+        with self.assertRaises(ValueError):
+            webhook_secret(None, None, False)
+
+    def test_offline_mode_may_run_without_a_secret(self):
+        self.assertIsNone(webhook_secret(None, None, True))
+
+class WebhookRequestTests(unittest.TestCase):
+    """
+    Requests against a live handler whose dispatcher is never started, so accepted updates just wait in its queue
+    """
+    def setUp(self):
+        self.dispatcher = UpdateDispatcher(bot=None, workers=1)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), create_request_handler(self.dispatcher, "/hook", "s3cret"))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def post(self, body):
+        conn = http.client.HTTPConnection(*self.server.server_address, timeout=5)
+        try:
+            conn.request("POST", "/hook", body, {SECRET_HEADER: "s3cret", "Content-Type": "application/json"})
+            return conn.getresponse().status
+        finally:
+            conn.close()
+
+    def test_non_object_body_is_rejected(self):
+        for body in ("[1]", "null", "5"):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body), 400)
+
+    def test_update_without_a_chat_is_rejected(self):
+        self.assertEqual(self.post('{"update_id": 1, "message": {"text": "hi"}}'), 400)
+        self.assertEqual(self.dispatcher.depths(), [0])
+
+    def test_update_is_queued(self):
+        self.assertEqual(self.post('{"update_id": 1, "message": {"chat": {"id": 5}, "text": "hi"}}'), 200)
+        self.assertEqual(self.dispatcher.depths(), [1])
+
+if __name__ == "__main__":
+    unittest.main()
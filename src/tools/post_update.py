@@ -0,0 +1,38 @@
+"""
+Post recorded Telegram updates to a locally running webhook server (BOT_MODE=webhook, with WEBHOOK_OFFLINE
+or the server's WEBHOOK_SECRET).
+From src/:
+    python -m tools.post_update tools/updates/start.json [more.json ...]
+"""
+import argparse
+import json
+import urllib.error
+import urllib.request
+from config import WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+from webhook import SECRET_HEADER
+
+def post_update(url, update, secret=None):
+    request = urllib.request.Request(url, data=json.dumps(update).encode(), method="POST")
+    request.add_header("Content-Type", "application/json")
+    if secret:
+        request.add_header(SECRET_HEADER, secret)
+
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="JSON files holding one update or a list of updates")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    parser.add_argument("--secret", default=WEBHOOK_SECRET)
+    args = parser.parse_args()
+
+    for path in args.files:
+        with open(path) as f:
+            updates = json.load(f)
+
+        for update in updates if isinstance(updates, list) else [updates]:
+            print(f"{path} update {update.get('update_id')}: HTTP {post_update(args.url, update, args.secret)}")
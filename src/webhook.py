@@ -0,0 +1,183 @@
+import hmac
+import json
+import logging
+import queue
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telebot import types
+from metrics import QUEUE_DEPTH, UPDATES_DROPPED
+
+logger = logging.getLogger("webhook")
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def get_update_chat_id(update):
+    """
+    Chat an update belongs to, used to keep each chat's updates in order.
+    Takes the raw update dict so the HTTP thread never builds telebot objects.
+    """
+    for key in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if key in update:
+            return update[key]["chat"]["id"]
+
+    callback_query = update.get("callback_query")
+    if callback_query:
+        message = callback_query.get("message")
+        return message["chat"]["id"] if message else callback_query["from"]["id"]
+
+    for value in update.values():
+        if isinstance(value, dict) and "from" in value:
+            return value["from"]["id"]
+
+    return update.get("update_id", 0)
+
+class UpdateDispatcher:
+    """
+    Worker pool fed by bounded queues.
+    Every chat is pinned to one worker, so updates from the same chat are handled in the order they arrived.
+    """
+    def __init__(self, bot, workers=4, queue_size=100):
+        self.bot = bot
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.threads = [
+            threading.Thread(target=self._work, args=(q,), name=f"webhook-worker-{i}", daemon=True)
+            for i, q in enumerate(self.queues)
+        ]
+        self.dropped = 0
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        for q in self.queues:
+            q.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def submit(self, update):
+        """
+        Queue a raw update dict. Returns False if its worker's queue is full.
+        """
+        q = self.queues[hash(get_update_chat_id(update)) % len(self.queues)]
+        try:
+            q.put_nowait(update)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            UPDATES_DROPPED.inc("webhook")
+            return False
+
+    def depths(self):
+        return [q.qsize() for q in self.queues]
+
+    def _work(self, q):
+        while True:
+            update = q.get()
+            if update is None:
+                return
+
+            try:
+                self.bot.process_new_updates([types.Update.de_json(update)])
+            except Exception as e:
+                logger.error("Error processing update %s: %s", update.get('update_id'), e)
+
+def create_request_handler(dispatcher, path, secret):
+
+    class WebhookRequestHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != path:
+                self.send_response(404)
+                self.end_headers()
+                return
+
+            if secret and not hmac.compare_digest(self.headers.get(SECRET_HEADER, ""), secret):
+                logger.warning("Rejected webhook request with invalid secret token")
+                self.send_response(403)
+                self.end_headers()
+                return
+
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                update = json.loads(self.rfile.read(length))
+            except (ValueError, json.JSONDecodeError):
+                self.send_response(400)
+                self.end_headers()
+                return
+
+            if not isinstance(update, dict):
+                logger.warning("Rejected webhook request whose body is not an update object")
+                self.send_response(400)
+                self.end_headers()
+                return
+
+            try:
+                submitted = dispatcher.submit(update)
+            except (KeyError, TypeError, AttributeError) as e: # Not shaped like an update, so there is no chat to route it by
+                logger.warning("Rejected malformed update %s: %r", update.get("update_id"), e)
+                self.send_response(400)
+                self.end_headers()
+                return
+
+            # Telegram retries non-2xx responses, so a full queue pushes back instead of losing the update
+            self.send_response(200 if submitted else 503)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return WebhookRequestHandler
+
+def webhook_secret(secret, url, offline):
+    """
+    The secret token every request must carry. Without one anybody who can reach the port could post updates
+    and book or cancel as any user, so a registered webhook gets a random one if none is configured,
+    and only offline mode may run without.
+    """
+    if secret:
+        return secret
+
+    if url:
+        logger.info("WEBHOOK_SECRET not set, registering the webhook with a random secret token")
+        return secrets.token_urlsafe(32)
+
+    if not offline:
+        raise ValueError("WEBHOOK_SECRET is required to serve updates. Set WEBHOOK_OFFLINE to replay recorded updates locally without one.")
+    return None
+
+def run_webhook(bot, host, port, path, secret=None, url=None, workers=4, queue_size=100, offline=False):
+    """
+    Serve Telegram updates over HTTP until interrupted.
+    The webhook is only registered with Telegram if url is set, so the server can be driven offline by posting
+    recorded updates to http://<host>:<port><path>. Offline without a secret it only listens on 127.0.0.1.
+    """
+    if url and offline:
+        raise ValueError("WEBHOOK_OFFLINE serves recorded updates, so WEBHOOK_URL must not be set")
+
+    secret = webhook_secret(secret, url, offline)
+    if secret is None and host != "127.0.0.1":
+        logger.warning("Offline without WEBHOOK_SECRET: accepting unauthenticated updates on 127.0.0.1 only, not %s", host)
+        host = "127.0.0.1"
+
+    dispatcher = UpdateDispatcher(bot, workers=workers, queue_size=queue_size)
+    dispatcher.start()
+    QUEUE_DEPTH.set_function(lambda: {(f"webhook-{i}",): depth for i, depth in enumerate(dispatcher.depths())})
+
+    if url:
+        logger.info("Registering webhook %s%s", url, path)
+        bot.remove_webhook()
+        bot.set_webhook(url=f"{url}{path}", secret_token=secret)
+    else:
+        logger.info("WEBHOOK_URL not set, serving without registering the webhook")
+
+    server = ThreadingHTTPServer((host, port), create_request_handler(dispatcher, path, secret))
+    logger.info("Listening for updates on %s:%s%s with %s workers", host, port, path, workers)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        dispatcher.stop()